@@ -1,5 +1,6 @@
+import math
+import time
 from pandas import read_excel
-from sklearn.model_selection import train_test_split
 import torch 
 from torch.nn import Sequential
 from torch import nn
@@ -8,9 +9,9 @@ from torch.utils.data import TensorDataset
 
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
-def load_and_preprocess_data(file_path, window_size=30):
+def load_and_preprocess_data(file_path, window_size=30, horizon=1):
     df = read_excel(file_path)
-    return load_and_preprocess_data_from_df(df, window_size)
+    return load_and_preprocess_data_from_df(df, window_size, horizon)
 
 
 def prepare_data_loaders(X_train, X_test, y_train, y_test, batch_size=32):
@@ -37,10 +38,68 @@ class Weight_Model(nn.Module):
         output = self.model[1](lstm_out_last)
         return output
 
+    def forecast(self, x, steps):
+        """Predict `steps` values past each window in x ([batch, window, 1], normalized).
 
-def train_model(model, train_loader, loss_fn, optimizer, num_epochs):
+        The window is run through the LSTM once; after that each prediction is fed back as a
+        single timestep while the (h, c) state is carried over, so every further step costs one
+        cell update. Returns a [batch, steps] tensor.
+        """
+        return Forecaster(self.model[0], self.model[1])(x, steps)
+
+
+class Forecaster(nn.Module):
+    """The loop behind Weight_Model.forecast as a module of its own, so it can be scripted and quantized."""
+
+    def __init__(self, lstm, linear):
+        super().__init__()
+        self.lstm = lstm
+        self.linear = linear
+
+    def forward(self, x: torch.Tensor, steps: int) -> torch.Tensor:
+        outputs = torch.empty(x.shape[0], steps, device=x.device)
+        lstm_out, state = self.lstm(x)
+        prediction = self.linear(lstm_out[:, -1, :])
+        for step in range(steps):
+            outputs[:, step] = prediction[:, 0]
+            if step + 1 < steps:
+                lstm_out, state = self.lstm(prediction.unsqueeze(1), state)
+                prediction = self.linear(lstm_out[:, -1, :])
+        return outputs
+
+
+def validation_loss(model, val_loader, loss_fn):
+    """Mean loss over val_loader, accumulated on-device so there is a single sync at the end."""
+    model.eval()
+    total = torch.zeros((), device=device)
+    count = 0
+    with torch.no_grad():
+        for X_batch, y_batch in val_loader:
+            X_batch, y_batch = X_batch.to(device), y_batch.to(device)
+            y_batch = y_batch.view(-1, 1)
+            total += loss_fn(model(X_batch), y_batch) * len(y_batch)
+            count += len(y_batch)
+    return total.item() / max(count, 1)
+
+
+def train_model(model, train_loader, loss_fn, optimizer, num_epochs, val_loader=None, patience=10, min_delta=1e-5, min_epochs=0, max_seconds=None, scheduler=None):
+    """Train for at most num_epochs epochs (and max_seconds of wall-clock time, if given).
+
+    With a val_loader the held-out loss is checked after every epoch and the best weights are
+    restored at the end. After min_epochs every epoch's loss steps the ReduceLROnPlateau-style
+    scheduler (if given), and `patience` epochs in a row that don't improve it by min_delta stop
+    training. Returns the number of epochs run and why training stopped: "converged" (early
+    stopping), "time" (max_seconds) or "epochs" (num_epochs ran out).
+    """
+    start_time = time.perf_counter()
+    best_loss = math.inf
+    best_state = None
+    stale_epochs = 0
+    epoch = 0
     for epoch in range(1, num_epochs + 1):
-        epoch_loss = 0
+        model.train()
+        # Keep the running loss on the device; calling .item() per batch forces a sync
+        epoch_loss = torch.zeros((), device=device)
         for batch in train_loader:
             X_batch, y_batch = batch
             X_batch, y_batch = X_batch.to(device), y_batch.to(device)
@@ -55,10 +114,39 @@ def train_model(model, train_loader, loss_fn, optimizer, num_epochs):
             loss.backward()
             optimizer.step()
 
-            epoch_loss += loss.item()
+            epoch_loss += loss.detach()
 
         if epoch % 10 == 0:
-            print(f"Epoch {epoch} Loss: {epoch_loss / len(train_loader)}")
+            print(f"Epoch {epoch} Loss: {epoch_loss.item() / len(train_loader)}")
+
+        if val_loader is not None:
+            val_loss = validation_loss(model, val_loader, loss_fn)
+            if val_loss < best_loss - min_delta:
+                best_loss = val_loss
+                best_state = {name: tensor.detach().clone() for name, tensor in model.state_dict().items()}
+                stale_epochs = 0
+            elif epoch > min_epochs:
+                stale_epochs += 1
+            # Plateaus only count (and only lower the learning rate) after the warm-up. From then
+            # on the scheduler sees every epoch, improving or not, so its own tracking stays right
+            if epoch > min_epochs:
+                if scheduler is not None:
+                    scheduler.step(val_loss)
+                if stale_epochs >= patience:
+                    print(f"Early stopping at epoch {epoch}, best validation loss {best_loss:.6f}")
+                    stop = "converged"
+                    break
+
+        if max_seconds is not None and time.perf_counter() - start_time > max_seconds:
+            print(f"Training budget of {max_seconds}s reached at epoch {epoch}")
+            stop = "time"
+            break
+    else:
+        stop = "epochs"
+
+    if best_state is not None:
+        model.load_state_dict(best_state)
+    return epoch, stop
 
 
 def evaluate_model(model, test_loader, loss_fn, data_min, data_max):
@@ -82,55 +170,61 @@ def evaluate_model(model, test_loader, loss_fn, data_min, data_max):
     print(f"\nTest RMSE in pounds: {rmse_pounds:.4f} lbs")
 
 
-def predict_weight(model, new_data, data_min, data_max):
+def forecast_weights(model, new_data, data_min, data_max, steps):
+    """Forecast the next `steps` weights after new_data (the last window, in pounds).
+
+    Returns a 1-D CPU tensor of denormalized weights; element 0 is the next-step prediction.
+    """
     model.eval()
     new_data = (new_data - data_min) / (data_max - data_min)
     new_data = new_data.clone().detach().float().to(device)
     new_data = new_data.view(1, -1, 1)
-    
+
     with torch.no_grad():
-        prediction = model(new_data)
+        forecast = model.forecast(new_data, steps)[0]
+
+    return (forecast * (data_max - data_min) + data_min).cpu()
+
 
-    denormalized_prediction = prediction.item() * (data_max - data_min) + data_min
+def predict_weight(model, new_data, data_min, data_max):
+    denormalized_prediction = forecast_weights(model, new_data, data_min, data_max, steps=1)[0].item()
     print(f"\nFuture weight: {denormalized_prediction:.0f} pounds")
     
     return float(denormalized_prediction)
 
 
-def load_and_preprocess_data_from_df(df, window_size=30):
+def load_and_preprocess_data_from_df(df, window_size=30, horizon=1, test_size=0.2, data_min=None, data_max=None):
+    """Build normalized (window -> value `horizon` steps ahead) training pairs from df['Weight'].
+
+    X is a strided view over the normalized series (no per-window copies) and the split is
+    time ordered: the last `test_size` fraction of windows is held out for validation.
+    data_min/data_max default to the range of the series; pass a model's own range to keep
+    its normalization when fine-tuning it.
+    """
     weights = df['Weight'].values
-    weight_tensor = torch.tensor(weights).to(torch.float32)
-    
-    data_min = weight_tensor.min()
-    data_max = weight_tensor.max()
-    
+    weight_tensor = torch.tensor(weights, dtype=torch.float32)
+
+    data_min = weight_tensor.min() if data_min is None else torch.tensor(data_min, dtype=torch.float32)
+    data_max = weight_tensor.max() if data_max is None else torch.tensor(data_max, dtype=torch.float32)
+
     def normalize_data(weight_tensor, data_min, data_max):
         return (weight_tensor - data_min) / (data_max - data_min)
 
     normalized_weights = normalize_data(weight_tensor, data_min, data_max)
 
-    def sliding_window(normalized_weights, window_size):
-        for i in range(len(normalized_weights) - window_size):
-            window = normalized_weights[i:i + window_size]
-            output = normalized_weights[i + window_size]
-            yield window, output
-
-    data = list(sliding_window(normalized_weights, window_size))
-    X = [x[0] for x in data]
-    y = [x[1] for x in data]
-    
-    X = torch.stack(X).numpy()
-    y = torch.stack(y).numpy()
+    num_windows = len(normalized_weights) - window_size - horizon + 1
+    if num_windows < 2:
+        raise ValueError(f"Need at least {window_size + horizon + 1} weights for a window of {window_size} days, got {len(normalized_weights)}")
 
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    # Window i covers [i, i + window_size) and its target sits horizon - 1 steps after it
+    X = normalized_weights.unfold(0, window_size, 1)[:num_windows].unsqueeze(-1)
+    y = normalized_weights[window_size + horizon - 1:]
 
-    X_train = X_train.reshape(X_train.shape[0], X_train.shape[1], 1)
-    X_test = X_test.reshape(X_test.shape[0], X_test.shape[1], 1)
+    num_test = min(max(math.ceil(num_windows * test_size), 1), num_windows - 1)
+    num_train = num_windows - num_test
 
-    X_train = torch.tensor(X_train, dtype=torch.float32)
-    y_train = torch.tensor(y_train, dtype=torch.float32)
-    X_test = torch.tensor(X_test, dtype=torch.float32)
-    y_test = torch.tensor(y_test, dtype=torch.float32)
+    X_train, X_test = X[:num_train], X[num_train:]
+    y_train, y_test = y[:num_train], y[num_train:]
 
     return X_train, X_test, y_train, y_test, df, data_min, data_max
 
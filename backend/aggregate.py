@@ -0,0 +1,161 @@
+import os
+import threading
+from collections import OrderedDict
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import instrumentation
+import record_store
+
+# Rollups are materialized next to the store as aggregated/<resolution>/<type>.parquet
+AGGREGATED_DIR = "aggregated"
+# Number of record types aggregated concurrently; 1 keeps everything in-process and serial
+WORKERS = int(os.getenv("AGGREGATE_WORKERS", "1"))
+
+# Output sub-directory -> pandas frequency. Weekly buckets end on Sunday, like resample("W").
+RESOLUTIONS = {
+    "daily": "D",
+    "weekly": "W",
+    "monthly": "MS",
+}
+# Period used to find the first bucket touched by new records for each frequency
+PERIODS = {"D": "D", "W": "W-SUN", "MS": "M"}
+STATS = ["sum", "mean", "min", "max", "count"]
+PERCENTILES = (0.5, 0.9)
+# Rollup frames kept in memory by load_rollup, least recently used dropped first
+ROLLUP_CACHE_SIZE = int(os.getenv("ROLLUP_CACHE_SIZE", "64"))
+
+_rollups = OrderedDict()
+_rollups_lock = threading.Lock()
+
+
+def rollup(df, freq, percentiles=PERCENTILES):
+    """Aggregate a (startDate, value) frame into one row per bucket of the given frequency."""
+    grouped = df.groupby(pd.Grouper(key="startDate", freq=freq))["value"]
+    result = grouped.agg(STATS)
+    if percentiles:
+        quantiles = grouped.quantile(list(percentiles)).unstack()
+        quantiles.columns = [f"p{round(q * 100)}" for q in percentiles]
+        result = result.join(quantiles)
+
+    # Grouper emits empty buckets for gaps in the data; drop them
+    result = result[result["count"] > 0].round(3)
+    result.index = result.index.date
+    result.index.name = "date"
+    return result.reset_index()
+
+
+def bucket_start(timestamp, freq):
+    """Return the start of the bucket of the given frequency that contains timestamp."""
+    return pd.Timestamp(timestamp).to_period(PERIODS[freq]).start_time
+
+
+def rollup_path(record_type, resolution, output_dir=AGGREGATED_DIR):
+    return os.path.join(output_dir, resolution, f"{record_type}.parquet")
+
+
+def save_rollup(out_path, result):
+    # Fixed column types, so empty rollups and merged ones keep the same schema
+    schema = pa.schema([("date", pa.date32()), *((column, pa.int64() if column == "count" else pa.float64()) for column in result.columns[1:])])
+    tmp_path = out_path + ".tmp"
+    pq.write_table(pa.Table.from_pandas(result, schema=schema, preserve_index=False), tmp_path)
+    os.replace(tmp_path, out_path)
+
+
+def merge_rollup(out_path, result, cutoff):
+    # Keep the rows for buckets before the cutoff and replace everything from it onwards
+    kept = pq.read_table(out_path, filters=[("date", "<", cutoff.date())]).to_pandas()
+    save_rollup(out_path, pd.concat([kept, result], ignore_index=True) if len(kept) else result)
+
+
+def rollup_exists(record_type, resolution, output_dir=AGGREGATED_DIR):
+    return os.path.exists(rollup_path(record_type, resolution, output_dir))
+
+
+def load_rollup(record_type, resolution, output_dir=AGGREGATED_DIR):
+    """A rollup as a frame (date, sum, mean, min, max, count, p50, p90), or None if it hasn't been built.
+
+    Frames are cached until their file is rewritten, so callers must not modify them.
+    """
+    path = os.path.abspath(rollup_path(record_type, resolution, output_dir))
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    signature = (stat.st_size, stat.st_mtime_ns)
+    with _rollups_lock:
+        cached = _rollups.get(path)
+        if cached is not None and cached[0] == signature:
+            _rollups.move_to_end(path)
+            return cached[1]
+
+    frame = pq.read_table(path).to_pandas()
+    with _rollups_lock:
+        _rollups[path] = (signature, frame)
+        _rollups.move_to_end(path)
+        while len(_rollups) > ROLLUP_CACHE_SIZE:
+            _rollups.popitem(last=False)
+    return frame
+
+
+def aggregateRecordType(record_type, input_dir=record_store.EXPORT_DIR, output_dir=AGGREGATED_DIR, resolutions=tuple(RESOLUTIONS), since=None):
+    out_paths = {resolution: rollup_path(record_type, resolution, output_dir) for resolution in resolutions}
+
+    # Incremental updates need an earlier rollup to merge into, otherwise rebuild from scratch
+    if since is not None and not all(rollup_exists(record_type, resolution, output_dir) for resolution in resolutions):
+        since = None
+    cutoffs = {resolution: bucket_start(since, RESOLUTIONS[resolution]) for resolution in resolutions} if since is not None else {}
+
+    # Read and clean the record type once, then derive every resolution from the same frame
+    with instrumentation.span("aggregate_read"):
+        df = record_store.read_records(record_type, columns=["startDate", "value"], export_dir=input_dir, since=min(cutoffs.values()) if cutoffs else None)
+        df = df.dropna(subset=["startDate", "value"])
+    instrumentation.count("aggregate_records", len(df))
+
+    for resolution in resolutions:
+        with instrumentation.span("rollup", resolution=resolution):
+            out_path = out_paths[resolution]
+            if since is None:
+                save_rollup(out_path, rollup(df, RESOLUTIONS[resolution]))
+            else:
+                # Only the buckets from the first one touched by the new records are recomputed
+                cutoff = cutoffs[resolution]
+                merge_rollup(out_path, rollup(df[df["startDate"] >= cutoff], RESOLUTIONS[resolution]), cutoff)
+            print(f"Aggregated: {record_type} -> {out_path}")
+
+
+def aggregateAll(input_dir=record_store.EXPORT_DIR, output_dir=AGGREGATED_DIR, resolutions=tuple(RESOLUTIONS), since=None, workers=None, use_threads=False):
+    """Roll up every record type in the store.
+
+    since maps record types to the earliest startDate that changed (as returned by filterData);
+    when given, only those types are processed and only the buckets from that date on are rebuilt.
+    With workers > 1 record types are fanned out over a process pool (or a thread pool with
+    use_threads=True), largest first. Each type writes its own files, so the output is identical
+    to the serial run.
+    """
+    workers = WORKERS if workers is None else workers
+    for resolution in resolutions:
+        os.makedirs(os.path.join(output_dir, resolution), exist_ok=True)
+
+    record_types = record_store.list_types(input_dir)
+    if since is not None:
+        record_types = [record_type for record_type in record_types if record_type in since]
+    jobs = [(record_type, input_dir, output_dir, resolutions, since[record_type] if since is not None else None) for record_type in record_types]
+
+    if workers <= 1 or len(jobs) <= 1:
+        for job in jobs:
+            aggregateRecordType(*job)
+        return
+
+    # Schedule the biggest partitions first so they don't end up as the long tail
+    jobs.sort(key=lambda job: record_store.partition_size(job[0], input_dir), reverse=True)
+    pool_class = ThreadPoolExecutor if use_threads else ProcessPoolExecutor
+    with pool_class(max_workers=min(workers, len(jobs))) as pool:
+        futures = [pool.submit(aggregateRecordType, *job) for job in jobs]
+        for future in futures:
+            future.result()
+
+
+if __name__ == "__main__":
+    aggregateAll()
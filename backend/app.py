@@ -1,82 +1,69 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, g, request, jsonify, send_from_directory
 from flask_cors import CORS
 import os
-import pandas as pd
 import io
-from predict import handle_prediction
-import requests
+import importlib
+import tempfile
 import time
-import torch
-import torch.nn as nn
-from torch.optim import Adam
-import RNN_model  # Make sure this import works
+import threading
 from datetime import datetime, timedelta
 
-from filterData import filterData
-from aggregate_weekly import aggregateWeekly
+import instrumentation
+from compression import compress_response
+from jobs import JobManager
+from sessions import SESSION_HEADER, get_workspace
+from uploads import ChunkReader, StreamedUpload, UploadError, UploadTooLarge, iter_zip_member
 
-from filterData import filterData
-from aggregate_daily import aggregateDaily
+# torch, pandas, lxml and requests are imported on first use by the routes that need them,
+# so a fresh worker answers /heartbeat without loading the ML and XML stacks
+HEAVY_MODULES = ("pandas", "torch", "predict", "inference", "forecasters", "charts", "filterData", "aggregate", "digest", "insights", "query")
+# Set PREWARM=1 to import them in the background as soon as the worker starts instead
+PREWARM = os.getenv("PREWARM", "0") == "1"
+# Rows parsed per step when a CSV upload is read off the request stream
+CSV_CHUNK_ROWS = 10000
 
 app = Flask(__name__, static_folder="../frontend/dist", static_url_path="")
 CORS(app, resources={r"/*": {"origins": "*"}})
 
-globalSavedInsights = None
-
-def get_databricks_insight(category_name, category_data):
-    """
-    Send CSV data to the Databricks API and return the generated insight.
-    
-    Args:
-        category_name (str): The category name (e.g., 'stepcount').
-        category_data (str): The content of the CSV file as a string.
-    
-    Returns:
-        str: The insight from the API or an error message if the request fails.
-    """
-    url = "https://dbc-81784a62-a9c5.cloud.databricks.com/serving-endpoints/QuackHacks_Health_Insights/invocations"
-    
-    # Retrieve token from environment variable
-    token = os.getenv("DATABRICKS_TOKEN")
-    if not token:
-        raise ValueError("DATABRICKS_TOKEN environment variable is not set")
-    
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {token}"
-    }
-    
-    # Format the prompt with category name and data
-    prompt = f"""I will provide you with data from a specific category in the Apple Health app. Your task is to analyze the data and detect any significant patterns, trends, or anomalies. Please give a TWO SENTENCE summary and suggest potential correlations or insights that are useful. Only include normal sentence structure and do not go longer than TWO SENTENCES.
-
-Category: {category_name}
-
-Data:
-{category_data}
-"""
-    
-    payload = {
-        "max_tokens": 200,
-        "messages": [
-            {
-                "content": prompt,
-                "role": "user"
-            }
-        ],
-        "temperature": 0.1
-    }
-    
-    try:
-        response = requests.post(url, headers=headers, json=payload)
-        if response.status_code == 200:
-            # Assuming the insight is in 'choices[0].message.content' (adjust if different)
-            data = response.json()
-            insight = data.get("choices", [{}])[0].get("message", {}).get("content", "No insight found")
-            return insight
-        else:
-            raise Exception(f"API request failed with status {response.status_code}: {response.text}")
-    except Exception as e:
-        return f"Error generating insight: {str(e)}"
+# Background executor for the upload pipeline
+pipelineJobs = JobManager()
+
+def prewarm():
+    for name in HEAVY_MODULES:
+        importlib.import_module(name)
+
+if PREWARM:
+    threading.Thread(target=prewarm, name="prewarm", daemon=True).start()
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    # Opt-in cProfile of this request (PROFILE=all, or PROFILE=header and X-Profile: 1)
+    g.profile = instrumentation.Profile(f"request-{request.endpoint or 'unknown'}").start() if instrumentation.profile_requested(request.headers) else None
+
+@app.after_request
+def record_request(response):
+    instrumentation.observe(
+        "http_request_seconds", time.perf_counter() - g.request_start,
+        endpoint=request.endpoint or "unknown", method=request.method, status=response.status_code,
+    )
+    profile = g.pop("profile", None)
+    if profile is not None and profile.stop():
+        response.headers["X-Profile-File"] = profile.path
+    return response
+
+# Runs before record_request (after_request functions run in reverse), so its time is included
+@app.after_request
+def compress(response):
+    # gzip, or brotli when it is installed, for clients that accept it
+    return compress_response(response, request.headers.get("Accept-Encoding"))
+
+@app.teardown_request
+def stop_request_profile(error=None):
+    # Requests that failed before after_request still have to release the profiler
+    profile = g.pop("profile", None)
+    if profile is not None:
+        profile.stop()
 
 allowed_files = {"xlsx", "csv", "xml"}
 
@@ -85,49 +72,56 @@ def allowed_file(filename):
 
 def generate_future_dates(last_date, num_days):
     future_dates = []
-    current_date = last_date + pd.Timedelta(days=1)
+    current_date = last_date + timedelta(days=1)
     for _ in range(num_days):
         future_dates.append(current_date.strftime('%Y-%m-%d'))  # Already in YYYY-MM-DD format
-        current_date += pd.Timedelta(days=1)
+        current_date += timedelta(days=1)
     return future_dates
 
-def predict_future_weights(model, last_sequence, num_steps, data_min, data_max):
-    predicted_weights = []
-    current_sequence = ((last_sequence - data_min) / (data_max - data_min)).tolist()
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    for _ in range(num_steps):
-        input_tensor = torch.tensor(current_sequence[-30:]).to(device).unsqueeze(-1).float()  # Shape: [30, 1]
-        input_tensor = input_tensor.unsqueeze(0)  # Shape: [1, 30, 1]
-        model.eval()
-        with torch.no_grad():
-            output = model(input_tensor)
-        predicted_value = output.item() * (data_max - data_min) + data_min
-        predicted_weights.append(round(float((predicted_value))))  # Round to nearest whole number
-        normalized_predicted_value = (predicted_value - data_min) / (data_max - data_min)
-        current_sequence.append(normalized_predicted_value)
-    return predicted_weights
-
 @app.route("/")
 def index():
     return app.send_static_file("index.html")
 
+# Decimals kept for historical weights in the columnar payload
+WEIGHT_DECIMALS = 1
+
 @app.route("/weight", methods=["POST"])
 def analyze_weight():
+    import pandas as pd
+    import charts
+    import forecasters
+
     print("Received weight analysis request")
     try:
-        file = request.files.get("file")
-        print(f"File received: {file.filename if file else 'No file'}")
+        try:
+            upload = StreamedUpload(request)
+        except UploadTooLarge as e:
+            return jsonify({"error": str(e)}), 413
+        except UploadError as e:
+            return jsonify({"error": str(e)}), 400
+        print(f"File received: {upload.filename or 'No file'}")
         
-        if file is None or file.filename == "":
+        if not upload.filename:
             return jsonify({"error": "No file uploaded"}), 400
             
         try:
-            # Read file content
-            file_content = file.read()
-            if file.filename.endswith('.csv'):
-                df = pd.read_csv(io.BytesIO(file_content))
-            else:
-                df = pd.read_excel(io.BytesIO(file_content))
+            # CSV is parsed in chunks straight off the request stream; Excel needs the whole
+            # workbook, so it is spooled (to disk once it gets large) and read from there
+            with instrumentation.span("weight_parse"):
+                if upload.filename.endswith('.csv'):
+                    reader = pd.read_csv(
+                        io.BufferedReader(ChunkReader(upload.chunks())),
+                        usecols=lambda column: column in ("Date", "Weight"),
+                        chunksize=CSV_CHUNK_ROWS,
+                    )
+                    df = pd.concat(reader, ignore_index=True)
+                else:
+                    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as workbook:
+                        for chunk in upload.chunks():
+                            workbook.write(chunk)
+                        workbook.seek(0)
+                        df = pd.read_excel(workbook)
+            upload.drain()
             
             # Set the 'Date' column as the index
             if 'Date' in df.columns:
@@ -138,47 +132,56 @@ def analyze_weight():
             
             print(f"File processed, shape: {df.shape}")
 
-            # Configure device
-            device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-            print(f"Using device: {device}")
-
-            # Process data with fixed window size of 30
-            X_train, X_test, y_train, y_test, df, data_min, data_max = RNN_model.load_and_preprocess_data_from_df(df, window_size=30)
-            train_loader, test_loader = RNN_model.prepare_data_loaders(X_train, X_test, y_train, y_test)
-
-            # Initialize and train model
-            model = RNN_model.Weight_Model().to(device)
-            loss_fn = nn.MSELoss()
-            optimizer = Adam(model.parameters(), lr=0.001)
-
-            print("Training model...")
-            RNN_model.train_model(model, train_loader, loss_fn, optimizer, num_epochs=100)
-
-            # Get single prediction using the original logic
-            historical_weights = df['Weight'].values
-            weight_tensor = torch.tensor(historical_weights).to(torch.float32)
-            new_data = weight_tensor[-30:]
-            predicted_weight = RNN_model.predict_weight(model, new_data, data_min, data_max)
-
-            # Get multi-step predictions for the chart
+            # The forecaster is picked per series (?model= forces one, see forecasters.FORECASTERS);
+            # the LSTM is only trained when it beats the statistical baselines on a backtest.
+            # Clients may tighten its training budget with ?max_epochs= / ?max_seconds=
             num_steps = 30  # Predict next 30 days
-            predicted_weights = predict_future_weights(model, new_data, num_steps, data_min, data_max)
+            forecast = forecasters.forecast_series(
+                df['Weight'].values,
+                num_steps,
+                policy=request.args.get("model", forecasters.FORECASTER),
+                max_epochs=request.args.get("max_epochs", type=int),
+                max_seconds=request.args.get("max_seconds", type=float),
+            )
+            print(f"Forecast with {forecast.model}")
+
+            # One forecast gives both the headline (next step) and the chart series
+            predicted_weight = forecast.values[0]
+            predicted_weights = [round(weight) for weight in forecast.values.tolist()]  # Round to nearest whole number
             
             last_date = pd.to_datetime(df.index[-1])
             future_dates = generate_future_dates(last_date, num_steps)
-            
+            message = f"Your predicted weight is {round(float(predicted_weight))} lbs in 30 days."
+
+            # ?format=columnar sends each series as start + step + values (see charts.columnar_series),
+            # and ?points= thins the history out with LTTB to about the chart's width in pixels
+            points = request.args.get("points", type=int)
+            if request.args.get("format") == "columnar":
+                return jsonify({
+                    "message": message,
+                    "historical": charts.columnar_series(df.index, df['Weight'].to_numpy(), points=points, decimals=WEIGHT_DECIMALS),
+                    "predicted": charts.columnar_series(pd.to_datetime(future_dates), predicted_weights),
+                    "model": forecast.model
+                })
+
+            dates, weights = df.index, df['Weight'].to_numpy(dtype=float)
+            if points:
+                kept = charts.lttb((dates - dates[0]).days.to_numpy(), weights, points)
+                dates, weights = dates[kept], weights[kept]
             # Ensure historical dates are in YYYY-MM-DD format without time
-            historical = [{'date': date.strftime('%Y-%m-%d'), 'weight': float(weight)} for date, weight in zip(df.index, df['Weight'])]
+            historical = [{'date': date, 'weight': weight} for date, weight in zip(dates.strftime('%Y-%m-%d'), weights.tolist())]
             predicted = [{'date': date_str, 'weight': weight} for date_str, weight in zip(future_dates, predicted_weights)]
             
             # Prepare the response with the message and chart data
-            message = f"Your predicted weight is {round(float(predicted_weight))} lbs in 30 days."
             return jsonify({
                 "message": message,
                 "historical": historical,
-                "predicted": predicted
+                "predicted": predicted,
+                "model": forecast.model
             })
 
+        except UploadTooLarge as e:
+            return jsonify({"error": str(e)}), 413
         except Exception as e:
             print(f"Error processing file: {str(e)}")
             return jsonify({"error": f"Error processing file: {str(e)}"}), 400
@@ -188,118 +191,231 @@ def analyze_weight():
         return jsonify({"error": f"Server error: {str(e)}"}), 500
 
       
-UPLOAD_FOLDER = "appleHealth/"
-AGGREGATED_DIR = "aggregated/"
+# Insights are generated from a digest of each metric's weekly rollup
+AGGREGATED_DIR = "weekly"
+# Metrics sent for insights: "all" (every record type in the store) or a comma-separated list
+INSIGHT_METRICS = os.getenv("INSIGHT_METRICS", "all")
+
+def request_workspace(create=False):
+    # Sessions are identified by the X-Session-Id header (or ?session= for plain links)
+    session_id = request.headers.get(SESSION_HEADER) or request.args.get("session")
+    return get_workspace(session_id, create=create)
+
+def store_stage(context):
+    # The upload was parsed into staged parts while it streamed in; only moving them into the
+    # store and advancing the watermarks needs the session's lock
+    with context["workspace"].lock():
+        return context["record_filter"].commit()
+
+def aggregate_stage(context):
+    from aggregate import aggregateAll
+
+    # One pass per record type produces the daily, weekly and monthly rollups
+    workspace = context["workspace"]
+    with workspace.lock():
+        aggregateAll(input_dir=workspace.export_dir, output_dir=workspace.aggregated_dir, since=None if context["full_rebuild"] else context["store"])
+
+def insights_stage(context):
+    import record_store
+    from aggregate import load_rollup
+    from digest import digest_rollup
+    from insights import get_client
+
+    workspace = context["workspace"]
+    if INSIGHT_METRICS == "all":
+        metrics = record_store.list_types(workspace.export_dir)
+    else:
+        metrics = [metric.strip().lower() for metric in INSIGHT_METRICS.split(",") if metric.strip()]
+
+    # Each metric's history is condensed into a digest of bounded size, so the prompts (and the
+    # model's latency) don't grow with the years of data. All requests are in flight at once
+    insights = {}
+    categories = {}
+    with instrumentation.span("digest"):
+        for category_name in metrics:
+            csv_file = f"{category_name}.csv"
+            category_data = load_rollup(category_name, AGGREGATED_DIR, workspace.aggregated_dir)
+            if category_data is not None:
+                categories[csv_file] = (category_name, digest_rollup(category_name, category_data, AGGREGATED_DIR))
+            else:
+                insights[csv_file] = f"File not found: {csv_file}"
+
+    insights.update(get_client().category_insights(categories))
+    insights = {f"{category_name}.csv": insights[f"{category_name}.csv"] for category_name in metrics}
+    print(insights)
+
+    # Save insights with the session so any worker can serve /overallInsights
+    workspace.save_insights(insights)
+    return {"message": "Insights generated successfully.", "insights": insights}
+
+# Records are filtered into staged parts while the upload streams in; the rest runs as a job
+UPLOAD_STAGES = [("store", store_stage), ("aggregate", aggregate_stage), ("insights", insights_stage)]
 
 @app.route("/appleDataUpload", methods=["POST"])
 def appleDataUpload():
-    file = request.files.get("file")
+    from filterData import RecordFilter
+
+    try:
+        upload = StreamedUpload(request)
+    except UploadTooLarge as e:
+        return jsonify({"error": str(e)}), 413
+    except UploadError as e:
+        return jsonify({"error": str(e)}), 400
     # Validate file
-    if file is None or file.filename == "":
+    if not upload.filename:
         return jsonify({"error": "No file uploaded"}), 400
-    if not file.filename.endswith('.xml'):
-        return jsonify({"error": "File type not allowed. Please upload an XML file."}), 400
-
-    # Define the fixed filename
-    fixed_filename = "uploadData.xml"
-    file_path = os.path.join(UPLOAD_FOLDER, fixed_filename)
-
-    # Save the file to the upload folder with the fixed filename
+    if not upload.filename.endswith(('.xml', '.zip')):
+        return jsonify({"error": "File type not allowed. Please upload an XML file or the zipped Health export."}), 400
+
+    # Uploads without a known session start a new one
+    workspace = request_workspace(create=True)
+    full_rebuild = request.args.get("full") == "1"
+
+    # Parse the XML while it is still uploading (unzipping it on the fly for export.zip), staging
+    # its records in parts nobody reads yet. Only records newer than the previous upload are
+    # ingested, unless a full rebuild was requested. The workspace lock isn't held here, so a
+    # slow client never blocks the session's other jobs; the job commits the parts under it
+    chunks = upload.chunks()
+    if upload.filename.endswith('.zip'):
+        chunks = iter_zip_member(chunks, "export.xml")
     try:
-        file.save(file_path)
-        
-        global globalSavedInsights
-
-        #Erroring function
-        filterData()
-        aggregateWeekly()
-
-        # Generate insights from specific CSV files
-        insights = {}
-        specific_files = ["activeenergyburned.csv", "heartrate.csv", "stepcount.csv"]
-
-        for csv_file in specific_files:
-            csv_path = os.path.join(AGGREGATED_DIR, csv_file)
-            if os.path.exists(csv_path):
-                with open(csv_path, "r") as f:
-                    category_data = f.read()
-                category_name = os.path.splitext(csv_file)[0]
-                insight = get_databricks_insight(category_name, category_data)
-                insights[csv_file] = insight
-                print(insights)
-            else:
-                insights[csv_file] = f"File not found: {csv_file}"
-            # Return success message and insights
-
-            #Cache insights
-            globalSavedInsights = insights
-        return jsonify({
-                "message": f"File uploaded successfully as '{fixed_filename}' to '{file_path}'.",
-                "insights": insights
-        }), 200
+        with instrumentation.span("filter"):
+            record_filter = RecordFilter(export_dir=workspace.export_dir, incremental=not full_rebuild)
+            try:
+                for chunk in chunks:
+                    record_filter.feed(chunk)
+            except Exception:
+                record_filter.abort()
+                raise
+            record_filter.finish()
+        upload.drain()
+    except UploadTooLarge as e:
+        return jsonify({"error": str(e)}), 413
+    except UploadError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
-        return jsonify({"error": f"Error saving file: {str(e)}"}), 500
-    
+        return jsonify({"error": f"Error reading upload: {str(e)}"}), 500
+
+    # Hand the store -> aggregate -> insights pipeline to a background job
+    job = pipelineJobs.submit(
+        UPLOAD_STAGES,
+        {"workspace": workspace, "record_filter": record_filter, "full_rebuild": full_rebuild, "profile": g.get("profile") is not None},
+        on_update=workspace.save_job,
+    )
+    return jsonify({
+            "message": f"File uploaded successfully, processing as job '{job.id}'.",
+            "session_id": workspace.id,
+            "status_url": f"/jobs/{job.id}",
+            **job.to_dict()
+    }), 202
+
 MAX_WAIT_TIME = 60  # Maximum wait time in seconds
-CHECK_INTERVAL = 1  # How often to check (in seconds)
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def jobStatus(job_id):
+    workspace = request_workspace()
+    state = workspace.load_job(job_id) if workspace is not None else None
+    if state is None:
+        return jsonify({"error": f"Unknown job '{job_id}'"}), 404
+
+    # Long-poll: ?wait=<seconds> blocks until the job moves past ?since=<version> or finishes
+    wait = min(request.args.get("wait", 0, type=float), MAX_WAIT_TIME)
+
+    # Jobs started by another worker can only be followed through their saved state
+    job = pipelineJobs.get(job_id)
+    if job is None:
+        if wait > 0:
+            state = workspace.wait_for_job(job_id, wait, request.args.get("since", type=int)) or state
+        return jsonify(state)
+
+    if wait > 0 and not job.done:
+        job.wait(wait, request.args.get("since", type=int))
+    return jsonify(job.to_dict())
+
+def metric_index(metric):
+    # Index of one metric in the requesting session's store, or an error response
+    import query
+
+    workspace = request_workspace()
+    if workspace is None:
+        return None, (jsonify({"error": "Unknown session, upload your data first"}), 404)
+    index = query.cache.get(metric, workspace.export_dir)
+    if index is None:
+        return None, (jsonify({"error": f"No records for metric '{metric}'"}), 404)
+    return index, None
+
+def time_range():
+    # ?start= / ?end= as ISO dates or datetimes (local time, end exclusive)
+    import query
+
+    start, end = request.args.get("start"), request.args.get("end")
+    return (query.parse_time(start) if start else None), (query.parse_time(end) if end else None)
+
+@app.route("/records/<metric>", methods=["GET"])
+def records(metric):
+    import query
+
+    index, error = metric_index(metric)
+    if error is not None:
+        return error
+    try:
+        start, end = time_range()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    limit = max(0, min(request.args.get("limit", query.MAX_RECORDS, type=int), query.MAX_RECORDS))
+    return jsonify({"metric": metric.lower(), **index.records(start, end, limit)})
+
+@app.route("/records/<metric>/series", methods=["GET"])
+def recordSeries(metric):
+    # Downsampled series: ?resolution=15min|1h|1D|7D..., or ?points=N spread over the range
+    import query
+
+    index, error = metric_index(metric)
+    if error is not None:
+        return error
+    try:
+        start, end = time_range()
+        points = request.args.get("points", type=int)
+        if points:
+            width = index.resolution_for(points, start, end)
+        else:
+            width = query.parse_resolution(request.args.get("resolution", "1D"))
+        series = index.series(width, request.args.get("stat", "mean"), start, end)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"metric": metric.lower(), **series})
 
 @app.route("/overallInsights", methods=["GET"])
 def overallInsights():
-    # Start a timer to track how long we've waited
-    start_time = time.time()
-    print(f"GLOBALINSIGHTS: {globalSavedInsights}")
-    
-    # Wait until globalSavedInsights is set or timeout occurs
-    while not globalSavedInsights:
-        if time.time() - start_time > MAX_WAIT_TIME:
-            return jsonify({"error": "Timeout waiting for insights"}), 500
-        time.sleep(CHECK_INTERVAL)
-    
-    # Once globalSavedInsights is set, proceed with the API call
-    url = "https://dbc-81784a62-a9c5.cloud.databricks.com/serving-endpoints/QuackHacks_Health_Insights/invocations"
-    
-    # Retrieve token from environment variable
-    token = os.getenv("DATABRICKS_TOKEN")
-    if not token:
-        raise ValueError("DATABRICKS_TOKEN environment variable is not set")
-
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {token}"
-    }
-
-    print(f"GLOBALINSIGHTS: {globalSavedInsights}")
-
-    # Format the prompt with the insights
-    prompt = f"""
-        Here is a list of all of the health insights which are derived from Apple Watch Data. Tell me the overall standing of my health according to these insights in TWO SENTENCES. Use normal sentence format only.
-
-        Insights:
-        {globalSavedInsights} 
-    """
-
-    payload = {
-        "max_tokens": 200,
-        "messages": [
-            {
-                "content": prompt,
-                "role": "user"
-            }
-        ],
-        "temperature": 0.1
-    }
+    from insights import get_client
+
+    workspace = request_workspace()
+    if workspace is None:
+        return jsonify({"error": "Unknown session, upload your data first"}), 404
+
+    # Wait until insights have been generated or timeout occurs
+    insights = workspace.wait_for_insights(MAX_WAIT_TIME)
+    if insights is None:
+        return jsonify({"error": "Timeout waiting for insights"}), 500
+
+    # Once the session's insights are available, proceed with the API call
+    print(f"INSIGHTS ({workspace.id}): {insights}")
+    return get_client().overall_insight(insights)
+
+@app.route("/insightCacheStats", methods=["GET"])
+def insightCacheStats():
+    from insights import get_client
+
+    cache = get_client().cache
+    if cache is None:
+        return jsonify({"error": "Insight cache is disabled"}), 404
+    return jsonify(cache.stats())
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    # Prometheus text exposition of the stage spans, counters and memory gauges
+    return Response(instrumentation.registry.render(), mimetype="text/plain; version=0.0.4")
 
-    try:
-        response = requests.post(url, headers=headers, json=payload)
-        if response.status_code == 200:
-            data = response.json()
-            insight = data.get("choices", [{}])[0].get("message", {}).get("content", "No overall insight found")
-            return insight
-        else:
-            raise Exception(f"API request failed with status {response.status_code}: {response.text}")
-    except Exception as e:
-        return f"Error generating insight: {str(e)}"
-    
 @app.route("/heartbeat", methods=["GET"])
 def heartbeat():
     return jsonify({"message": "Success!"})
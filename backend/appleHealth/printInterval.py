@@ -1,20 +1,16 @@
 import pandas as pd
 import os
+import sys
 
-data_dir = "export"  # folder with your CSVs
-intervals = []
-
-for file in os.listdir(data_dir):
-    if not file.endswith(".csv"):
-        continue
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import record_store  # noqa: E402
 
-    path = os.path.join(data_dir, file)
-    df = pd.read_csv(path)
-
-    if "startDate" not in df.columns:
-        continue
+data_dir = record_store.EXPORT_DIR  # columnar store written by filterData
+intervals = []
 
-    df["startDate"] = pd.to_datetime(df["startDate"], errors="coerce")
+for file in record_store.list_types(data_dir):
+    # startDate is stored pre-parsed, so read just that column
+    df = record_store.read_records(file, columns=["startDate"], export_dir=data_dir)
     df = df.dropna(subset=["startDate"]).sort_values("startDate")
 
     if len(df) < 2:
@@ -0,0 +1,244 @@
+import os
+import math
+import time
+import queue
+import threading
+from concurrent.futures import Future
+
+import torch
+from torch import nn
+
+import RNN_model
+
+# Pending /weight trainings are grouped and trained together when this is enabled
+BATCH_TRAINING = os.getenv("WEIGHT_BATCH_TRAINING", "0") == "1"
+MAX_BATCH_MODELS = int(os.getenv("WEIGHT_BATCH_MAX_MODELS", "32"))
+# How long the first queued job waits for others to join its group, in seconds
+MAX_BATCH_WAIT = float(os.getenv("WEIGHT_BATCH_MAX_WAIT", "0.05"))
+# A request waits this much past its own time budget for its model (or this long in all without
+# a budget) before training it by itself instead
+RESULT_GRACE = float(os.getenv("WEIGHT_BATCH_RESULT_GRACE", "10"))
+MAX_RESULT_WAIT = float(os.getenv("WEIGHT_BATCH_MAX_RESULT_WAIT", "600"))
+
+_LSTM_PARAMS = ["weight_ih_l{}", "weight_hh_l{}", "bias_ih_l{}", "bias_hh_l{}"]
+
+
+class GroupedWeightModel(nn.Module):
+    """M independent Weight_Models evaluated as one network.
+
+    Every parameter of Weight_Model is stacked along a leading model dimension, and the LSTM
+    recurrences use batched matmuls over it, so one forward/backward pass trains all M models.
+    Gate layout matches nn.LSTM (input, forget, cell, output), which lets state dicts move
+    between the two in both directions.
+    """
+
+    def __init__(self, models):
+        super().__init__()
+        lstm = models[0].model[0]
+        self.num_layers = lstm.num_layers
+        self.hidden_size = lstm.hidden_size
+        states = [model.state_dict() for model in models]
+        self.params = nn.ParameterDict({
+            name.replace(".", "_"): nn.Parameter(torch.stack([state[name] for state in states]).clone())
+            for name in states[0]
+        })
+        self.names = list(states[0])
+
+    def _param(self, name):
+        return self.params[name.replace(".", "_")]
+
+    def forward(self, x):
+        # x: [models, batch, window, 1] -> [models, batch, 1]
+        layer_input = x
+        for layer in range(self.num_layers):
+            w_ih, w_hh, b_ih, b_hh = (self._param(f"model.0.{name.format(layer)}") for name in _LSTM_PARAMS)
+            # Input projections for every timestep at once; only the recurrence is sequential
+            projected = torch.einsum("mbti,mgi->mbtg", layer_input, w_ih) + (b_ih + b_hh)[:, None, None, :]
+            num_models, batch, _, _ = projected.shape
+            h = projected.new_zeros(num_models, batch, self.hidden_size)
+            c = projected.new_zeros(num_models, batch, self.hidden_size)
+            w_hh_t = w_hh.transpose(1, 2).contiguous()
+            last_layer = layer == self.num_layers - 1
+            outputs = []
+            # unbind rather than indexing per step: its backward is one stack, not a zero-filled
+            # gradient of the whole projection for every timestep
+            for step_input in projected.unbind(dim=2):
+                i, f, g, o = torch.baddbmm(step_input, h, w_hh_t).chunk(4, dim=-1)
+                c = torch.sigmoid(f) * c + torch.sigmoid(i) * torch.tanh(g)
+                h = torch.sigmoid(o) * torch.tanh(c)
+                if not last_layer:
+                    outputs.append(h)
+            if not last_layer:
+                layer_input = torch.stack(outputs, dim=2)
+        weight, bias = self._param("model.1.weight"), self._param("model.1.bias")
+        return torch.bmm(h, weight.transpose(1, 2)) + bias[:, None, :]
+
+    def state_dicts(self):
+        """Split the stacked parameters back into one Weight_Model state dict per model."""
+        count = next(iter(self.params.values())).shape[0]
+        return [{name: self._param(name)[m].detach().clone() for name in self.names} for m in range(count)]
+
+
+def _pad(tensors):
+    # Stack variable-length datasets into [models, max_len, ...] plus their lengths
+    lengths = torch.tensor([len(t) for t in tensors])
+    padded = tensors[0].new_zeros((len(tensors), int(lengths.max())) + tuple(tensors[0].shape[1:]))
+    for m, t in enumerate(tensors):
+        padded[m, :len(t)] = t
+    return padded, lengths
+
+
+def result_timeout(max_seconds):
+    """How long a request with a max_seconds training budget waits on BatchTrainer's Future."""
+    if max_seconds is None:
+        return MAX_RESULT_WAIT
+    return min(max_seconds + MAX_BATCH_WAIT + RESULT_GRACE, MAX_RESULT_WAIT)
+
+
+def _unstacked(best_params, names, m):
+    model = RNN_model.Weight_Model().to(RNN_model.device)
+    model.load_state_dict({name: best_params[name.replace(".", "_")][m].detach().clone() for name in names})
+    model.eval()
+    return model
+
+
+def train_grouped(datasets, num_epochs=100, batch_size=32, lr=0.001, patience=15, min_epochs=20, deadlines=None, on_done=None):
+    """Train one Weight_Model per (X_train, X_test, y_train, y_test) dataset in a single grouped pass.
+
+    Each model only ever sees its own data: every step draws batch_size windows per model from
+    that model's training set, the loss is the sum of the per-model mean losses (so gradients
+    don't mix), and Adam's element-wise updates keep the stacked parameters independent.
+
+    Each model is done once it plateaus on its own held-out windows ("converged"), once its
+    deadline (a time.monotonic() value, or None) has passed ("time"), or after num_epochs
+    ("epochs"), like RNN_model.train_model. A done model keeps its best weights so far and is
+    handed to on_done(m, model, epochs, stop) right away; the pass ends when every model is done.
+    Returns a list of (model, epochs, stop) in dataset order.
+    """
+    device = RNN_model.device
+    group = GroupedWeightModel([RNN_model.Weight_Model() for _ in datasets]).to(device)
+    optimizer = torch.optim.Adam(group.parameters(), lr=lr)
+    deadlines = deadlines or [None] * len(datasets)
+
+    X_train, train_lengths = _pad([d[0].reshape(len(d[0]), -1) for d in datasets])
+    y_train, _ = _pad([d[2] for d in datasets])
+    X_test, test_lengths = _pad([d[1].reshape(len(d[1]), -1) for d in datasets])
+    y_test, _ = _pad([d[3] for d in datasets])
+    X_train, y_train, X_test, y_test = X_train.to(device), y_train.to(device), X_test.to(device), y_test.to(device)
+    train_lengths, test_lengths = train_lengths.to(device), test_lengths.to(device)
+    test_mask = (torch.arange(X_test.shape[1], device=device)[None, :] < test_lengths[:, None]).float()
+
+    num_models = len(datasets)
+    model_index = torch.arange(num_models, device=device)[:, None]
+    steps_per_epoch = math.ceil(int(train_lengths.max()) / batch_size)
+    best_loss = torch.full((num_models,), math.inf, device=device)
+    best_params = {name: p.detach().clone() for name, p in group.params.items()}
+    stale = torch.zeros(num_models, dtype=torch.long, device=device)
+    results = [None] * num_models
+
+    def finish(m, epoch, stop):
+        results[m] = (_unstacked(best_params, group.names, m), epoch, stop)
+        if on_done is not None:
+            on_done(m, *results[m])
+
+    for epoch in range(1, num_epochs + 1):
+        for _ in range(steps_per_epoch):
+            idx = (torch.rand(num_models, batch_size, device=device) * train_lengths[:, None]).long()
+            X_batch = X_train[model_index, idx].unsqueeze(-1)
+            y_hat = group(X_batch).squeeze(-1)
+            loss = ((y_hat - y_train[model_index, idx]) ** 2).mean(dim=1).sum()
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+
+        with torch.no_grad():
+            errors = (group(X_test.unsqueeze(-1)).squeeze(-1) - y_test) ** 2
+            val_loss = (errors * test_mask).sum(dim=1) / test_lengths
+            improved = val_loss < best_loss - 1e-5
+            best_loss = torch.where(improved, val_loss, best_loss)
+            for name, p in group.params.items():
+                mask = improved.view(-1, *([1] * (p.dim() - 1)))
+                best_params[name] = torch.where(mask, p.detach(), best_params[name])
+            if epoch > min_epochs:
+                stale = torch.where(improved, torch.zeros_like(stale), stale + 1)
+            converged = (stale >= patience).tolist()
+
+        now = time.monotonic()
+        for m in range(num_models):
+            if results[m] is not None:
+                continue
+            if converged[m]:
+                finish(m, epoch, "converged")
+            elif deadlines[m] is not None and now > deadlines[m]:
+                finish(m, epoch, "time")
+            elif epoch == num_epochs:
+                finish(m, epoch, "epochs")
+        if all(result is not None for result in results):
+            break
+    return results
+
+
+class BatchTrainer:
+    """Queues training requests and trains whatever is pending together on a background thread."""
+
+    def __init__(self, max_models=MAX_BATCH_MODELS, max_wait=MAX_BATCH_WAIT, **train_kwargs):
+        self.max_models = max_models
+        self.max_wait = max_wait
+        self.train_kwargs = train_kwargs
+        self.pending = queue.Queue()
+        self.thread = threading.Thread(target=self._loop, name="weight-batch-trainer", daemon=True)
+        self.thread.start()
+
+    def submit(self, X_train, X_test, y_train, y_test, max_seconds=None):
+        """Queue one dataset; the returned Future resolves to (Weight_Model, epochs, stop).
+
+        max_seconds bounds the training from now, time spent in the queue included. A Future
+        cancelled before its group starts is left out of it.
+        """
+        future = Future()
+        deadline = time.monotonic() + max_seconds if max_seconds is not None else None
+        self.pending.put(((X_train, X_test, y_train, y_test), deadline, future))
+        return future
+
+    def _loop(self):
+        while True:
+            jobs = [self.pending.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(jobs) < self.max_models:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    jobs.append(self.pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            # Group by window length, since a group shares one input shape
+            groups = {}
+            for dataset, deadline, future in jobs:
+                if future.set_running_or_notify_cancel():
+                    groups.setdefault(tuple(dataset[0].shape[1:]), []).append((dataset, deadline, future))
+            for group in groups.values():
+                futures = [future for _, _, future in group]
+                try:
+                    train_grouped(
+                        [dataset for dataset, _, _ in group], deadlines=[deadline for _, deadline, _ in group],
+                        on_done=lambda m, *result: futures[m].set_result(result), **self.train_kwargs,
+                    )
+                except Exception as e:
+                    for future in futures:
+                        if not future.done():
+                            future.set_exception(e)
+
+
+_trainer = None
+_trainer_lock = threading.Lock()
+
+
+def get_trainer(**train_kwargs):
+    """Shared BatchTrainer for the process; train_kwargs only apply when it is first created."""
+    global _trainer
+    with _trainer_lock:
+        if _trainer is None:
+            _trainer = BatchTrainer(**train_kwargs)
+        return _trainer
@@ -0,0 +1,68 @@
+"""Scaling benchmark for aggregateAll across worker counts.
+
+Usage (from backend/):
+    python benchmarks/bench_aggregate.py --size-mb 512 --workers 1 2 4 8
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from benchmarks.synthetic import write_health_export  # noqa: E402
+from filterData import filterData  # noqa: E402
+from aggregate import aggregateAll  # noqa: E402
+
+
+def digest_tree(root):
+    digest = hashlib.sha256()
+    for dirpath, _, filenames in sorted(os.walk(root)):
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            digest.update(os.path.relpath(path, root).encode())
+            with open(path, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=256)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--threads", action="store_true", help="use a thread pool instead of processes")
+    parser.add_argument("--workdir", default=None)
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="bench_aggregate_")
+    xml_path = os.path.join(workdir, "export.xml")
+    export_dir = os.path.join(workdir, "export")
+    if not os.path.exists(xml_path):
+        print(f"Generating {args.size_mb} MB synthetic export at {xml_path}...")
+        write_health_export(xml_path, args.size_mb)
+    if not os.path.isdir(export_dir):
+        filterData(xml_path=xml_path, export_dir=export_dir)
+
+    baseline = None
+    results = []
+    for workers in args.workers:
+        output_dir = os.path.join(workdir, f"aggregated_{workers}")
+        shutil.rmtree(output_dir, ignore_errors=True)
+        start = time.perf_counter()
+        aggregateAll(input_dir=export_dir, output_dir=output_dir, workers=workers, use_threads=args.threads)
+        elapsed = time.perf_counter() - start
+
+        digest = digest_tree(output_dir)
+        baseline = baseline or (elapsed, digest)
+        results.append((workers, elapsed, baseline[0] / elapsed, digest == baseline[1]))
+
+    print(f"{'workers':>8} {'seconds':>8} {'speedup':>8} {'identical':>10}")
+    for workers, elapsed, speedup, identical in results:
+        print(f"{workers:>8} {elapsed:>8.2f} {speedup:>7.2f}x {str(identical):>10}")
+
+
+if __name__ == "__main__":
+    main()
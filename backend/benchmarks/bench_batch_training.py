@@ -0,0 +1,69 @@
+"""Weight model training throughput: one model per request vs batch_training's grouped pass.
+
+Both paths train every series for the same fixed number of epochs (early stopping disabled),
+so the models/second numbers compare like for like.
+
+Usage (from backend/):
+    python benchmarks/bench_batch_training.py --models 1 4 16 --days 365 --epochs 5
+"""
+import argparse
+import os
+import sys
+import time
+
+import torch
+from torch import nn
+from torch.optim import Adam
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import RNN_model  # noqa: E402
+import batch_training  # noqa: E402
+from benchmarks.synthetic import weight_series  # noqa: E402
+
+
+def datasets_for(count, days):
+    return [RNN_model.load_and_preprocess_data_from_df(weight_series(days, seed=seed))[:4] for seed in range(count)]
+
+
+def train_per_request(datasets, epochs):
+    for X_train, X_test, y_train, y_test in datasets:
+        train_loader, test_loader = RNN_model.prepare_data_loaders(X_train, X_test, y_train, y_test)
+        model = RNN_model.Weight_Model().to(RNN_model.device)
+        RNN_model.train_model(
+            model, train_loader, nn.MSELoss(), Adam(model.parameters(), lr=0.001), num_epochs=epochs,
+            val_loader=test_loader, patience=epochs + 1, min_epochs=epochs,
+        )
+
+
+def train_batched(datasets, epochs):
+    batch_training.train_grouped(datasets, num_epochs=epochs, patience=epochs + 1, min_epochs=epochs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--models", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--epochs", type=int, default=5)
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    # Warm up both paths so one-off initialization doesn't land on the first row
+    warmup = datasets_for(1, args.days)
+    train_per_request(warmup, 1)
+    train_batched(warmup, 1)
+
+    print(f"{'models':>7} {'per-request models/s':>21} {'batched models/s':>17} {'speedup':>8}")
+    for count in args.models:
+        datasets = datasets_for(count, args.days)
+        timings = {}
+        for name, fn in (("per-request", train_per_request), ("batched", train_batched)):
+            start = time.perf_counter()
+            fn(datasets, args.epochs)
+            timings[name] = time.perf_counter() - start
+        print(f"{count:>7} {count / timings['per-request']:>21.2f} {count / timings['batched']:>17.2f} "
+              f"{timings['per-request'] / timings['batched']:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
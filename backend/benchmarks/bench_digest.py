@@ -0,0 +1,54 @@
+"""Insight prompt size and digest time for one metric as its history grows, raw rollup vs digest.
+
+Usage (from backend/):
+    python benchmarks/bench_digest.py --years 1 5 20 --resolution weekly
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import aggregate  # noqa: E402
+import digest  # noqa: E402
+from insights import CATEGORY_PROMPT  # noqa: E402
+
+
+def heart_rate_records(years, seed=0, per_day=150):
+    # Readings spread over each day, with a slow drift and a seasonal swing in the resting level
+    rng = np.random.default_rng(seed)
+    days = 365 * years
+    day = np.repeat(np.arange(days), per_day)
+    start = pd.Timestamp("2000-01-01") + pd.to_timedelta(day, unit="D") + pd.to_timedelta(rng.integers(0, 86400, len(day)), unit="s")
+    level = 72 + 3 * np.sin(2 * np.pi * day / 365) - 2 * day / days
+    return pd.DataFrame({"startDate": start, "value": level + rng.normal(0, 12, len(day))})
+
+
+def prompt_bytes(data):
+    return len(CATEGORY_PROMPT.format(category_name="heartrate", category_data=data).encode())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--years", type=int, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--resolution", default="weekly", choices=list(aggregate.RESOLUTIONS))
+    parser.add_argument("--max-bytes", type=int, default=digest.DIGEST_MAX_BYTES)
+    args = parser.parse_args()
+
+    print(f"{'years':>5} {'rows':>6} {'raw prompt B':>13} {'digest prompt B':>16} {'digest ms':>10}")
+    for years in args.years:
+        rollup = aggregate.rollup(heart_rate_records(years), aggregate.RESOLUTIONS[args.resolution]).to_csv(index=False)
+        timings = []
+        for _ in range(5):
+            start = time.perf_counter()
+            text = digest.digest_rollup("heartrate", rollup, args.resolution, args.max_bytes)
+            timings.append(time.perf_counter() - start)
+        print(f"{years:>5} {rollup.count(chr(10)) - 1:>6} {prompt_bytes(rollup):>13} {prompt_bytes(text):>16} {min(timings) * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Memory/throughput benchmark for filterData on a synthetic export.
+
+Usage (from backend/):
+    python benchmarks/bench_filter.py --size-mb 2048
+"""
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+from multiprocessing import get_context
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from benchmarks.synthetic import write_health_export  # noqa: E402
+
+
+def _run_filter(xml_path, export_dir, queue):
+    from filterData import filterData
+
+    start = time.perf_counter()
+    filterData(xml_path=xml_path, export_dir=export_dir)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is reported in kilobytes on Linux
+    queue.put((elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=256)
+    parser.add_argument("--workdir", default=None)
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="bench_filter_")
+    xml_path = os.path.join(workdir, "export.xml")
+    if not os.path.exists(xml_path):
+        print(f"Generating {args.size_mb} MB synthetic export at {xml_path}...")
+        records = write_health_export(xml_path, args.size_mb)
+        print(f"Generated {records} records")
+    size_mb = os.path.getsize(xml_path) / (1024 * 1024)
+
+    # Run in a fresh process so peak RSS only reflects the parse
+    ctx = get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_run_filter, args=(xml_path, os.path.join(workdir, "export"), queue))
+    proc.start()
+    elapsed, peak_rss_mb = queue.get()
+    proc.join()
+
+    print(f"input: {size_mb:.1f} MB")
+    print(f"time: {elapsed:.2f} s ({size_mb / elapsed:.1f} MB/s)")
+    print(f"peak RSS: {peak_rss_mb:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
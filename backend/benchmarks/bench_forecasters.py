@@ -0,0 +1,76 @@
+"""Forecast accuracy and latency of each weight forecaster, and of the auto policy, on held-out data.
+
+Every series is generated HORIZON days longer than --days; the forecasters see the first part
+and are scored (mean absolute error) on the rest. Latencies are per forecast_series call, cold
+(no cached decision or model) unless --warm is given.
+
+Usage (from backend/):
+    python benchmarks/bench_forecasters.py --days 14 60 365 --seeds 3 --max-seconds 20
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+# Keep benchmark models out of the real registry
+os.environ.setdefault("MODEL_REGISTRY_DIR", tempfile.mkdtemp(prefix="bench-forecasters-"))
+
+import forecasters  # noqa: E402
+from benchmarks.synthetic import weight_series  # noqa: E402
+
+SHAPES = {
+    "trend": {},
+    "flat": {"change": 0.0},
+    "weekly": {"weekly": 2.0},
+    "noisy": {"noise": 4.0},
+}
+
+
+def percentile(timings, q):
+    return float(np.percentile(timings, q)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, nargs="+", default=[14, 60, 365])
+    parser.add_argument("--shapes", nargs="+", default=list(SHAPES), choices=list(SHAPES))
+    parser.add_argument("--seeds", type=int, default=3)
+    parser.add_argument("--policies", nargs="+", default=["auto"] + list(forecasters.FORECASTERS))
+    parser.add_argument("--max-seconds", type=float, default=20.0, help="LSTM training budget per fit")
+    parser.add_argument("--warm", action="store_true", help="repeat each call once and time the repeat")
+    args = parser.parse_args()
+
+    horizon = forecasters.HORIZON
+    print(f"{'days':>5} {'shape':>7} {'policy':>15} {'MAE':>6} {'p50 ms':>9} {'p99 ms':>9}  picked")
+    for days in args.days:
+        for shape in args.shapes:
+            series = [weight_series(days + horizon, seed=seed, **SHAPES[shape])["Weight"].to_numpy() for seed in range(args.seeds)]
+            for policy in args.policies:
+                errors, timings, picked = [], [], []
+                for values in series:
+                    history, actual = values[:-horizon], values[-horizon:]
+                    try:
+                        if args.warm:
+                            forecasters.forecast_series(history, horizon, policy=policy, max_seconds=args.max_seconds)
+                        start = time.perf_counter()
+                        forecast = forecasters.forecast_series(history, horizon, policy=policy, max_seconds=args.max_seconds)
+                        timings.append(time.perf_counter() - start)
+                    except ValueError:
+                        continue
+                    errors.append(np.abs(forecast.values - actual).mean())
+                    picked.append(forecast.model)
+                if not errors:
+                    print(f"{days:>5} {shape:>7} {policy:>15} {'too short':>26}")
+                    continue
+                print(
+                    f"{days:>5} {shape:>7} {policy:>15} {np.mean(errors):>6.2f} "
+                    f"{percentile(timings, 50):>9.1f} {percentile(timings, 99):>9.1f}  {','.join(sorted(set(picked)))}"
+                )
+
+
+if __name__ == "__main__":
+    main()
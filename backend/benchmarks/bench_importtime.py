@@ -0,0 +1,98 @@
+"""Cold-start benchmark: import time of app.py (python -X importtime) and time to the first /heartbeat.
+
+Results are compared against benchmarks/importtime_baseline.json; pass --save to update it.
+
+Usage (from backend/):
+    python benchmarks/bench_importtime.py --runs 5
+    python benchmarks/bench_importtime.py --save
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "importtime_baseline.json")
+
+HEARTBEAT_SCRIPT = """
+import time
+start = time.perf_counter()
+import app
+response = app.app.test_client().get("/heartbeat")
+assert response.status_code == 200
+print(time.perf_counter() - start)
+"""
+
+
+def import_times():
+    """Cumulative import time in ms of app and of each module app imports directly."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Children are listed before their parent, indented two spaces per level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            modules[name.strip()] = int(cumulative) / 1000
+        elif depth == 0:
+            if name.strip() == "app":
+                modules["app"] = int(cumulative) / 1000
+                return modules
+            modules = {}
+    raise RuntimeError("app did not show up in the -X importtime output")
+
+
+def heartbeat_time():
+    result = subprocess.run([sys.executable, "-c", HEARTBEAT_SCRIPT], cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1]) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    args = parser.parse_args()
+
+    # Best of several runs, since the first one also pays for a cold filesystem cache
+    runs = [import_times() for _ in range(args.runs)]
+    best = min(runs, key=lambda modules: modules["app"])
+    results = {
+        "app_import_ms": round(best["app"], 1),
+        "first_heartbeat_ms": round(min(heartbeat_time() for _ in range(args.runs)), 1),
+        "slowest_imports_ms": {
+            name: round(ms, 1)
+            for name, ms in sorted(best.items(), key=lambda item: item[1], reverse=True)[:args.top]
+            if name != "app"
+        },
+    }
+
+    baseline = None
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+
+    for key in ("app_import_ms", "first_heartbeat_ms"):
+        line = f"{key:>20}: {results[key]:8.1f} ms"
+        if baseline is not None:
+            line += f"   (baseline {baseline[key]:.1f} ms, {results[key] / baseline[key]:.2f}x)"
+        print(line)
+    print("slowest imports:")
+    for name, ms in results["slowest_imports_ms"].items():
+        print(f"{name:>20}: {ms:8.1f} ms")
+
+    if args.save:
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        print(f"Saved baseline to {BASELINE_PATH}")
+
+
+if __name__ == "__main__":
+    main()
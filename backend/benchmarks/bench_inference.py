@@ -0,0 +1,67 @@
+"""Weight forecast latency: eager Weight_Model.forecast vs the inference module's compiled paths.
+
+Usage (from backend/):
+    python benchmarks/bench_inference.py --steps 1 30 --threads 1 2 4
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import RNN_model  # noqa: E402
+import inference  # noqa: E402
+
+VARIANTS = {
+    "eager": None,
+    "eager+int8": ("eager", True),
+    "torchscript": ("torchscript", False),
+    "torchscript+int8": ("torchscript", True),
+}
+
+
+def latencies(fn, repeats):
+    for _ in range(5):
+        fn()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return np.array(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--steps", type=int, nargs="+", default=[1, 30])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, os.cpu_count()])
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    model = RNN_model.Weight_Model().to(RNN_model.device).eval()
+    window = torch.linspace(200, 190, 30)
+    reference = {steps: RNN_model.forecast_weights(model, window, 150.0, 210.0, steps) for steps in args.steps}
+    forecasters = {name: None if variant is None else inference.compile_model(model, *variant) for name, variant in VARIANTS.items()}
+
+    print(f"{'threads':>7} {'steps':>5} {'variant':>17} {'p50 ms':>8} {'p95 ms':>8} {'max err lb':>11}")
+    for threads in sorted(set(args.threads)):
+        torch.set_num_threads(threads)
+        for steps in args.steps:
+            for name, forecaster in forecasters.items():
+                if forecaster is None:
+                    predict = lambda: RNN_model.forecast_weights(model, window, 150.0, 210.0, steps)  # noqa: E731
+                else:
+                    predict = lambda: inference.forecast_weights(model, window, 150.0, 210.0, steps, forecaster)  # noqa: E731
+                timings = latencies(predict, args.repeats)
+                error = (predict() - reference[steps]).abs().max().item()
+                print(f"{threads:>7} {steps:>5} {name:>17} {np.percentile(timings, 50):>8.3f} "
+                      f"{np.percentile(timings, 95):>8.3f} {error:>11.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Latency benchmark for insight generation against a local stub of the serving endpoint.
+
+Usage (from backend/):
+    python benchmarks/bench_insights.py --delay 0.5 --categories 3
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from insights import InsightClient  # noqa: E402
+
+
+def start_stub_server(delay):
+    """Serve chat-completion shaped responses on localhost after a fixed delay."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(delay)
+            body = json.dumps({"choices": [{"message": {"content": "Stub insight."}}]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--delay", type=float, default=0.5, help="simulated model latency in seconds")
+    parser.add_argument("--categories", type=int, default=3)
+    args = parser.parse_args()
+
+    server = start_stub_server(args.delay)
+    url = f"http://127.0.0.1:{server.server_address[1]}/invocations"
+    client = InsightClient(url=url, token="stub")
+    categories = {f"category{i}.csv": (f"category{i}", "date,mean\n2024-01-07,1.0\n") for i in range(args.categories)}
+
+    start = time.perf_counter()
+    for name, data in categories.values():
+        client.category_insight(name, data)
+    serial = time.perf_counter() - start
+
+    start = time.perf_counter()
+    client.category_insights(categories)
+    concurrent = time.perf_counter() - start
+    server.shutdown()
+
+    print(f"serial: {serial:.2f} s")
+    print(f"concurrent: {concurrent:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Preprocessing benchmark for RNN_model.load_and_preprocess_data_from_df on long daily series.
+
+Usage (from backend/):
+    python benchmarks/bench_preprocess.py --years 1 5 20
+"""
+import argparse
+import os
+import sys
+import time
+
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import RNN_model  # noqa: E402
+from benchmarks.synthetic import weight_series  # noqa: E402
+
+
+def legacy_preprocess(df, window_size=30):
+    """The generator + torch.stack + train_test_split implementation this replaced."""
+    from sklearn.model_selection import train_test_split
+
+    weight_tensor = torch.tensor(df['Weight'].values).to(torch.float32)
+    data_min, data_max = weight_tensor.min(), weight_tensor.max()
+    normalized_weights = (weight_tensor - data_min) / (data_max - data_min)
+    data = [(normalized_weights[i:i + window_size], normalized_weights[i + window_size]) for i in range(len(normalized_weights) - window_size)]
+    X = torch.stack([x[0] for x in data]).numpy()
+    y = torch.stack([x[1] for x in data]).numpy()
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    X_train = torch.tensor(X_train.reshape(X_train.shape[0], X_train.shape[1], 1), dtype=torch.float32)
+    X_test = torch.tensor(X_test.reshape(X_test.shape[0], X_test.shape[1], 1), dtype=torch.float32)
+    return X_train, X_test, torch.tensor(y_train), torch.tensor(y_test)
+
+
+def best_of(fn, repeats=5):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--years", type=int, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--window", type=int, default=30)
+    args = parser.parse_args()
+
+    print(f"{'days':>8} {'legacy ms':>10} {'strided ms':>11} {'speedup':>8}")
+    for years in args.years:
+        df = weight_series(365 * years)
+        legacy = best_of(lambda: legacy_preprocess(df, args.window))
+        strided = best_of(lambda: RNN_model.load_and_preprocess_data_from_df(df, args.window))
+        print(f"{len(df):>8} {legacy * 1000:>10.2f} {strided * 1000:>11.2f} {legacy / strided:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
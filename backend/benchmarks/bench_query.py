@@ -0,0 +1,56 @@
+"""Latency of query.MetricIndex range and series queries vs a full scan, as history grows.
+
+Usage (from backend/):
+    python benchmarks/bench_query.py --records 100000 1000000 10000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from query import DAY_NS, MetricIndex  # noqa: E402
+
+
+def heart_rate_history(records, seed=0):
+    # One sample every ~2.5 minutes on average, like a watch's background heart rate
+    rng = np.random.default_rng(seed)
+    starts = np.datetime64("2015-01-01", "ns").astype(np.int64) + np.cumsum(rng.integers(5 * 10**9, 300 * 10**9, records))
+    return starts, rng.uniform(45, 160, records)
+
+
+def best_of(fn, repeats=20):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, nargs="+", default=[100_000, 1_000_000, 10_000_000])
+    args = parser.parse_args()
+
+    print(f"{'records':>10} {'years':>6} {'build s':>8} {'scan 1 day ms':>14} {'index 1 day ms':>15} {'series 1D/1y ms':>16} {'series 1h/30d ms':>17}")
+    for records in args.records:
+        starts, values = heart_rate_history(records)
+        start = time.perf_counter()
+        index = MetricIndex(starts, values)
+        build = time.perf_counter() - start
+
+        middle = int(starts[len(starts) // 2]) // DAY_NS * DAY_NS
+        scan = best_of(lambda: values[(starts >= middle) & (starts < middle + DAY_NS)].tolist(), repeats=5)
+        day = best_of(lambda: index.records(middle, middle + DAY_NS))
+        year = best_of(lambda: index.series(DAY_NS, "mean", middle, middle + 365 * DAY_NS))
+        month = best_of(lambda: index.series(3600 * 10**9, "max", middle, middle + 30 * DAY_NS))
+        years = (starts[-1] - starts[0]) / (365.25 * DAY_NS)
+        print(f"{records:>10} {years:>6.1f} {build:>8.2f} {scan:>14.2f} {day:>15.3f} {year:>16.3f} {month:>17.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Memory benchmark for filterData's per-type record buffers: attribute dicts vs RecordColumns.
+
+Every Record of a synthetic export is held in memory (no flushing) under both
+representations, and tracemalloc reports the Python memory they retain.
+
+Usage (from backend/):
+    python benchmarks/bench_records.py --size-mb 64
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from lxml import etree
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import record_store  # noqa: E402
+from benchmarks.synthetic import write_health_export  # noqa: E402
+from filterData import exported_type, release  # noqa: E402
+
+EXCLUDED_COLUMNS = {"sourceName", "sourceVersion", "device"}
+
+
+class DictRows:
+    """The list-of-dicts buffer this replaced."""
+
+    def __init__(self):
+        self.rows = []
+
+    def append(self, short_type, attrib):
+        row = {k: v for k, v in attrib.items() if k not in EXCLUDED_COLUMNS}
+        row["type"] = short_type
+        self.rows.append(row)
+
+
+def buffer_records(xml_path, factory):
+    buffers = {}
+    for _, elem in etree.iterparse(xml_path, events=("end",), tag="Record", huge_tree=True):
+        short_type = exported_type(elem, {})
+        if short_type is not None:
+            buffer = buffers.get(short_type)
+            if buffer is None:
+                buffer = buffers[short_type] = factory()
+            buffer.append(short_type, elem.attrib)
+        release(elem)
+    return buffers
+
+
+def measure(xml_path, factory):
+    # Timed without tracing first, since tracemalloc slows every allocation down
+    start = time.perf_counter()
+    buffer_records(xml_path, factory)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    buffers = buffer_records(xml_path, factory)  # noqa: F841 - kept alive for the measurement
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, retained, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=64)
+    parser.add_argument("--workdir", default=None)
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="bench_records_")
+    xml_path = os.path.join(workdir, "export.xml")
+    if not os.path.exists(xml_path):
+        records = write_health_export(xml_path, args.size_mb)
+    else:
+        records = sum(1 for _ in etree.iterparse(xml_path, tag="Record"))
+
+    print(f"{records} records")
+    print(f"{'buffer':>14} {'retained MB':>12} {'bytes/record':>13} {'peak MB':>8} {'time s':>7}")
+    for name, factory in (("dicts", DictRows), ("RecordColumns", record_store.RecordColumns)):
+        elapsed, retained, peak = measure(xml_path, factory)
+        print(f"{name:>14} {retained / 2**20:>12.1f} {retained / records:>13.1f} {peak / 2**20:>8.1f} {elapsed:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
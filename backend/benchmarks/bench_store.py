@@ -0,0 +1,88 @@
+"""Store benchmark: the Parquet record store and its rollups on a synthetic export.
+
+Times filterData (bulk load), aggregateAll (rollups), a cold /records index build, a
+one-week range read and loading the weekly rollups the insights are digested from, and
+reports the on-disk size.
+
+Usage (from backend/):
+    python benchmarks/bench_store.py --size-mb 64
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import aggregate  # noqa: E402
+import query  # noqa: E402
+import record_store  # noqa: E402
+from benchmarks.synthetic import write_health_export  # noqa: E402
+from filterData import filterData  # noqa: E402
+
+WEEK_NS = 7 * query.DAY_NS
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def run(xml_path, workdir, repeats):
+    store_dir = os.path.join(workdir, "store")
+    export_dir = os.path.join(store_dir, "export")
+    aggregated_dir = os.path.join(store_dir, "aggregated")
+    shutil.rmtree(store_dir, ignore_errors=True)
+
+    start = time.perf_counter()
+    filterData(xml_path, export_dir)
+    load = time.perf_counter() - start
+
+    start = time.perf_counter()
+    aggregate.aggregateAll(export_dir, aggregated_dir)
+    rollups = time.perf_counter() - start
+
+    metric = max(record_store.list_types(export_dir), key=lambda t: record_store.partition_size(t, export_dir))
+    start = time.perf_counter()
+    index = query.MetricIndex.load(metric, export_dir)
+    index_build = time.perf_counter() - start
+
+    # A week in the middle of the series, read straight from the store
+    middle = int(index.starts[len(index) // 2]) // query.DAY_NS * query.DAY_NS
+    start = time.perf_counter()
+    for _ in range(repeats):
+        frame = record_store.read_records(metric, export_dir=export_dir, since=pd.Timestamp(middle))
+        frame = frame[frame["startDate"] < pd.Timestamp(middle + WEEK_NS)]
+    range_read = (time.perf_counter() - start) / repeats
+
+    metrics = record_store.list_types(export_dir)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for record_type in metrics:
+            aggregate.load_rollup(record_type, "weekly", aggregated_dir)
+    rollup_read = (time.perf_counter() - start) / repeats
+    return load, rollups, index_build, range_read, rollup_read, directory_size(store_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--workdir", default=None)
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="bench_store_")
+    xml_path = os.path.join(workdir, "export.xml")
+    if not os.path.exists(xml_path):
+        print(f"{write_health_export(xml_path, args.size_mb)} records")
+
+    load, rollups, index_build, range_read, rollup_read, size = run(xml_path, workdir, args.repeats)
+    print(f"{'load s':>7} {'rollups s':>10} {'index s':>8} {'range ms':>9} {'weekly rollups ms':>18} {'disk MB':>8}")
+    print(f"{load:>7.2f} {rollups:>10.2f} {index_build:>8.3f} {range_read * 1000:>9.1f} {rollup_read * 1000:>18.1f} {size / 2**20:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
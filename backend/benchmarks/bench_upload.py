@@ -0,0 +1,139 @@
+"""Upload benchmark: streams synthetic exports into /appleDataUpload and reports server peak RSS.
+
+Each upload goes to a fresh server process, sent as a chunked multipart body the way a slow
+client would, so the numbers show whether parsing overlaps the transfer (time between the
+last byte sent and the response), when the job has committed the records to the store, and
+whether server memory grows with the upload size.
+
+Usage (from backend/):
+    python benchmarks/bench_upload.py --size-mb 64 256 --formats xml zip
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from benchmarks.bench_insights import start_stub_server  # noqa: E402
+from benchmarks.synthetic import write_health_export  # noqa: E402
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+BOUNDARY = "benchuploadboundary"
+
+SERVER_SCRIPT = """
+import sys
+from werkzeug.serving import make_server
+import app
+make_server("127.0.0.1", int(sys.argv[1]), app.app, threaded=True).serve_forever()
+"""
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def peak_rss_mb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+
+
+def multipart_body(path, filename, sent, chunk_size):
+    # Chunked multipart body; records when the last byte has been handed to the socket
+    yield (f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+           "Content-Type: application/octet-stream\r\n\r\n").encode()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            yield block
+    yield f"\r\n--{BOUNDARY}--\r\n".encode()
+    sent.append(time.perf_counter())
+
+
+def upload(path, filename, workdir, env, chunk_size):
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-c", SERVER_SCRIPT, str(port)], cwd=BACKEND_DIR,
+        env={**env, "SESSIONS_DIR": os.path.join(workdir, f"sessions-{port}")},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        for _ in range(100):
+            try:
+                requests.get(f"http://127.0.0.1:{port}/heartbeat", timeout=1)
+                break
+            except requests.ConnectionError:
+                time.sleep(0.1)
+        idle_rss = peak_rss_mb(server.pid)
+
+        sent = []
+        start = time.perf_counter()
+        response = requests.post(
+            f"http://127.0.0.1:{port}/appleDataUpload",
+            data=multipart_body(path, filename, sent, chunk_size),
+            headers={"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"},
+        )
+        end = time.perf_counter()
+        response.raise_for_status()
+        # Follow the job until it is past its store stage
+        job = response.json()
+        status_url, session_id = job["status_url"], job["session_id"]
+        while job["status"] not in ("succeeded", "failed") and job["stage"] in (None, "store"):
+            job = requests.get(
+                f"http://127.0.0.1:{port}{status_url}",
+                params={"wait": 10, "since": job["version"]},
+                headers={"X-Session-Id": session_id},
+            ).json()
+        stored = time.perf_counter()
+        if job["status"] == "failed":
+            raise RuntimeError(job["error"])
+        return end - start, end - sent[0], stored - start, idle_rss, peak_rss_mb(server.pid)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, nargs="+", default=[64, 256])
+    parser.add_argument("--formats", nargs="+", choices=["xml", "zip"], default=["xml", "zip"])
+    parser.add_argument("--chunk-kb", type=int, default=256)
+    parser.add_argument("--workdir", default=None)
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="bench_upload_")
+    stub = start_stub_server(0.0)
+    env = {
+        **os.environ,
+        "DATABRICKS_URL": f"http://127.0.0.1:{stub.server_address[1]}/",
+        "DATABRICKS_TOKEN": "bench",
+        "INSIGHT_CACHE_PATH": "",
+    }
+
+    print(f"{'format':>6} {'input MB':>9} {'upload s':>9} {'after last byte s':>18} {'stored s':>9} {'idle RSS MB':>12} {'peak RSS MB':>12}")
+    for size_mb in args.size_mb:
+        xml_path = os.path.join(workdir, f"export-{size_mb}.xml")
+        if not os.path.exists(xml_path):
+            write_health_export(xml_path, size_mb)
+        for fmt in args.formats:
+            path, filename = xml_path, "export.xml"
+            if fmt == "zip":
+                path, filename = os.path.join(workdir, f"export-{size_mb}.zip"), "export.zip"
+                if not os.path.exists(path):
+                    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+                        archive.write(xml_path, "apple_health_export/export.xml")
+            total, tail, stored, idle_rss, peak_rss = upload(path, filename, workdir, env, args.chunk_kb * 1024)
+            print(f"{fmt:>6} {os.path.getsize(path) / 2**20:>9.1f} {total:>9.2f} {tail:>18.3f} {stored:>9.2f} {idle_rss:>12.1f} {peak_rss:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
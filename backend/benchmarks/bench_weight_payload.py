@@ -0,0 +1,72 @@
+"""/weight response size and time on long daily histories: list-of-dicts vs columnar vs columnar + LTTB.
+
+Each mode is requested through the Flask test client with a fixed baseline forecaster, with and
+without Accept-Encoding; "build ms" times the chart payload alone (outside the request).
+
+Usage (from backend/):
+    python benchmarks/bench_weight_payload.py --years 1 5 20 --points 800
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import charts  # noqa: E402
+from app import WEIGHT_DECIMALS, app  # noqa: E402
+from benchmarks.synthetic import weight_series  # noqa: E402
+
+
+def legacy_payload(df):
+    """The per-row comprehension /weight used to build its history with."""
+    return json.dumps([{'date': date.strftime('%Y-%m-%d'), 'weight': float(weight)} for date, weight in zip(df.index, df['Weight'])])
+
+
+def columnar_payload(df, points=None):
+    return json.dumps(charts.columnar_series(df.index, df['Weight'].to_numpy(), points=points, decimals=WEIGHT_DECIMALS))
+
+
+def best_of(fn, repeats=5):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def post(client, csv, query, encoding):
+    headers = {"Accept-Encoding": encoding} if encoding else {}
+    start = time.perf_counter()
+    response = client.post(f"/weight?model=damped_trend{query}", data={"file": (io.BytesIO(csv), "weights.csv")}, headers=headers)
+    elapsed = time.perf_counter() - start
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return len(response.get_data()), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--years", type=int, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--points", type=int, default=800, help="chart width for the LTTB mode")
+    args = parser.parse_args()
+
+    client = app.test_client()
+    modes = [("dicts", "", lambda df: legacy_payload(df)), ("columnar", "&format=columnar", lambda df: columnar_payload(df)),
+             (f"lttb {args.points}", f"&format=columnar&points={args.points}", lambda df: columnar_payload(df, args.points))]
+    print(f"{'days':>6} {'mode':>10} {'build ms':>9} {'body B':>9} {'gzip B':>8} {'br B':>8} {'request ms':>11}")
+    for years in args.years:
+        df = weight_series(365 * years)
+        csv = df.reset_index().to_csv(index=False).encode()
+        for name, query, build in modes:
+            build_seconds = best_of(lambda: build(df))
+            plain, elapsed = post(client, csv, query, None)
+            gzipped, _ = post(client, csv, query, "gzip")
+            brotli_bytes, _ = post(client, csv, query, "br")
+            print(f"{len(df):>6} {name:>10} {build_seconds * 1000:>9.2f} {plain:>9} {gzipped:>8} {brotli_bytes:>8} {elapsed * 1000:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""Benchmark suite: synthetic exports and weight series through every pipeline stage, as JSON.
+
+Stages:
+    filter     stream export.xml through RecordFilter in 1 MB blocks (latency per block)
+    aggregate  daily/weekly/monthly rollups of the filtered store (latency per record type)
+    query      /records series and raw reads over random one-week ranges (latency per query)
+    train      train_weight_model on synthetic weight series (latency per series)
+    forecast   30-day forecasts from a model trained on the series (latency per call)
+
+Every stage runs in a fresh process, so its peak RSS is its own. Exports use the realistic
+record mix of benchmarks/synthetic.py and are kept in --workdir between runs.
+
+Usage (from backend/):
+    python benchmarks/run.py --sizes 10 100 --series-days 90 365 1825 -o before.json
+    python benchmarks/run.py --sizes 1000 5000 --stages filter aggregate -o big.json
+    python benchmarks/run.py --compare before.json after.json --threshold 0.1
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime
+from multiprocessing import get_context
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import instrumentation  # noqa: E402
+from benchmarks.synthetic import weight_series, write_health_export  # noqa: E402
+
+STAGES = ("filter", "aggregate", "query", "train", "forecast")
+EXPORT_STAGES = ("filter", "aggregate", "query")
+READ_SIZE = 1 << 20
+WEEK_NS = 7 * 86400 * 10**9
+# Metrics compared between runs; all of them are better when lower
+COMPARED = ("seconds", "p50_ms", "p90_ms", "p99_ms", "peak_rss_mb")
+
+
+def export_path(workdir, size_mb, seed):
+    path = os.path.join(workdir, f"export-{size_mb}mb-{seed}.xml")
+    if not os.path.exists(path):
+        print(f"Generating {path}", file=sys.stderr)
+        write_health_export(path + ".tmp", size_mb, seed=seed, mix="realistic")
+        os.replace(path + ".tmp", path)
+    return path
+
+
+def store_dir(workdir, size_mb, seed):
+    return os.path.join(workdir, f"store-{size_mb}mb-{seed}")
+
+
+def ensure_store(workdir, size_mb, seed):
+    # aggregate and query need the filtered store; build it untimed if filter wasn't run
+    import filterData
+
+    export_dir = store_dir(workdir, size_mb, seed)
+    if not os.path.isdir(export_dir):
+        filterData.filterData(export_path(workdir, size_mb, seed), export_dir)
+    return export_dir
+
+
+def bench_filter(workdir, size_mb, seed, **_):
+    from filterData import RecordFilter
+
+    xml_path = export_path(workdir, size_mb, seed)
+    export_dir = store_dir(workdir, size_mb, seed)
+    shutil.rmtree(export_dir, ignore_errors=True)
+    latencies = []
+    record_filter = RecordFilter(export_dir=export_dir)
+    with open(xml_path, "rb") as f:
+        for block in iter(lambda: f.read(READ_SIZE), b""):
+            start = time.perf_counter()
+            record_filter.feed(block)
+            latencies.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    record_filter.close()
+    latencies[-1] += time.perf_counter() - start
+    records = instrumentation.registry.get_count("filter_records_parsed")
+    return latencies, {"MB/s": os.path.getsize(xml_path) / 2**20, "records/s": records}, {"records": records}
+
+
+def bench_aggregate(workdir, size_mb, seed, **_):
+    import aggregate
+    import record_store
+
+    export_dir = ensure_store(workdir, size_mb, seed)
+    output_dir = os.path.join(workdir, f"aggregated-{size_mb}mb-{seed}")
+    for resolution in aggregate.RESOLUTIONS:
+        os.makedirs(os.path.join(output_dir, resolution), exist_ok=True)
+    latencies = []
+    for record_type in record_store.list_types(export_dir):
+        start = time.perf_counter()
+        aggregate.aggregateRecordType(record_type, export_dir, output_dir)
+        latencies.append(time.perf_counter() - start)
+    records = instrumentation.registry.get_count("aggregate_records")
+    return latencies, {"records/s": records}, {"records": records, "types": len(latencies)}
+
+
+def bench_query(workdir, size_mb, seed, queries=200, **_):
+    import query
+    import record_store
+
+    export_dir = ensure_store(workdir, size_mb, seed)
+    metric = max(record_store.list_types(export_dir), key=lambda t: record_store.partition_size(t, export_dir))
+    start = time.perf_counter()
+    index = query.MetricIndex.load(metric, export_dir)
+    index_build = time.perf_counter() - start
+
+    rng = random.Random(seed)
+    first, last = int(index.starts[0]), int(index.starts[-1])
+    latencies = []
+    for i in range(queries):
+        lo = rng.randrange(first, max(last - WEEK_NS, first + 1))
+        start = time.perf_counter()
+        if i % 2:
+            index.series(3600 * 10**9, "mean", lo, lo + WEEK_NS)
+        else:
+            index.records(lo, lo + WEEK_NS)
+        latencies.append(time.perf_counter() - start)
+    return latencies, {"queries/s": queries}, {"metric": metric, "records": len(index), "index_build_ms": round(index_build * 1000, 2)}
+
+
+def bench_train(workdir, days, seed, repeats=3, max_seconds=30.0, **_):
+    import predict
+
+    latencies = []
+    for repeat in range(repeats):
+        # A different seed each time, so the model registry never has the series cached
+        df = weight_series(days, seed=seed * 1000 + repeat, weekly=1.0)
+        start = time.perf_counter()
+        predict.train_weight_model(df, max_seconds=max_seconds)
+        latencies.append(time.perf_counter() - start)
+    return latencies, {"points/s": days * repeats}, {}
+
+
+def bench_forecast(workdir, days, seed, calls=100, **_):
+    import torch
+    import inference
+    import predict
+
+    df = weight_series(days, seed=seed, weekly=1.0)
+    trained = predict.train_weight_model(df, max_epochs=5)
+    window = torch.tensor(df["Weight"].values[-30:]).to(torch.float32)
+    inference.forecast_weights(trained.model, window, trained.data_min, trained.data_max, 30)
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        inference.forecast_weights(trained.model, window, trained.data_min, trained.data_max, 30)
+        latencies.append(time.perf_counter() - start)
+    return latencies, {"forecasts/s": calls}, {"backend": inference.INFERENCE_BACKEND}
+
+
+BENCHMARKS = {
+    "filter": bench_filter,
+    "aggregate": bench_aggregate,
+    "query": bench_query,
+    "train": bench_train,
+    "forecast": bench_forecast,
+}
+
+
+def run_stage(stage, params):
+    """Run one stage in this (fresh) process and summarize it."""
+    # Counters are read back per stage, so earlier in-process stages must not leak into them
+    instrumentation.registry.reset()
+    # The pipeline prints progress; keep stdout for the JSON report
+    with redirect_stdout(sys.stderr), instrumentation.span(f"bench_{stage}") as measured:
+        latencies, work, extra = BENCHMARKS[stage](**params)
+    seconds = sum(latencies)
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "ops": len(latencies),
+        "seconds": round(seconds, 4),
+        "throughput": {unit: round(amount / seconds, 2) for unit, amount in work.items()},
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p90_ms": round(float(np.percentile(latencies_ms, 90)), 3),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+        "max_ms": round(float(latencies_ms.max()), 3),
+        # Peak of the whole process (imports included) and growth over the stage itself
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "rss_growth_mb": round((measured.peak_rss - measured.start_rss) / 2**20, 1),
+        **extra,
+    }
+
+
+def isolated(stage, params):
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+        return pool.submit(run_stage, stage, params).result()
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(args):
+    os.makedirs(args.workdir, exist_ok=True)
+    # Trained models must not come from (or be left in) the app's registry or an earlier run
+    models_dir = tempfile.mkdtemp(prefix="models-", dir=args.workdir)
+    os.environ["MODEL_REGISTRY_DIR"] = models_dir
+    try:
+        results = run_stages(args)
+    finally:
+        shutil.rmtree(models_dir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "seed": args.seed,
+            "isolated": args.isolate,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+def run_stages(args):
+    results = []
+    for stage in args.stages:
+        if stage in EXPORT_STAGES:
+            cases = [(f"{size_mb}MB", {"workdir": args.workdir, "size_mb": size_mb, "seed": args.seed}) for size_mb in args.sizes]
+            if stage == "filter":
+                for size_mb in args.sizes:
+                    export_path(args.workdir, size_mb, args.seed)  # generated outside the timing
+        else:
+            cases = [(f"{days}d", {"workdir": args.workdir, "days": days, "seed": args.seed, "max_seconds": args.train_seconds}) for days in args.series_days]
+        for label, params in cases:
+            result = {"stage": stage, "input": label, **(isolated(stage, params) if args.isolate else run_stage(stage, params))}
+            print(f"{stage:>9} {label:>7} {result['seconds']:>9.3f}s  p50 {result['p50_ms']:>9.3f} ms  p99 {result['p99_ms']:>9.3f} ms  "
+                  f"peak {result['peak_rss_mb']:>7.1f} MB  {result['throughput']}", file=sys.stderr)
+            results.append(result)
+    return results
+
+
+def compare(base_path, new_path, threshold):
+    """Print new/base ratios for every shared stage and input; returns True if anything regressed."""
+    with open(base_path) as f:
+        base = {(r["stage"], r["input"]): r for r in json.load(f)["results"]}
+    with open(new_path) as f:
+        new = {(r["stage"], r["input"]): r for r in json.load(f)["results"]}
+
+    regressed = False
+    print(f"{'stage':>9} {'input':>7} {'metric':>12} {'base':>10} {'new':>10} {'ratio':>7}")
+    for key in [key for key in new if key in base]:
+        for metric in COMPARED:
+            before, after = base[key].get(metric), new[key].get(metric)
+            if not before or after is None:
+                continue
+            ratio = after / before
+            flag = ""
+            if ratio > 1 + threshold:
+                flag, regressed = "  REGRESSION", True
+            elif ratio < 1 - threshold:
+                flag = "  improved"
+            print(f"{key[0]:>9} {key[1]:>7} {metric:>12} {before:>10.3f} {after:>10.3f} {ratio:>7.2f}{flag}")
+    for key in sorted(set(base) ^ set(new)):
+        print(f"{key[0]:>9} {key[1]:>7} only in {'base' if key in base else 'new'}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100], help="export sizes in MB (10 to 5000)")
+    parser.add_argument("--series-days", type=int, nargs="+", default=[90, 365, 1825])
+    parser.add_argument("--train-seconds", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "health_bench"))
+    parser.add_argument("--in-process", dest="isolate", action="store_false", help="run every stage in this process")
+    parser.add_argument("-o", "--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="compare two reports instead of running")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative change reported as a regression")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+    run_suite(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import os
+import math
+import random
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# (identifier, unit, low, high) for the record types most exports are dominated by
+RECORD_TYPES = [
+    ("HKQuantityTypeIdentifierHeartRate", "count/min", 45, 160),
+    ("HKQuantityTypeIdentifierActiveEnergyBurned", "Cal", 0.01, 5.0),
+    ("HKQuantityTypeIdentifierBasalEnergyBurned", "Cal", 0.1, 60.0),
+    ("HKQuantityTypeIdentifierStepCount", "count", 10, 2500),
+    ("HKQuantityTypeIdentifierDistanceWalkingRunning", "mi", 0.005, 0.9),
+]
+
+# Per-type daily volume and value ranges of a real Watch + iPhone export, taken from the
+# committed appleHealth/aggregated/*.csv (the intervals printInterval.py reports):
+# (identifier, unit, records per active day, share of days with records, low, typical, high, duration s)
+REALISTIC_TYPES = [
+    ("HKQuantityTypeIdentifierActiveEnergyBurned", "Cal", 700, 0.72, 0.008, 0.55, 25.4, 60),
+    ("HKQuantityTypeIdentifierBasalEnergyBurned", "Cal", 311, 0.76, 0.056, 4.9, 66.9, 300),
+    ("HKQuantityTypeIdentifierHeartRate", "count/min", 165, 0.68, 42, 74.6, 158, 0),
+    ("HKQuantityTypeIdentifierDistanceWalkingRunning", "mi", 108, 0.98, 0.0005, 0.038, 0.63, 600),
+    ("HKQuantityTypeIdentifierStepCount", "count", 68, 0.98, 1, 142, 1128, 600),
+    ("HKQuantityTypeIdentifierAppleStandTime", "min", 56, 0.67, 1, 2.6, 5, 300),
+    ("HKQuantityTypeIdentifierWalkingSpeed", "mi/hr", 34, 0.97, 1.2, 2.65, 4.14, 15),
+    ("HKQuantityTypeIdentifierWalkingStepLength", "in", 34, 0.97, 13.8, 26, 37.8, 15),
+    ("HKQuantityTypeIdentifierWalkingDoubleSupportPercentage", "%", 28, 0.96, 0.216, 0.281, 0.335, 15),
+    ("HKQuantityTypeIdentifierAppleExerciseTime", "min", 25, 0.68, 1, 1, 1, 60),
+    ("HKQuantityTypeIdentifierWalkingAsymmetryPercentage", "%", 15, 0.84, 0, 0.02, 0.36, 15),
+    ("HKQuantityTypeIdentifierFlightsClimbed", "count", 7, 0.92, 1, 1.6, 6, 60),
+    ("HKQuantityTypeIdentifierStairAscentSpeed", "ft/s", 5, 0.52, 0.665, 1.08, 2.24, 10),
+    ("HKQuantityTypeIdentifierStairDescentSpeed", "ft/s", 5, 0.48, 0.673, 1.24, 2.31, 10),
+    ("HKQuantityTypeIdentifierHeartRateVariabilitySDNN", "ms", 3, 0.62, 15.3, 89, 186, 60),
+    ("HKQuantityTypeIdentifierRestingHeartRate", "count/min", 1, 0.62, 48, 55, 64, 0),
+    ("HKQuantityTypeIdentifierWalkingHeartRateAverage", "count/min", 1, 0.25, 67, 98, 134, 0),
+    ("HKQuantityTypeIdentifierPhysicalEffort", "kcal/hr·kg", 320, 0.1, 1, 3.6, 20, 60),
+    ("HKQuantityTypeIdentifierRunningPower", "W", 710, 0.01, 42.5, 160, 328, 5),
+    ("HKQuantityTypeIdentifierRunningSpeed", "mi/hr", 712, 0.01, 0.73, 5.7, 10.6, 5),
+    # Dropped by filterData, but they still have to be parsed
+    ("HKQuantityTypeIdentifierHeadphoneAudioExposure", "dBASPL", 40, 0.5, 55, 70, 90, 60),
+    ("HKCategoryTypeIdentifierSleepAnalysis", None, 12, 0.6, 0, 0, 2, 1800),
+]
+
+HEADER = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE HealthData>
+<HealthData locale="en_US">
+ <ExportDate value="2024-01-01 00:00:00 -0500"/>
+ <Me HKCharacteristicTypeIdentifierDateOfBirth="" HKCharacteristicTypeIdentifierBiologicalSex="HKBiologicalSexNotSet"/>
+"""
+
+RECORD = (
+    ' <Record type="{type}" sourceName="Apple Watch" sourceVersion="10.1" '
+    'device="&lt;&lt;HKDevice: 0x0&gt;, name:Apple Watch&gt;" unit="{unit}" '
+    'creationDate="{created}" startDate="{start}" endDate="{end}" value="{value}"/>\n'
+)
+CATEGORY_RECORD = (
+    ' <Record type="{type}" sourceName="Apple Watch" sourceVersion="10.1" '
+    'creationDate="{created}" startDate="{start}" endDate="{end}" value="HKCategoryValueSleepAnalysisAsleepCore"/>\n'
+)
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S -0500"
+
+
+def _uniform_records(rng, start):
+    # Five types in equal shares, one record every 5-300 s
+    timestamp = start
+    while True:
+        lines = []
+        for _ in range(1000):
+            record_type, unit, low, high = RECORD_TYPES[rng.randrange(len(RECORD_TYPES))]
+            timestamp += timedelta(seconds=rng.randint(5, 300))
+            start_str = timestamp.strftime(TIMESTAMP_FORMAT)
+            lines.append(RECORD.format(type=record_type, unit=unit, created=start_str, start=start_str, end=start_str, value=round(rng.uniform(low, high), 3)))
+        yield lines
+
+
+def _realistic_records(rng, start):
+    # One day at a time: each type is present on a share of days and, when present, spreads a
+    # Poisson-ish number of records over the day, so the type mix and spacing match real exports
+    day = start
+    while True:
+        records = []
+        for record_type, unit, per_day, coverage, low, typical, high, duration in REALISTIC_TYPES:
+            if rng.random() >= coverage:
+                continue
+            count = max(1, round(rng.gauss(per_day, math.sqrt(per_day))))
+            for _ in range(count):
+                offset = rng.randrange(86400)
+                value = round(rng.triangular(low, high, typical), 3) if high > low else low
+                records.append((offset, record_type, unit, value, duration))
+        records.sort()
+
+        # Formatting timestamps by hand is several times faster than strftime
+        dates = (day.strftime("%Y-%m-%d"), (day + timedelta(days=1)).strftime("%Y-%m-%d"))
+
+        def stamp(seconds):
+            date, seconds = divmod(seconds, 86400)
+            hours, seconds = divmod(seconds, 3600)
+            minutes, seconds = divmod(seconds, 60)
+            return f"{dates[date]} {hours:02d}:{minutes:02d}:{seconds:02d} -0500"
+
+        lines = []
+        for offset, record_type, unit, value, duration in records:
+            start_str, end_str = stamp(offset), stamp(offset + duration)
+            # The phone writes samples in batches a few minutes after they were taken
+            created_str = stamp(offset + duration + rng.randrange(600))
+            if unit is None:
+                lines.append(CATEGORY_RECORD.format(type=record_type, created=created_str, start=start_str, end=end_str))
+            else:
+                lines.append(RECORD.format(type=record_type, unit=unit, created=created_str, start=start_str, end=end_str, value=value))
+        day += timedelta(days=1)
+        yield lines
+
+
+MIXES = {"uniform": _uniform_records, "realistic": _realistic_records}
+
+
+def write_health_export(path, size_mb, seed=0, start=datetime(2018, 1, 1), mix="uniform"):
+    """Write a synthetic Apple Health export.xml of roughly size_mb megabytes.
+
+    mix="uniform" spreads five common types evenly; mix="realistic" follows REALISTIC_TYPES.
+    Returns the number of records written.
+    """
+    rng = random.Random(seed)
+    target = size_mb * 1024 * 1024
+    written = 0
+    records = 0
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        f.write(HEADER)
+        for lines in MIXES[mix](rng, start):
+            if written >= target:
+                break
+            chunk = "".join(lines)
+            f.write(chunk)
+            written += len(chunk)
+            records += len(lines)
+        f.write("</HealthData>\n")
+    return records
+
+
+def weight_series(days, seed=0, start_weight=200.0, change=-30.0, noise=1.5, weekly=0.0, missing=0.0):
+    """Daily weights as a DataFrame indexed by Date, like the /weight uploads.
+
+    A linear trend of `change` lbs over the series plus Gaussian noise, an optional weekly
+    cycle of that amplitude (weekend highs) and a share of days randomly left out.
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2000-01-01", periods=days, name="Date")
+    weights = start_weight + np.linspace(0, change, days) + rng.normal(0, noise, days)
+    if weekly:
+        weights += weekly * np.cos(2 * np.pi * (dates.dayofweek.to_numpy() - 6) / 7)
+    df = pd.DataFrame({"Weight": weights}, index=dates)
+    if missing:
+        df = df[rng.random(days) >= missing]
+    return df
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+
+def lttb(x, y, points):
+    """Indices of the points Largest-Triangle-Three-Buckets keeps to draw y against x with `points` points.
+
+    The first and last points are always kept; every bucket in between contributes the point
+    forming the largest triangle with the previously kept point and the next bucket's average,
+    which preserves the peaks and dips a chart of that width can show. Bucket averages come
+    from cumulative sums and each bucket's areas from one numpy expression. Series of at most
+    `points` points are kept whole.
+    """
+    n = len(y)
+    if points >= n or points < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # points - 2 buckets over everything between the first and the last point
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    sum_x = np.concatenate(([0.0], np.cumsum(x)))
+    sum_y = np.concatenate(([0.0], np.cumsum(y)))
+    widths = np.diff(edges)
+    mean_x = (sum_x[edges[1:]] - sum_x[edges[:-1]]) / widths
+    mean_y = (sum_y[edges[1:]] - sum_y[edges[:-1]]) / widths
+    # The "next bucket" of the last bucket is the last point
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+
+    kept = np.empty(points, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(points - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        area = np.abs(
+            (x[previous] - next_x[bucket]) * (y[lo:hi] - y[previous])
+            - (x[previous] - x[lo:hi]) * (next_y[bucket] - y[previous])
+        )
+        previous = lo + int(np.argmax(area))
+        kept[bucket + 1] = previous
+    return kept
+
+
+def columnar_series(dates, values, points=None, decimals=None):
+    """A daily series as {"start", "step_days", "values"}, the chart payload of /weight?format=columnar.
+
+    Value i falls on start + i * step_days. When the dates aren't evenly spaced (gaps, or
+    points thinned out by LTTB to at most `points`), "offsets" lists each value's day offset
+    from start instead.
+    """
+    days = pd.DatetimeIndex(dates).normalize()
+    values = np.asarray(values, dtype=np.float64)
+    if len(days) == 0:
+        return {"start": None, "step_days": 1, "values": []}
+    offsets = ((days - days[0]) // pd.Timedelta(days=1)).to_numpy()
+    if points:
+        kept = lttb(offsets, values, points)
+        offsets, values = offsets[kept], values[kept]
+    if decimals is not None:
+        values = np.round(values, decimals)
+
+    gaps = np.diff(offsets)
+    step = int(np.bincount(gaps[gaps > 0]).argmax()) if (gaps > 0).any() else 1
+    series = {"start": days[0].strftime("%Y-%m-%d"), "step_days": step, "values": values.tolist()}
+    if not (gaps == step).all():
+        series["offsets"] = offsets.tolist()
+    return series
@@ -0,0 +1,79 @@
+import os
+import gzip
+
+try:
+    import brotli
+except ImportError:
+    # Optional: without it responses are only ever gzipped
+    brotli = None
+
+import instrumentation
+
+# Bodies smaller than this go out as they are; compressing them saves less than the headers cost
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+
+def encoding_qualities(header):
+    """Content codings in an Accept-Encoding header mapped to their q values (1 when not given)."""
+    qualities = {}
+    for item in (header or "").split(","):
+        coding, *params = item.split(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    return qualities
+
+
+def choose_encoding(header):
+    """"br" (when brotli is installed), "gzip" or None for a client's Accept-Encoding.
+
+    A coding listed explicitly wins over the "*" wildcard, so "gzip;q=0, *" rules gzip out.
+    """
+    qualities = encoding_qualities(header)
+
+    def allowed(coding):
+        return qualities.get(coding, qualities.get("*", 0)) > 0
+
+    if brotli is not None and allowed("br"):
+        return "br"
+    if allowed("gzip"):
+        return "gzip"
+    return None
+
+
+def compress_response(response, accept_encoding):
+    """Compress a buffered JSON or text response in place for a client sending accept_encoding.
+
+    Streamed and file responses, and ones that already carry a Content-Encoding, are left alone.
+    """
+    if response.direct_passthrough or response.is_streamed or "Content-Encoding" in response.headers:
+        return response
+    if response.status_code < 200 or response.status_code in (204, 304) or not response.mimetype.startswith(COMPRESSIBLE_TYPES):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = choose_encoding(accept_encoding)
+    body = response.get_data()
+    if encoding is None or len(body) < COMPRESS_MIN_BYTES:
+        return response
+
+    if encoding == "br":
+        compressed = brotli.compress(body, quality=BROTLI_QUALITY)
+    else:
+        compressed = gzip.compress(body, GZIP_LEVEL, mtime=0)
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    instrumentation.count("compressed_responses", encoding=encoding)
+    instrumentation.count("compressed_response_bytes_saved", len(body) - len(compressed))
+    return response
@@ -0,0 +1,215 @@
+import io
+import os
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Upper bound on one metric's digest; the insight model reads roughly 4 bytes per token
+DIGEST_MAX_BYTES = int(os.getenv("INSIGHT_DIGEST_BYTES", "1000"))
+# Periods listed one by one at the end of the digest
+RECENT_PERIODS = 8
+# Periods the recent trend is fitted on
+TREND_PERIODS = 12
+# Trailing window of the rolling mean
+ROLLING_PERIODS = 4
+# Centered window of the rolling median / MAD anomaly test, and the robust z-score
+# (0.6745 * deviation / MAD) beyond which a period is flagged
+ANOMALY_WINDOW = 13
+ANOMALY_THRESHOLD = 3.5
+MAX_ANOMALIES = 5
+# Level shifts are found by binary segmentation: each side of a split spans at least
+# MIN_SEGMENT periods, the shift is CHANGE_THRESHOLD standard errors or more, and it is at
+# least MIN_SHIFT noise sigmas (so long histories don't report negligible shifts)
+MAX_CHANGE_POINTS = 3
+MIN_SEGMENT = 4
+CHANGE_THRESHOLD = 5.0
+MIN_SHIFT = 1.0
+
+# Samples of these types add up (steps, energy, distance, minutes...), so a period is described
+# by its sum; for the rest (heart rate, speeds, percentages) the period mean is what matters
+CUMULATIVE_TYPES = {
+    "activeenergyburned", "appleexercisetime", "applestandtime", "basalenergyburned",
+    "distancecycling", "distancewalkingrunning", "distanceswimming", "flightsclimbed",
+    "stepcount", "swimmingstrokecount", "timeindaylight",
+}
+PERIOD_NAMES = {"daily": "day", "weekly": "week", "monthly": "month"}
+# Periods per year, for the year-ago comparison
+PERIODS_PER_YEAR = {"daily": 365, "weekly": 52, "monthly": 12}
+
+
+def primary_stat(record_type):
+    return "sum" if record_type in CUMULATIVE_TYPES else "mean"
+
+
+def fmt(value):
+    # Whole numbers for large values, three significant digits for small ones
+    if abs(value) >= 100:
+        return f"{value:.0f}"
+    return f"{value:.3g}"
+
+
+def signed(value):
+    return ("+" if value >= 0 else "") + fmt(value)
+
+
+def robust_sigma(values):
+    """Standard deviation estimated from the median absolute deviation (1.4826 * MAD)."""
+    if len(values) == 0:
+        return 0.0
+    return float(1.4826 * np.median(np.abs(values - np.median(values))))
+
+
+def slope(values):
+    """Least-squares slope per period, or 0 for fewer than two values."""
+    if len(values) < 2:
+        return 0.0
+    x = np.arange(len(values), dtype=np.float64)
+    x -= x.mean()
+    return float((x * (values - values.mean())).sum() / (x * x).sum())
+
+
+def rolling_z_scores(values, window=ANOMALY_WINDOW):
+    """Robust z-score of every value against the median and MAD of the window centered on it.
+
+    The windows are views over a reflected copy of the series, so the medians of all of them
+    are taken in one numpy call. Series shorter than a window are scored against their own
+    median; windows without spread fall back to the whole series' MAD.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    half = window // 2
+    if len(values) <= half:
+        median = np.full(len(values), np.median(values))
+        mad = np.full(len(values), np.median(np.abs(values - median)))
+    else:
+        windows = sliding_window_view(np.pad(values, half, mode="reflect"), 2 * half + 1)
+        median = np.median(windows, axis=1)
+        mad = np.median(np.abs(windows - median[:, None]), axis=1)
+    mad = np.where(mad > 0, mad, np.median(np.abs(values - np.median(values))))
+    deviation = values - median
+    return np.divide(0.6745 * deviation, mad, out=np.zeros_like(deviation), where=mad > 0)
+
+
+def _best_split(values, min_segment):
+    # Split maximizing the mean shift over its standard error (in units of the noise sigma,
+    # |after - before| / sqrt(1/k + 1/(n-k))), from one pass of cumulative sums
+    n = len(values)
+    if n < 2 * min_segment:
+        return None
+    totals = np.cumsum(values)
+    k = np.arange(min_segment, n - min_segment + 1)
+    before = totals[k - 1] / k
+    after = (totals[-1] - totals[k - 1]) / (n - k)
+    score = np.abs(after - before) * np.sqrt(k * (n - k) / n)
+    best = int(np.argmax(score))
+    return int(k[best]), float(before[best]), float(after[best]), float(score[best])
+
+
+def change_points(values, max_points=MAX_CHANGE_POINTS, min_segment=MIN_SEGMENT, threshold=CHANGE_THRESHOLD, min_shift=MIN_SHIFT):
+    """Level shifts in a series as sorted (index, mean before, mean after) tuples.
+
+    Binary segmentation: the segment with the strongest split is divided until max_points are
+    found or no split is significant. The noise is estimated from the first differences, which
+    a handful of shifts barely affect. A steady trend can still show up as a shift.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    noise = robust_sigma(np.diff(values)) / np.sqrt(2)
+    segments = [(0, len(values))]
+    found = []
+    while len(found) < max_points:
+        candidates = []
+        for start, end in segments:
+            split = _best_split(values[start:end], min_segment)
+            if split is not None and split[3] > threshold * noise and abs(split[2] - split[1]) > min_shift * noise:
+                candidates.append((split[3], start, end, split))
+        if not candidates:
+            break
+        _, start, end, (k, before, after, _) = max(candidates, key=lambda candidate: candidate[0])
+        segments.remove((start, end))
+        segments += [(start, start + k), (start + k, end)]
+        found.append((start + k, before, after))
+    return sorted(found)
+
+
+def fit(sections, max_bytes):
+    """Join sections into at most max_bytes of text, shortening the least important first.
+
+    sections is a list of (priority, renderings) in output order, renderings running from the
+    fullest to the shortest; a section that still doesn't fit is dropped altogether.
+    """
+    chosen = [0] * len(sections)
+
+    def render():
+        lines = (renderings[i] for (_, renderings), i in zip(sections, chosen) if i < len(renderings))
+        return "\n".join(line for line in lines if line)
+
+    text = render()
+    order = sorted(range(len(sections)), key=lambda i: sections[i][0], reverse=True)
+    for i in order:
+        while len(text.encode()) > max_bytes and chosen[i] < len(sections[i][1]):
+            chosen[i] += 1
+            text = render()
+    # Only the header is left and even that is too long
+    return text.encode()[:max_bytes].decode(errors="ignore")
+
+
+def digest_rollup(record_type, rollup, resolution="weekly", max_bytes=DIGEST_MAX_BYTES):
+    """A fixed-size statistical summary of one metric's rollup, for the insight prompt.
+
+    rollup is the frame from aggregate.load_rollup (or the same table as CSV text). The digest
+    covers the whole history - span, distribution, trend, rolling means, level shifts and
+    anomalies - plus the last RECENT_PERIODS values, and is cut down to max_bytes whatever the
+    history's length.
+    """
+    df = pd.read_csv(io.StringIO(rollup)) if isinstance(rollup, str) else rollup
+    stat = primary_stat(record_type)
+    period = PERIOD_NAMES.get(resolution, resolution)
+    if df.empty or stat not in df:
+        return f"metric: {record_type}\nno data"
+    dates = df["date"].astype(str).to_numpy()
+    values = df[stat].to_numpy(dtype=np.float64)
+    n = len(values)
+
+    sections = [(0, [f"metric: {record_type} ({stat} per {period}, {int(df['count'].sum())} samples)", f"metric: {record_type}"])]
+    sections.append((1, [f"span: {dates[0]} to {dates[-1]}, {n} {period}s with data"]))
+
+    p10, p50, p90 = np.percentile(values, [10, 50, 90])
+    low, high = int(np.argmin(values)), int(np.argmax(values))
+    sections.append((2, [
+        f"overall: mean {fmt(values.mean())}, sd {fmt(values.std())}, p10 {fmt(p10)}, median {fmt(p50)}, p90 {fmt(p90)}; "
+        f"lowest {fmt(values[low])} ({dates[low]}), highest {fmt(values[high])} ({dates[high]})",
+        f"overall: mean {fmt(values.mean())}, median {fmt(p50)}, range {fmt(values[low])} to {fmt(values[high])}",
+    ]))
+
+    trend = f"trend: {signed(slope(values))}/{period} overall"
+    if n > TREND_PERIODS:
+        trend += f", {signed(slope(values[-TREND_PERIODS:]))}/{period} over the last {TREND_PERIODS} {period}s"
+    sections.append((3, [trend]))
+
+    if n >= 2 * ROLLING_PERIODS:
+        rolling = pd.Series(values).rolling(ROLLING_PERIODS).mean().to_numpy()
+        line = f"{ROLLING_PERIODS}-{period} mean: {fmt(rolling[-1])} now, {fmt(rolling[-1 - ROLLING_PERIODS])} the {ROLLING_PERIODS} {period}s before"
+        year = PERIODS_PER_YEAR.get(resolution)
+        if year and n > year + ROLLING_PERIODS:
+            line += f", {fmt(rolling[-1 - year])} a year earlier"
+        sections.append((4, [line]))
+
+    shifts = [f"{dates[i]} {fmt(before)} -> {fmt(after)}" for i, before, after in change_points(values)]
+    if shifts:
+        sections.append((6, [f"level shifts: {'; '.join(shifts[:count])}" for count in range(len(shifts), 0, -1)]))
+
+    z = rolling_z_scores(values)
+    flagged = np.flatnonzero(np.abs(z) > ANOMALY_THRESHOLD)
+    # The strongest first when there are more than fit, listed in date order
+    flagged = flagged[np.argsort(-np.abs(z[flagged]), kind="stable")][:MAX_ANOMALIES]
+    if len(flagged):
+        renderings = []
+        for count in range(len(flagged), 0, -1):
+            shown = sorted(flagged[:count])
+            renderings.append("anomalies: " + "; ".join(f"{dates[i]} {fmt(values[i])} (z {z[i]:+.1f})" for i in shown))
+        sections.append((7, renderings))
+
+    recent = [f"recent {period}s: " + ", ".join(f"{dates[i]} {fmt(values[i])}" for i in range(max(0, n - count), n)) for count in (RECENT_PERIODS, RECENT_PERIODS // 2, 2)]
+    sections.append((5, recent))
+
+    return fit(sections, max_bytes)
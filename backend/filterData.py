@@ -1,53 +1,303 @@
 import os
+import hashlib
 import logging
+from functools import lru_cache
 from lxml import etree
-import pandas as pd
-from collections import defaultdict
+import instrumentation
+import record_store
 
 # Configure logging
 logging.basicConfig(filename="filter_data.log", level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
+# Define types to exclude; only the store's columns are kept of the rest (see record_store.SCHEMA)
+EXCLUDED_TYPES = {"HKQuantityTypeIdentifierHeadphoneAudioExposure", "HKCategoryTypeIdentifierHeadphoneAudioExposureEvent", "HKQuantityTypeIdentifierEnvironmentalAudioExposure"}
+
+# A record type is only exported once it has more than this many records
+MIN_RECORDS = 100
+# Rows buffered per record type before they are flushed to the store as one row group
+CHUNK_SIZE = 10000
+# Bytes read from disk per parser feed
+READ_SIZE = 1 << 20
+
+
+
+class ConcurrentUpdate(RuntimeError):
+    """Another upload changed the store between this one's start and its commit."""
+
+
+@lru_cache(maxsize=256)
+def utc_offset_seconds(suffix):
+    # " -0500" -> -18000; anything else counts as UTC
+    suffix = suffix.strip()
+    if len(suffix) == 5 and suffix[0] in "+-" and suffix[1:].isdigit():
+        seconds = int(suffix[1:3]) * 3600 + int(suffix[3:5]) * 60
+        return -seconds if suffix[0] == "-" else seconds
+    return 0
+
+
+def record_time(attrib, local=None):
+    """When a record was written to Health, in UTC nanoseconds since the epoch (NAT if unparseable).
+
+    Records are ordered for incremental ingest by this instant, so exports that cross a DST
+    or time zone change still compare correctly. local is the timestamp's wall-clock epoch_ns
+    when the caller has already parsed it.
+    """
+    text = attrib.get("creationDate") or attrib.get("startDate") or ""
+    if local is None:
+        local = record_store.epoch_ns(text)
+    if local == record_store.NAT:
+        return local
+    return local - utc_offset_seconds(text[19:]) * 1_000_000_000
+
+
+def record_identity(items):
+    # Tells apart records written in the same second
+    return hashlib.sha1(repr(sorted(items)).encode()).hexdigest()[:16]
+
+
+def load_watermark(saved):
+    """A stored watermark as {"time": UTC ns, "records": set of identities created at that time}."""
+    return {"time": saved["time"], "records": set(saved["records"])}
+
+
+class _TypeSink:
+    """Buffers records of one type in compact columns and flushes them to a staged part in chunks."""
+
+    def __init__(self, short_type, export_dir, incremental=False, min_records=MIN_RECORDS):
+        self.short_type = short_type
+        self.export_dir = export_dir
+        self.incremental = incremental
+        self.min_records = min_records
+        self.columns = record_store.RecordColumns()
+        self.count = 0
+        self.writer = None
+        self.min_start = None
+        # Latest creation time seen, and the attributes of every record created at that time
+        self.max_time = None
+        self.max_records = []
+
+    def append(self, attrib, chunk_size):
+        self.columns.append(self.short_type, attrib)
+        self.count += 1
+        start = attrib.get("startDate", "")[:19]
+        if start and (self.min_start is None or start < self.min_start):
+            self.min_start = start
+        # RecordColumns has just parsed the timestamp record_time needs
+        column = "creationDate" if attrib.get("creationDate") else "startDate"
+        created = record_time(attrib, self.columns.timestamps[column][-1])
+        if self.max_time is None or created > self.max_time:
+            self.max_time = created
+            self.max_records = [attrib.items()]
+        elif created == self.max_time:
+            self.max_records.append(attrib.items())
+        # Hold back small types until they cross the export threshold
+        if self.count > self.min_records and len(self.columns) >= chunk_size:
+            self.flush()
+
+    @property
+    def exported(self):
+        return self.count > self.min_records
+
+    def flush(self):
+        if not len(self.columns):
+            return
+        if self.writer is None:
+            self.writer = record_store.PartitionWriter(self.short_type, self.export_dir)
+        with instrumentation.span("store_write"):
+            self.writer.write(self.columns)
+        self.columns = record_store.RecordColumns()
+
+    def finish(self):
+        if self.exported:
+            self.flush()
+        if self.writer is not None:
+            self.writer.close()
+
+    def commit(self):
+        # A full export replaces whatever an earlier upload stored for this type,
+        # an incremental one adds a new part next to it
+        if self.writer is not None:
+            self.writer.commit(replace=not self.incremental)
+
+    def discard(self):
+        if self.writer is not None:
+            self.writer.discard()
+
+
+def exported_type(elem, watermarks):
+    """Return the short type of a Record element that should be exported, or None to skip it.
+
+    Records created before their type's watermark are skipped, and so are the ones created at
+    the watermark's instant that the previous upload already stored.
+    """
+    record_type = elem.attrib.get("type")
+    # Skip records with excluded types or all category type identifiers
+    if not record_type or "HKCategoryTypeIdentifier" in record_type or record_type in EXCLUDED_TYPES:
+        return None
+    # Remove the common prefix to create a short type name
+    short_type = record_type.replace("HKQuantityTypeIdentifier", "")
+    watermark = watermarks.get(short_type.lower())
+    if watermark is not None:
+        created = record_time(elem.attrib)
+        if created < watermark["time"] or (created == watermark["time"] and record_identity(elem.attrib.items()) in watermark["records"]):
+            return None
+    return short_type
 
-def filterData():
-    try:
-        # Define types and fields to exclude
-        excluded_types = {"HKQuantityTypeIdentifierHeadphoneAudioExposure", "HKCategoryTypeIdentifierHeadphoneAudioExposureEvent", "HKQuantityTypeIdentifierEnvironmentalAudioExposure"}
-        excluded_columns = {"sourceName", "sourceVersion", "device"}
 
-        records_by_type = defaultdict(list)
+def release(elem):
+    # Free the element and any siblings already processed so memory stays flat
+    elem.clear(keep_tail=True)
+    parent = elem.getparent()
+    if parent is not None:
+        while elem.getprevious() is not None:
+            del parent[0]
 
-        # Create a forgiving XML parser using lxml with recover=True
-        parser = etree.XMLParser(recover=True)
-        xml_path = "appleHealth/uploadData.xml"
+
+class RecordFilter:
+    """Incremental export of an Apple Health XML document to the columnar store.
+
+    Bytes are pushed in with feed() as they arrive, from a file or straight off an upload
+    stream, and each completed Record is filtered and buffered for its type right away.
+    Rows go to staged parts that readers don't see: finish() ends the document, commit() moves
+    the parts into the store and advances the watermarks, returning the same changes dict as
+    filterData, and abort() deletes them. close() is finish() and commit() in one.
+    """
+
+    def __init__(self, export_dir=record_store.EXPORT_DIR, chunk_size=CHUNK_SIZE, incremental=False):
+        # Create export directory if it doesn't exist
+        os.makedirs(export_dir, exist_ok=True)
+        self.export_dir = export_dir
+        self.chunk_size = chunk_size
+        self.incremental = incremental
+        self.saved_watermarks = record_store.load_watermarks(export_dir)
+        self.watermarks = {short_type: load_watermark(saved) for short_type, saved in self.saved_watermarks.items()} if incremental else {}
+        self.sinks = {}
+        # Every element's end is reported, not just Records', so that Workouts, ActivitySummaries
+        # and whatever else follows the last Record are released too
+        self.parser = etree.XMLPullParser(events=("end",), recover=True, huge_tree=True)
+
+    def feed(self, data):
+        instrumentation.count("filter_bytes", len(data))
+        self.parser.feed(data)
+        self._drain()
+
+    def _drain(self):
+        parsed = 0
+        for _, elem in self.parser.read_events():
+            if elem.tag != "Record":
+                # Children (MetadataEntry...) go with their element; finished top-level elements
+                # (direct children of <HealthData>) are freed like Records
+                parent = elem.getparent()
+                if parent is not None and parent.getparent() is None:
+                    release(elem)
+                continue
+            parsed += 1
+            short_type = exported_type(elem, self.watermarks)
+            if short_type is not None:
+                sink = self.sinks.get(short_type)
+                if sink is None:
+                    # Types we already store take any number of new rows
+                    known = short_type.lower() in self.watermarks
+                    sink = self.sinks[short_type] = _TypeSink(short_type, self.export_dir, self.incremental, 0 if known else MIN_RECORDS)
+                sink.append(elem.attrib, self.chunk_size)
+            release(elem)
+        instrumentation.count("filter_records_parsed", parsed)
+
+    def abort(self):
+        # Nothing of a failed run reaches the store, and the previous upload's watermarks stay
+        for sink in self.sinks.values():
+            sink.discard()
+
+    def finish(self):
+        try:
+            self.parser.close()
+            self._drain()
+            for sink in self.sinks.values():
+                sink.finish()
+        except Exception:
+            self.abort()
+            raise
+
+    def commit(self):
+        """Move the staged parts into the store and save the advanced watermarks.
+
+        Callers sharing the store must hold its lock. An incremental run whose watermarks were
+        changed by another upload since it started raises ConcurrentUpdate, since it may hold
+        rows that upload already stored.
+        """
+        try:
+            saved = record_store.load_watermarks(self.export_dir)
+            if self.incremental and saved != self.saved_watermarks:
+                raise ConcurrentUpdate("The store changed while the upload was read; upload it again")
+            # Each record type is exported to its own partition only if there are more than 100 records
+            exported = {short_type: sink for short_type, sink in self.sinks.items() if sink.exported}
+            watermarks = {short_type: load_watermark(watermark) for short_type, watermark in saved.items()}
+            if not self.incremental:
+                # Replaced types lose their watermark before their old parts, so a crash in
+                # between can't leave one pointing past deleted records
+                for short_type in exported:
+                    watermarks.pop(short_type.lower(), None)
+                self._save_watermarks(watermarks)
+            for sink in self.sinks.values():
+                if sink.exported:
+                    sink.commit()
+                else:
+                    sink.discard()
+        except Exception:
+            self.abort()
+            raise
+
+        changes = {}
+        for short_type, sink in exported.items():
+            self._advance_watermark(watermarks, short_type.lower(), sink)
+            changes[short_type.lower()] = sink.min_start
+            instrumentation.count("filter_records_stored", sink.count)
+            logger.info(f"Exported {record_store.type_dir(short_type, self.export_dir)} with {sink.count} records.")
+        self._save_watermarks(watermarks)
+        return changes
+
+    def close(self):
+        self.finish()
+        return self.commit()
+
+    def _save_watermarks(self, watermarks):
+        record_store.save_watermarks(
+            {short_type: {"time": watermark["time"], "records": sorted(watermark["records"])} for short_type, watermark in watermarks.items()},
+            self.export_dir,
+        )
+
+    @staticmethod
+    def _advance_watermark(watermarks, short_type, sink):
+        records = {record_identity(items) for items in sink.max_records}
+        watermark = watermarks.get(short_type)
+        if watermark is None or sink.max_time > watermark["time"]:
+            watermarks[short_type] = {"time": sink.max_time, "records": records}
+        elif sink.max_time == watermark["time"]:
+            watermark["records"] |= records
+
+
+def filterData(xml_path="appleHealth/uploadData.xml", export_dir=record_store.EXPORT_DIR, chunk_size=CHUNK_SIZE, incremental=False):
+    """Export the Records in xml_path to the columnar store.
+
+    With incremental=True only records newer than the per-type high-water marks left by the
+    previous upload are appended. Returns {record_type: earliest startDate written} for every
+    type that received new rows, which aggregateAll uses to recompute only the affected buckets.
+    """
+    try:
+        record_filter = RecordFilter(export_dir, chunk_size, incremental)
         try:
             with open(xml_path, "rb") as f:
-                tree = etree.parse(f, parser)
-                root = tree.getroot()
-                for elem in root.iter("Record"):
-                    record_type = elem.attrib.get("type")
-                    # Skip records with excluded types or all category type identifiers
-                    if record_type and "HKCategoryTypeIdentifier" not in record_type and record_type not in excluded_types:
-                        # Remove the common prefix to create a short type name
-                        short_type = record_type.replace("HKQuantityTypeIdentifier", "")
-                        # Collect attributes, excluding specified columns
-                        clean_record = {k: v for k, v in elem.attrib.items() if k not in excluded_columns}
-                        clean_record["type"] = short_type  # Overwrite full type with short type
-                        records_by_type[short_type].append(clean_record)
+                for block in iter(lambda: f.read(READ_SIZE), b""):
+                    record_filter.feed(block)
         except etree.XMLSyntaxError as e:
             logger.error(f"XML Parsing Error: {e}")
+            record_filter.abort()
             raise
-
-        # Create export directory if it doesn't exist
-        os.makedirs("export", exist_ok=True)
-
-        # Export each record type to its own CSV file only if there are at least 100 records
-        for short_type, records in records_by_type.items():
-            if len(records) > 100:
-                df = pd.DataFrame(records)
-                csv_filename = f"export/{short_type.lower()}.csv"
-                df.to_csv(csv_filename, index=False)
-                logger.info(f"Exported {csv_filename} with {len(records)} records.")
+        except Exception:
+            record_filter.abort()
+            raise
+        return record_filter.close()
 
     except Exception as e:
         logger.error(f"An unexpected error occurred: {e}")
@@ -55,4 +305,4 @@ def filterData():
 
 
 if __name__ == "__main__":
-    filterData()
\ No newline at end of file
+    filterData()
@@ -0,0 +1,267 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+import instrumentation
+
+# "auto" picks per series by backtest; any name in FORECASTERS forces that model
+FORECASTER = os.getenv("WEIGHT_FORECASTER", "auto")
+# Days forecast by /weight, and the horizon the backtests are scored on
+HORIZON = 30
+BACKTEST_FOLDS = 3
+# A baseline whose backtest error is within this factor of the series' day-to-day noise is
+# as good as any model can be, so the LSTM is not even tried
+NOISE_TOLERANCE = float(os.getenv("FORECAST_NOISE_TOLERANCE", "2.0"))
+# Otherwise the LSTM is used only if its backtest error is below this share of the best baseline's
+LSTM_MARGIN = float(os.getenv("FORECAST_LSTM_MARGIN", "0.9"))
+# auto decisions remembered per series, so repeat requests skip the backtests
+DECISION_CACHE_SIZE = 256
+# Shorter series aren't backtested: a few one-day folds say more about noise than about models
+MIN_BACKTEST_POINTS = 14
+
+Forecast = namedtuple("Forecast", ["model", "values", "scores"])
+
+
+class DampedTrend:
+    """Least-squares line through the last `window` points, its slope damped by phi per step.
+
+    With fewer than min_trend_points the slope would be mostly noise, so the forecast is flat.
+    """
+
+    name = "damped_trend"
+    min_points = 1
+
+    def __init__(self, window=60, phi=0.95, min_trend_points=7):
+        self.window = window
+        self.phi = phi
+        self.min_trend_points = min_trend_points
+
+    def fit(self, values):
+        recent = np.asarray(values[-self.window:], dtype=np.float64)
+        x = np.arange(len(recent), dtype=np.float64)
+        if len(recent) >= self.min_trend_points:
+            x_mean = x.mean()
+            self.slope = ((x - x_mean) * (recent - recent.mean())).sum() / ((x - x_mean) ** 2).sum()
+        else:
+            self.slope = 0.0
+        self.level = recent.mean() + self.slope * (x[-1] - x.mean())
+        return self
+
+    def forecast(self, steps):
+        return self.level + self.slope * np.cumsum(self.phi ** np.arange(1, steps + 1))
+
+
+class Holt:
+    """Holt's linear exponential smoothing; alpha and beta are picked from a grid by one-step SSE.
+
+    The grid is fitted in one pass, with every (alpha, beta) pair as a column of numpy arrays.
+    """
+
+    name = "holt"
+    min_points = 3
+    ALPHAS = np.linspace(0.05, 0.95, 10)
+    BETAS = np.array([0.01, 0.03, 0.1, 0.2, 0.3])
+
+    def __init__(self, max_points=365):
+        self.max_points = max_points
+
+    def fit(self, values):
+        y = np.asarray(values[-self.max_points:], dtype=np.float64)
+        alpha, beta = (grid.ravel() for grid in np.meshgrid(self.ALPHAS, self.BETAS))
+        level = np.full(alpha.shape, y[0])
+        trend = np.full(alpha.shape, np.mean(np.diff(y[:8])))
+        sse = np.zeros(alpha.shape)
+        for value in y[1:]:
+            predicted = level + trend
+            sse += (value - predicted) ** 2
+            new_level = alpha * value + (1 - alpha) * predicted
+            trend = beta * (new_level - level) + (1 - beta) * trend
+            level = new_level
+        best = np.argmin(sse)
+        self.alpha, self.beta = alpha[best], beta[best]
+        self.level, self.trend = level[best], trend[best]
+        return self
+
+    def forecast(self, steps):
+        return self.level + self.trend * np.arange(1, steps + 1)
+
+
+class SeasonalNaive:
+    """Repeats the last `period` days (a week by default)."""
+
+    name = "seasonal_naive"
+
+    def __init__(self, period=7):
+        self.period = period
+        self.min_points = period
+
+    def fit(self, values):
+        self.season = np.asarray(values[-self.period:], dtype=np.float64)
+        return self
+
+    def forecast(self, steps):
+        return np.resize(self.season, steps)
+
+
+class LSTMForecaster:
+    """The trained Weight_Model (see predict.train_weight_model), served through inference."""
+
+    name = "lstm"
+
+    def __init__(self, max_epochs=None, max_seconds=None):
+        self.max_epochs = max_epochs
+        self.max_seconds = max_seconds
+
+    @property
+    def min_points(self):
+        # Two training windows at least, see RNN_model.load_and_preprocess_data_from_df. predict
+        # loads torch, so it is only imported once the LSTM is actually considered
+        from predict import WINDOW_SIZE
+
+        return WINDOW_SIZE + 2
+
+    def fit(self, values):
+        import pandas as pd
+        from predict import TRAIN_MAX_SECONDS, WINDOW_SIZE, train_weight_model
+
+        max_seconds = TRAIN_MAX_SECONDS if self.max_seconds is None else self.max_seconds
+        self.window = np.asarray(values[-WINDOW_SIZE:], dtype=np.float32)
+        self.trained = train_weight_model(pd.DataFrame({"Weight": values}), window_size=WINDOW_SIZE, max_epochs=self.max_epochs, max_seconds=max_seconds)
+        return self
+
+    def forecast(self, steps):
+        import torch
+        import inference
+
+        trained = self.trained
+        return inference.forecast_weights(trained.model, torch.from_numpy(self.window), trained.data_min, trained.data_max, steps).numpy().astype(np.float64)
+
+
+BASELINES = (DampedTrend, Holt, SeasonalNaive)
+FORECASTERS = {forecaster.name: forecaster for forecaster in BASELINES + (LSTMForecaster,)}
+
+
+def backtest(factory, values, horizon=HORIZON, folds=BACKTEST_FOLDS):
+    """Mean absolute error of rolling-origin forecasts over the last `folds` horizons, or None.
+
+    Short series are scored on a shorter horizon (a quarter of the series); folds whose
+    training part is too short for the model are skipped.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    horizon = min(horizon, len(values) // 4)
+    if horizon < 1:
+        return None
+    errors = []
+    for fold in range(folds, 0, -1):
+        origin = len(values) - fold * horizon
+        forecaster = factory()
+        if origin < forecaster.min_points:
+            continue
+        predicted = forecaster.fit(values[:origin]).forecast(horizon)
+        errors.append(np.abs(predicted - values[origin:origin + horizon]).mean())
+    return float(np.mean(errors)) if errors else None
+
+
+def noise_floor(values):
+    """Expected absolute error of a perfect forecast: the series' day-to-day noise.
+
+    Estimated robustly from the first differences (MAD, scaled to a normal sigma and divided
+    by sqrt(2) because each difference carries two days of noise), then expressed as the
+    mean absolute deviation of that normal noise. Weights logged in whole pounds make most
+    differences 0 and the MAD with them, so the mean absolute difference stands in when the
+    MAD is 0, and the rounding error (a quarter of the quantization step) bounds it from below.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    diffs = np.diff(values)
+    if len(diffs) < 2:
+        return 0.0
+    sigma = 1.4826 * np.median(np.abs(diffs - np.median(diffs))) / np.sqrt(2)
+    floor = sigma * np.sqrt(2 / np.pi)
+    if floor == 0:
+        floor = np.abs(diffs).mean() / np.sqrt(2)
+    levels = np.unique(values)
+    if len(levels) > 1:
+        floor = max(floor, np.diff(levels).min() / 4)
+    return float(floor)
+
+
+def series_key(values, budget=()):
+    # The LSTM training budget is part of the key: a decision made on a truncated ?max_epochs
+    # backtest only holds for requests with the same budget
+    digest = hashlib.sha256(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+    digest.update(repr(budget).encode())
+    return digest.hexdigest()
+
+
+_decisions = OrderedDict()
+_decisions_lock = threading.Lock()
+
+
+def choose(values, lstm_factory, budget=()):
+    """Pick the forecaster for a series under the auto policy; returns (name, backtest scores).
+
+    The baselines are backtested first (milliseconds). The LSTM is only trained - once, on the
+    series minus its last horizon, scored on that horizon - when the series is long enough
+    and the best baseline is clearly worse than the noise in the data. Its backtest model is
+    then the prefix the final model is fine-tuned from. budget identifies the LSTM's training
+    budget in the decision cache.
+    """
+    key = series_key(values, budget)
+    with _decisions_lock:
+        if key in _decisions:
+            _decisions.move_to_end(key)
+            return _decisions[key]
+
+    if len(values) < MIN_BACKTEST_POINTS:
+        # A damped trend degrades to the mean of what's there for the shortest series
+        return DampedTrend.name, {}
+    with instrumentation.span("backtest", model="baselines"):
+        scores = {factory.name: backtest(factory, values) for factory in BASELINES}
+    scores = {name: score for name, score in scores.items() if score is not None}
+    best = min(scores, key=scores.get)
+
+    # torch is only loaded for series long enough for the LSTM that the baselines don't already fit
+    if scores[best] > NOISE_TOLERANCE * noise_floor(values) and len(values) - min(HORIZON, len(values) // 4) >= lstm_factory().min_points:
+        with instrumentation.span("backtest", model="lstm"):
+            scores["lstm"] = backtest(lstm_factory, values, folds=1)
+        if scores["lstm"] is not None and scores["lstm"] < LSTM_MARGIN * scores[best]:
+            best = "lstm"
+
+    with _decisions_lock:
+        _decisions[key] = (best, scores)
+        while len(_decisions) > DECISION_CACHE_SIZE:
+            _decisions.popitem(last=False)
+    return best, scores
+
+
+def forecast_series(values, steps=HORIZON, policy=FORECASTER, max_epochs=None, max_seconds=None):
+    """Forecast `steps` values past a weight series with the model the policy picks.
+
+    policy is "auto" or one of FORECASTERS; max_epochs / max_seconds bound LSTM training.
+    Raises ValueError for an unknown policy or a series too short for the requested model.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        raise ValueError("No weights to forecast from")
+
+    def lstm_factory():
+        return LSTMForecaster(max_epochs=max_epochs, max_seconds=max_seconds)
+
+    factories = {**FORECASTERS, "lstm": lstm_factory}
+    if policy == "auto":
+        name, scores = choose(values, lstm_factory, budget=(max_epochs, max_seconds))
+    elif policy in factories:
+        name, scores = policy, {}
+    else:
+        raise ValueError(f"Unknown forecaster '{policy}', expected auto or one of {', '.join(FORECASTERS)}")
+
+    forecaster = factories[name]()
+    if len(values) < forecaster.min_points:
+        raise ValueError(f"The {name} forecaster needs at least {forecaster.min_points} weights, got {len(values)}")
+    with instrumentation.span("weight_forecast", model=name):
+        predicted = forecaster.fit(values).forecast(steps)
+    instrumentation.count("weight_forecasts", model=name)
+    return Forecast(name, predicted, scores)
@@ -0,0 +1,86 @@
+import os
+import logging
+import threading
+import warnings
+import weakref
+
+import torch
+from torch import nn
+
+import RNN_model
+
+logger = logging.getLogger(__name__)
+
+# "torchscript" compiles each trained model for serving; "eager" runs Weight_Model.forecast as is
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torchscript")
+# Dynamic int8 quantization of the LSTM/Linear weights (CPU only)
+INFERENCE_QUANTIZE = os.getenv("INFERENCE_QUANTIZE", "1") == "1"
+# Intra-op threads for torch in this process; 0 keeps torch's default (one per core)
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", "0"))
+
+
+def configure_threads(threads=INFERENCE_THREADS):
+    # Small recurrent models rarely benefit from many threads; servers running several
+    # workers per host usually want 1-2 each
+    if threads > 0:
+        torch.set_num_threads(threads)
+
+
+# Applied once, whenever the serving stack first loads this module
+configure_threads()
+
+
+def compile_model(model, backend=INFERENCE_BACKEND, quantize=INFERENCE_QUANTIZE):
+    """Return a module computing model.forecast(x, steps), optimized for serving.
+
+    The trained model is left untouched: quantization works on a copy, and scripting only
+    wraps the existing modules.
+    """
+    model.eval()
+    forecaster = RNN_model.Forecaster(model.model[0], model.model[1]).eval()
+    with warnings.catch_warnings():
+        # Both torch.jit and the quantized tensor types are deprecated upstream, with no
+        # replacement yet for a scripted step loop over a quantized LSTM
+        warnings.simplefilter("ignore", FutureWarning)
+        warnings.filterwarnings("ignore", message="torch.quantize_per_tensor")
+        if quantize and next(model.parameters()).device.type == "cpu":
+            forecaster = torch.ao.quantization.quantize_dynamic(forecaster, {nn.LSTM, nn.Linear}, dtype=torch.qint8)
+        if backend == "torchscript":
+            forecaster = torch.jit.script(forecaster)
+    return forecaster
+
+
+# Compiled forecasters, dropped together with the trained model they were built from
+_compiled = weakref.WeakKeyDictionary()
+_compiled_lock = threading.Lock()
+
+
+def get_forecaster(model):
+    """Compiled forecaster for model, or None when the eager path should be used."""
+    if INFERENCE_BACKEND == "eager" and not INFERENCE_QUANTIZE:
+        return None
+    with _compiled_lock:
+        if model not in _compiled:
+            try:
+                _compiled[model] = compile_model(model)
+            except Exception:
+                logger.exception("Could not compile weight model; falling back to eager inference")
+                _compiled[model] = None
+        return _compiled[model]
+
+
+def forecast_weights(model, new_data, data_min, data_max, steps, forecaster=None):
+    """Same contract as RNN_model.forecast_weights, served by the compiled forecaster when available."""
+    forecaster = forecaster or get_forecaster(model)
+    if forecaster is None:
+        return RNN_model.forecast_weights(model, new_data, data_min, data_max, steps)
+
+    window = (new_data - data_min) / (data_max - data_min)
+    window = window.clone().detach().float().to(RNN_model.device).view(1, -1, 1)
+    try:
+        with torch.no_grad():
+            forecast = forecaster(window, steps)[0]
+    except Exception:
+        logger.exception("Compiled forecast failed; falling back to eager inference")
+        return RNN_model.forecast_weights(model, new_data, data_min, data_max, steps)
+    return (forecast * (data_max - data_min) + data_min).cpu()
@@ -0,0 +1,79 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+# Persistent cache of model completions keyed on a hash of everything that shapes the answer.
+# Set INSIGHT_CACHE_PATH to an empty string to disable caching.
+CACHE_PATH = os.getenv("INSIGHT_CACHE_PATH", "insight_cache.sqlite3")
+CACHE_TTL = float(os.getenv("INSIGHT_CACHE_TTL", str(7 * 24 * 3600)))  # seconds
+CACHE_MAX_ENTRIES = int(os.getenv("INSIGHT_CACHE_MAX_ENTRIES", "1000"))
+
+
+def cache_key(*parts):
+    """Hash the given JSON-serialisable parts into a stable cache key."""
+    encoded = json.dumps(parts, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class InsightCache:
+    """SQLite-backed completion cache with TTL expiry and least-recently-used eviction."""
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS insights ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS insights_last_access ON insights (last_access)")
+        self.conn.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute("SELECT value, created FROM insights WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self.conn.execute("DELETE FROM insights WHERE key = ?", (key,))
+                    self.conn.commit()
+                    self.evictions += 1
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE insights SET last_access = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, value):
+        now = time.time()
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO insights (key, value, created, last_access) VALUES (?, ?, ?, ?)", (key, value, now, now))
+            # Drop expired entries, then the least recently used ones beyond the size limit
+            expired = self.conn.execute("DELETE FROM insights WHERE created < ?", (now - self.ttl,)).rowcount
+            overflow = self.conn.execute(
+                "DELETE FROM insights WHERE key IN (SELECT key FROM insights ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+            self.conn.commit()
+            self.evictions += expired + overflow
+
+    def stats(self):
+        with self.lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM insights").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
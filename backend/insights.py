@@ -0,0 +1,144 @@
+import os
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from insight_cache import CACHE_PATH, InsightCache, cache_key
+import instrumentation
+
+# The serving endpoint can be pointed elsewhere (e.g. a local stub server) with DATABRICKS_URL
+DEFAULT_URL = "https://dbc-81784a62-a9c5.cloud.databricks.com/serving-endpoints/QuackHacks_Health_Insights/invocations"
+REQUEST_TIMEOUT = float(os.getenv("INSIGHT_TIMEOUT", "30"))  # seconds per request
+MAX_CONCURRENCY = int(os.getenv("INSIGHT_CONCURRENCY", "4"))  # requests in flight at once
+
+CATEGORY_PROMPT = """I will provide you with a statistical summary of the data from a specific category in the Apple Health app. Your task is to analyze the data and detect any significant patterns, trends, or anomalies. Please give a TWO SENTENCE summary and suggest potential correlations or insights that are useful. Only include normal sentence structure and do not go longer than TWO SENTENCES.
+
+Category: {category_name}
+
+Data:
+{category_data}
+"""
+
+OVERALL_PROMPT = """
+        Here is a list of all of the health insights which are derived from Apple Watch Data. Tell me the overall standing of my health according to these insights in TWO SENTENCES. Use normal sentence format only.
+
+        Insights:
+        {insights}
+    """
+
+MODEL_PARAMS = {"max_tokens": 200, "temperature": 0.1}
+
+
+class InsightClient:
+    """Client for the insight model that reuses pooled connections and runs requests concurrently."""
+
+    def __init__(self, url=None, token=None, timeout=REQUEST_TIMEOUT, max_concurrency=MAX_CONCURRENCY, cache=None):
+        self.url = url or os.getenv("DATABRICKS_URL", DEFAULT_URL)
+        self.token = token
+        self.timeout = timeout
+        self.cache = cache
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="insight")
+
+    def _headers(self):
+        # Retrieve token from environment variable
+        token = self.token or os.getenv("DATABRICKS_TOKEN")
+        if not token:
+            raise ValueError("DATABRICKS_TOKEN environment variable is not set")
+        return {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {token}"
+        }
+
+    def complete(self, prompt, default="No insight found"):
+        """Send one prompt to the model and return the completion text, raising on failure."""
+        payload = {
+            "max_tokens": MODEL_PARAMS["max_tokens"],
+            "messages": [
+                {
+                    "content": prompt,
+                    "role": "user"
+                }
+            ],
+            "temperature": MODEL_PARAMS["temperature"]
+        }
+        with instrumentation.span("insight_request"):
+            response = self.session.post(self.url, headers=self._headers(), json=payload, timeout=self.timeout)
+        instrumentation.count("insight_requests", status=response.status_code)
+        instrumentation.count("insight_prompt_bytes", len(prompt))
+        if response.status_code != 200:
+            raise Exception(f"API request failed with status {response.status_code}: {response.text}")
+        data = response.json()
+        return data.get("choices", [{}])[0].get("message", {}).get("content", default)
+
+    def _complete_or_error(self, prompt, default, key=None):
+        # Identical inputs are answered from the cache; only successful completions are stored
+        if self.cache is not None and key is not None:
+            cached = self.cache.get(key)
+            instrumentation.count("insight_cache_lookups", result="miss" if cached is None else "hit")
+            if cached is not None:
+                return cached
+        try:
+            insight = self.complete(prompt, default)
+        except ValueError:
+            raise
+        except Exception as e:
+            return f"Error generating insight: {str(e)}"
+        if self.cache is not None and key is not None:
+            self.cache.put(key, insight)
+        return insight
+
+    def category_insight(self, category_name, category_data):
+        """
+        Send the data for one category to the model and return the generated insight.
+
+        Args:
+            category_name (str): The category name (e.g., 'stepcount').
+            category_data (str): The category's digest (see digest.digest_rollup) or other text.
+
+        Returns:
+            str: The insight from the API or an error message if the request fails.
+        """
+        self._headers()  # fail fast if no token is configured
+        prompt = CATEGORY_PROMPT.format(category_name=category_name, category_data=category_data)
+        key = cache_key("category", category_name, category_data, CATEGORY_PROMPT, MODEL_PARAMS, self.url)
+        return self._complete_or_error(prompt, "No insight found", key)
+
+    def category_insights(self, categories):
+        """
+        Generate insights for several categories at once.
+
+        Args:
+            categories (dict): Maps a key (e.g. 'heartrate.csv') to a (category_name, category_data) tuple.
+
+        Returns:
+            dict: The same keys mapped to their insight or error message.
+        """
+        self._headers()
+        futures = {key: self.executor.submit(self.category_insight, name, data) for key, (name, data) in categories.items()}
+        return {key: future.result() for key, future in futures.items()}
+
+    def overall_insight(self, insights):
+        self._headers()
+        key = cache_key("overall", insights, OVERALL_PROMPT, MODEL_PARAMS, self.url)
+        return self._complete_or_error(OVERALL_PROMPT.format(insights=insights), "No overall insight found", key)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    # Upload jobs and requests can ask at the same time; they must share one client (and its pool)
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = InsightClient(cache=InsightCache() if CACHE_PATH else None)
+        return _client
+
+
+def get_databricks_insight(category_name, category_data):
+    return get_client().category_insight(category_name, category_data)
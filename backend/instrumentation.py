@@ -0,0 +1,262 @@
+import os
+import sys
+import time
+import bisect
+import logging
+import cProfile
+import resource
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Prefix of every exported metric name
+NAMESPACE = "health"
+# Seconds between resident-memory samples while a span is open
+RSS_SAMPLE_INTERVAL = float(os.getenv("RSS_SAMPLE_INTERVAL", "0.05"))
+# Upper bounds of the duration histogram buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# "off", "header" (profile requests sent with PROFILE_HEADER: 1) or "all"
+PROFILE = os.getenv("PROFILE", "off")
+PROFILE_HEADER = "X-Profile"
+# cProfile dumps (.prof, readable with pstats or snakeviz) are written here
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss():
+    """Resident set size of this process in bytes (the peak so far where /proc isn't available)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        return peak_rss()
+
+
+def peak_rss():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class _Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Process-wide counters, gauges and duration histograms, rendered in the Prometheus text format.
+
+    Metrics are identified by name plus a sorted tuple of label pairs. Work done in other
+    processes (e.g. aggregate's process pool) is not seen here.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    def count(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def get_count(self, name, **labels):
+        with self.lock:
+            return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def set_gauge(self, name, value, **labels):
+        with self.lock:
+            self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = _Histogram()
+            histogram.observe(seconds)
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+
+    def render(self):
+        lines = []
+        with self.lock:
+            counters = sorted(self.counters.items())
+            gauges = sorted(self.gauges.items())
+            histograms = sorted((key, (list(h.counts), h.sum, h.count)) for key, h in self.histograms.items())
+        gauges += [
+            (("process_resident_memory_bytes", ()), current_rss()),
+            (("process_peak_resident_memory_bytes", ()), peak_rss()),
+        ]
+
+        seen = set()
+
+        def family(name, kind):
+            # One TYPE line per metric name
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            family(f"{NAMESPACE}_{name}_total", "counter")
+            lines.append(f"{NAMESPACE}_{name}_total{_labels(labels)} {value}")
+        for (name, labels), value in gauges:
+            family(f"{NAMESPACE}_{name}", "gauge")
+            lines.append(f"{NAMESPACE}_{name}{_labels(labels)} {value}")
+        for (name, labels), (counts, total, count) in histograms:
+            metric = f"{NAMESPACE}_{name}"
+            family(metric, "histogram")
+            cumulative = 0
+            for bound, bucket in zip(BUCKETS + ("+Inf",), counts):
+                cumulative += bucket
+                lines.append(f"{metric}_bucket{_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{metric}_sum{_labels(labels)} {total}")
+            lines.append(f"{metric}_count{_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+registry = Registry()
+count = registry.count
+set_gauge = registry.set_gauge
+observe = registry.observe
+
+
+class _RSSSampler:
+    """Background thread that tracks the peak resident memory of every open span."""
+
+    def __init__(self, interval=RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.open_spans = {}
+        self.thread = None
+
+    def start(self, span_id):
+        rss = current_rss()
+        with self.lock:
+            self.open_spans[span_id] = rss
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+                self.thread.start()
+        return rss
+
+    def stop(self, span_id):
+        rss = current_rss()
+        with self.lock:
+            return max(self.open_spans.pop(span_id), rss)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self.lock:
+                if not self.open_spans:
+                    continue
+                rss = current_rss()
+                for span_id, peak in self.open_spans.items():
+                    if rss > peak:
+                        self.open_spans[span_id] = rss
+
+
+_sampler = _RSSSampler()
+
+
+class SpanResult:
+    """What a span measured: seconds elapsed, and the RSS at its start and the peak while it ran (bytes)."""
+
+    def __init__(self, start_rss):
+        self.start_rss = start_rss
+        self.peak_rss = start_rss
+        self.seconds = None
+
+
+@contextmanager
+def span(name, **labels):
+    """Time a block into span_seconds{span=name} and record the process's peak RSS while it ran.
+
+    The RSS is process-wide, so concurrent spans see each other's memory. Yields a SpanResult
+    that is filled in when the block exits.
+    """
+    span_id = object()
+    result = SpanResult(_sampler.start(span_id))
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result.seconds = time.perf_counter() - start
+        result.peak_rss = _sampler.stop(span_id)
+        observe("span_seconds", result.seconds, span=name, **labels)
+        set_gauge("span_peak_rss_bytes", result.peak_rss, span=name, **labels)
+        logger.debug(f"{name} {labels or ''} took {result.seconds:.3f}s, peak RSS {result.peak_rss / 2**20:.1f} MB")
+
+
+# Python 3.12+ allows one active profiler per interpreter, so there profiles never overlap;
+# before that each thread has its own and they can run side by side
+_profile_lock = threading.Lock() if sys.version_info >= (3, 12) else None
+
+
+class Profile:
+    """cProfile of the current thread for the duration of a with block, dumped to PROFILE_DIR.
+
+    path is set on exit, or stays None if the profiler was taken by another thread (3.12+).
+    """
+
+    def __init__(self, label):
+        self.label = "".join(c if c.isalnum() or c in "-_" else "_" for c in label)
+        self.profiler = None
+        self.path = None
+
+    def start(self):
+        if _profile_lock is not None and not _profile_lock.acquire(blocking=False):
+            logger.warning(f"Skipping profile of {self.label}: another profile is running")
+            return self
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+        return self
+
+    def stop(self):
+        if self.profiler is None:
+            return None
+        try:
+            self.profiler.disable()
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            self.path = os.path.join(PROFILE_DIR, f"{self.label}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{id(self):x}.prof")
+            self.profiler.dump_stats(self.path)
+            count("profiles", label=self.label.split("-")[0])
+        finally:
+            self.profiler = None
+            if _profile_lock is not None:
+                _profile_lock.release()
+        return self.path
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def profile_requested(headers):
+    """Whether a request with these headers should be profiled under the PROFILE setting."""
+    if PROFILE == "all":
+        return True
+    return PROFILE == "header" and headers.get(PROFILE_HEADER, "") not in ("", "0")
@@ -0,0 +1,124 @@
+import os
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import instrumentation
+
+logger = logging.getLogger(__name__)
+
+# Uploads processed at the same time; the request threads themselves never block on a job
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", "1"))
+# Finished jobs are forgotten after this many seconds
+JOB_TTL = float(os.getenv("JOB_TTL", "3600"))
+
+
+class Job:
+    """State of one background pipeline run. Waiters are woken on every change, and on_update
+    (if given) receives a snapshot so the state can be persisted for other processes."""
+
+    def __init__(self, stages, on_update=None):
+        self.id = uuid.uuid4().hex
+        self.stages = [name for name, _ in stages]
+        self.status = "queued"
+        self.stage = None
+        self.completed_stages = 0
+        self.result = None
+        self.error = None
+        self.profiles = []
+        self.created = time.time()
+        self.updated = self.created
+        self.version = 0
+        self.changed = threading.Condition()
+        self.on_update = on_update
+
+    @property
+    def done(self):
+        return self.status in ("succeeded", "failed")
+
+    def update(self, **fields):
+        with self.changed:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.updated = time.time()
+            self.version += 1
+            snapshot = self.to_dict()
+            self.changed.notify_all()
+        if self.on_update is not None:
+            self.on_update(snapshot)
+
+    def wait(self, timeout, since_version=None):
+        """Block until the job changes past since_version (or finishes), for at most timeout seconds."""
+        since_version = self.version if since_version is None else since_version
+        with self.changed:
+            self.changed.wait_for(lambda: self.done or self.version > since_version, timeout=timeout)
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "stages": self.stages,
+            "progress": self.completed_stages / len(self.stages) if self.stages else 1.0,
+            "version": self.version,
+            "result": self.result,
+            "error": self.error,
+            "profiles": self.profiles,
+        }
+
+
+class JobManager:
+    """Runs multi-stage jobs on a background executor and keeps their status for polling."""
+
+    def __init__(self, max_workers=PIPELINE_WORKERS, ttl=JOB_TTL):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pipeline")
+        self.ttl = ttl
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def submit(self, stages, context=None, on_update=None):
+        """Queue a job made of (name, fn) stages. Each fn receives the shared context dict and
+        may return a value that is stored under its stage name; the last stage's return value
+        becomes the job result. With context["profile"] set, every stage is also cProfiled."""
+        job = Job(stages, on_update)
+        with self.lock:
+            self._expire()
+            self.jobs[job.id] = job
+        job.update(status="queued")
+        self.executor.submit(self._run, job, stages, dict(context or {}))
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.done and job.updated < cutoff]:
+            del self.jobs[job_id]
+
+    def _run(self, job, stages, context):
+        result = None
+        job.update(status="running")
+        for index, (name, fn) in enumerate(stages):
+            job.update(stage=name)
+            profile = instrumentation.Profile(f"stage-{name}") if context.get("profile") else None
+            try:
+                with instrumentation.span("stage", stage=name):
+                    if profile is not None:
+                        profile.start()
+                    try:
+                        result = context[name] = fn(context)
+                    finally:
+                        if profile is not None and profile.stop():
+                            job.profiles.append(profile.path)
+            except Exception as e:
+                logger.exception(f"Job {job.id} failed in stage {name}")
+                instrumentation.count("jobs", status="failed")
+                job.update(status="failed", error=f"Error in {name}: {str(e)}")
+                return
+            job.update(completed_stages=index + 1)
+        instrumentation.count("jobs", status="succeeded")
+        job.update(status="succeeded", stage=None, result=result)
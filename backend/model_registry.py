@@ -0,0 +1,112 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import torch
+
+import RNN_model
+
+# Trained weight models are cached by a fingerprint of the series they were trained on
+MODEL_DIR = os.getenv("MODEL_REGISTRY_DIR", "models")
+MAX_MEMORY_MODELS = int(os.getenv("MODEL_REGISTRY_MEMORY", "16"))
+MAX_DISK_MODELS = int(os.getenv("MODEL_REGISTRY_DISK", "200"))
+# Bump when Weight_Model or its training changes so stale weights are not reused
+MODEL_VERSION = 1
+
+TrainedModel = namedtuple("TrainedModel", ["model", "data_min", "data_max", "length"])
+
+
+def fingerprint(values, window_size):
+    """Hash a weight series (as float32) together with the settings that shape its model."""
+    digest = hashlib.sha256(f"v{MODEL_VERSION}:w{window_size}:".encode())
+    digest.update(np.ascontiguousarray(values, dtype=np.float32).tobytes())
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    """Two-level LRU cache of trained models: a few in memory, more as state dicts on disk.
+
+    Files are named <series length>-<fingerprint>.pt so prefixes of a new series can be
+    looked up without loading anything.
+    """
+
+    def __init__(self, directory=MODEL_DIR, max_memory=MAX_MEMORY_MODELS, max_disk=MAX_DISK_MODELS):
+        self.directory = directory
+        self.max_memory = max_memory
+        self.max_disk = max_disk
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key, length):
+        return os.path.join(self.directory, f"{length}-{key}.pt")
+
+    def _disk_entries(self):
+        entries = {}
+        for filename in os.listdir(self.directory):
+            if filename.endswith(".pt") and "-" in filename:
+                length, key = filename[:-3].split("-", 1)
+                entries[key] = int(length)
+        return entries
+
+    def get(self, key):
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                return self.memory[key]
+
+        length = self._disk_entries().get(key)
+        if length is None:
+            return None
+        path = self._path(key, length)
+        try:
+            saved = torch.load(path, map_location=RNN_model.device)
+        except (OSError, RuntimeError):
+            return None
+        os.utime(path)  # mark as recently used for disk eviction
+
+        model = RNN_model.Weight_Model().to(RNN_model.device)
+        model.load_state_dict(saved["state_dict"])
+        model.eval()
+        entry = TrainedModel(model, saved["data_min"], saved["data_max"], saved["length"])
+        self._remember(key, entry)
+        return entry
+
+    def find_prefix(self, values, window_size):
+        """Return the cached model trained on the longest proper prefix of values, if any."""
+        with self.lock:
+            lengths = {entry.length for entry in self.memory.values()}
+        for length in sorted(lengths | set(self._disk_entries().values()), reverse=True):
+            if length < len(values):
+                entry = self.get(fingerprint(values[:length], window_size))
+                if entry is not None:
+                    return entry
+        return None
+
+    def put(self, key, entry):
+        torch.save(
+            {"state_dict": entry.model.state_dict(), "data_min": entry.data_min, "data_max": entry.data_max, "length": entry.length},
+            self._path(key, entry.length),
+        )
+        self._remember(key, entry)
+        self._evict_disk()
+
+    def _remember(self, key, entry):
+        with self.lock:
+            self.memory[key] = entry
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.max_memory:
+                self.memory.popitem(last=False)
+
+    def _evict_disk(self):
+        paths = [os.path.join(self.directory, f) for f in os.listdir(self.directory) if f.endswith(".pt")]
+        if len(paths) <= self.max_disk:
+            return
+        paths.sort(key=os.path.getmtime)
+        for path in paths[:len(paths) - self.max_disk]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -1,28 +1,114 @@
+import os
+from concurrent.futures import TimeoutError
 import torch
 import torch.nn as nn
 from torch.optim import Adam
+from torch.optim.lr_scheduler import ReduceLROnPlateau
 import RNN_model
+from model_registry import ModelRegistry, TrainedModel, fingerprint
+import instrumentation
+import batch_training
 
+WINDOW_SIZE = 30
+TRAIN_EPOCHS = 100
+# Epochs used to fine-tune a cached model on a series that extends the one it was trained on
+FINE_TUNE_EPOCHS = int(os.getenv("FINE_TUNE_EPOCHS", "10"))
+# Stop once the held-out loss has not improved for this many epochs (after a short warm-up)
+EARLY_STOPPING_PATIENCE = int(os.getenv("EARLY_STOPPING_PATIENCE", "15"))
+MIN_EPOCHS = 20
+# Default wall-clock budget for one training run, in seconds
+TRAIN_MAX_SECONDS = float(os.getenv("TRAIN_MAX_SECONDS", "30"))
 
-def handle_prediction(df):
+registry = ModelRegistry()
+
+
+def train_weight_model(df, window_size=WINDOW_SIZE, max_epochs=None, max_seconds=TRAIN_MAX_SECONDS):
+    """Return a TrainedModel for df['Weight'], reusing the registry whenever possible.
+
+    An identical series is served straight from the registry. A series that extends a cached
+    one starts from the cached weights and normalization and is fine-tuned for a few epochs;
+    anything else is trained from scratch. Training stops early on the held-out split and
+    never runs past max_epochs / max_seconds. A model cut short by a budget tighter than the
+    defaults is returned but not cached, so later requests for the series train it fully.
+    """
+    values = df["Weight"].values
+    key = fingerprint(values, window_size)
+    cached = registry.get(key)
+    if cached is not None:
+        print("Using cached weight model")
+        instrumentation.count("weight_models", mode="cached")
+        return cached
+
+    base = registry.find_prefix(values, window_size)
+    if base is not None:
+        print(f"Fine-tuning cached weight model trained on {base.length} points")
+        X_train, X_test, y_train, y_test, df, data_min, data_max = RNN_model.load_and_preprocess_data_from_df(df, window_size=window_size, data_min=base.data_min, data_max=base.data_max)
+    else:
+        X_train, X_test, y_train, y_test, df, data_min, data_max = RNN_model.load_and_preprocess_data_from_df(df, window_size=window_size)
+    train_loader, test_loader = RNN_model.prepare_data_loaders(X_train, X_test, y_train, y_test)
+
+    model = RNN_model.Weight_Model().to(RNN_model.device)
+    if base is not None:
+        model.load_state_dict(base.model.state_dict())
+    loss_fn = nn.MSELoss()
+    optimizer = Adam(model.parameters(), lr=0.001)
+    scheduler = ReduceLROnPlateau(optimizer, factor=0.5, patience=max(EARLY_STOPPING_PATIENCE // 2, 1))
+    default_epochs = FINE_TUNE_EPOCHS if base is not None else TRAIN_EPOCHS
+    num_epochs = default_epochs if max_epochs is None else min(default_epochs, max_epochs)
+    mode = "fine_tune" if base is not None else "scratch"
+    with instrumentation.span("train", mode=mode):
+        batched = None
+        if batch_training.BATCH_TRAINING and base is None and max_epochs is None:
+            batched = _train_batched(X_train, X_test, y_train, y_test, max_seconds)
+        if batched is not None:
+            model, epochs, stop = batched
+        else:
+            epochs, stop = RNN_model.train_model(
+                model, train_loader, loss_fn, optimizer, num_epochs=num_epochs,
+                val_loader=test_loader, patience=EARLY_STOPPING_PATIENCE, min_epochs=min(MIN_EPOCHS, num_epochs),
+                max_seconds=max_seconds, scheduler=scheduler,
+            )
+    print(f"Trained weight model for {epochs} epochs")
+    instrumentation.count("weight_models", mode=mode)
+    instrumentation.count("train_epochs", epochs, mode=mode)
+    model.eval()
+
+    trained = TrainedModel(model, float(data_min), float(data_max), len(values))
+    truncated = (stop == "epochs" and num_epochs < default_epochs) or (stop == "time" and max_seconds is not None and max_seconds < TRAIN_MAX_SECONDS)
+    if truncated:
+        print("Training was cut short by the request's budget; not caching the model")
+        instrumentation.count("weight_models_uncached", reason=stop)
+    else:
+        registry.put(key, trained)
+    return trained
+
+
+def _train_batched(X_train, X_test, y_train, y_test, max_seconds):
+    # Train alongside whatever other requests are queued; None if the shared trainer didn't
+    # deliver in time, in which case the caller trains the model by itself
+    trainer = batch_training.get_trainer(
+        num_epochs=TRAIN_EPOCHS, patience=EARLY_STOPPING_PATIENCE, min_epochs=MIN_EPOCHS,
+    )
+    future = trainer.submit(X_train, X_test, y_train, y_test, max_seconds=max_seconds)
     try:
-        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        return future.result(timeout=batch_training.result_timeout(max_seconds))
+    except TimeoutError:
+        future.cancel()
+        print("Batched training did not finish in time; training the model by itself")
+        instrumentation.count("weight_batch_timeouts")
+        return None
 
-        # Preprocess data
-        X_train, X_test, y_train, y_test, df, data_min, data_max = RNN_model.load_and_preprocess_data_from_df(df, window_size=30)
-        train_loader, test_loader = RNN_model.prepare_data_loaders(X_train, X_test, y_train, y_test)
 
-        # Train model
-        model = RNN_model.Weight_Model().to(device)
-        loss_fn = nn.MSELoss()
-        optimizer = Adam(model.parameters(), lr=0.001)
-        RNN_model.train_model(model, train_loader, loss_fn, optimizer, num_epochs=100)
+def handle_prediction(df):
+    try:
+        # Train (or reuse) the model
+        trained = train_weight_model(df)
 
         # Predict
         historical_weights = df["Weight"].values
         weight_tensor = torch.tensor(historical_weights).to(torch.float32)
-        new_data = weight_tensor[-30:]
-        predicted_weight = RNN_model.predict_weight(model, new_data, data_min, data_max)
+        new_data = weight_tensor[-WINDOW_SIZE:]
+        predicted_weight = RNN_model.predict_weight(trained.model, new_data, trained.data_min, trained.data_max)
 
         return {
             "prediction": round(float(predicted_weight)),
@@ -0,0 +1,187 @@
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+import pyarrow as pa
+
+import record_store
+
+# Metric indexes kept in memory, least recently used dropped first
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "32"))
+# Upper bounds on a single response
+MAX_RECORDS = int(os.getenv("QUERY_MAX_RECORDS", "10000"))
+MAX_BUCKETS = int(os.getenv("QUERY_MAX_BUCKETS", "5000"))
+
+DAY_NS = 86400 * 10**9
+STATS = ("mean", "sum", "min", "max", "count")
+
+
+def parse_time(text):
+    """Nanoseconds for an ISO date or datetime, in the same local wall-clock time as the store."""
+    moment = datetime.fromisoformat(text)
+    if moment.tzinfo is not None:
+        moment = moment.replace(tzinfo=None)
+    delta = moment - datetime(1970, 1, 1)
+    return (delta.days * 86400 + delta.seconds) * 10**9 + delta.microseconds * 1000
+
+
+def parse_resolution(text):
+    """Bucket width in nanoseconds from strings like "15min", "1h", "1D" or "7D"."""
+    import pandas as pd
+
+    width = pd.Timedelta(text).value
+    if width <= 0:
+        raise ValueError(f"Resolution must be positive: {text}")
+    return width
+
+
+class MetricIndex:
+    """One metric's records sorted by startDate, with a per-day offset table.
+
+    days[d] is the position of the first record starting on or after day d (counted from
+    the first record's day), so a timestamp is located by one table lookup plus a binary
+    search within that day.
+    """
+
+    def __init__(self, starts, values):
+        order = np.argsort(starts, kind="stable")
+        self.starts = starts[order]
+        self.values = values[order]
+        if len(self.starts):
+            self.first_day = self.starts[0] // DAY_NS * DAY_NS
+            boundaries = np.arange(self.first_day, self.starts[-1] + DAY_NS + 1, DAY_NS)
+            self.days = np.searchsorted(self.starts, boundaries)
+        else:
+            self.first_day = 0
+            self.days = np.zeros(1, dtype=np.int64)
+
+    @classmethod
+    def load(cls, short_type, export_dir=record_store.EXPORT_DIR):
+        df = record_store.read_records(short_type, columns=["startDate", "value"], export_dir=export_dir)
+        starts = df["startDate"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+        values = df["value"].to_numpy(dtype=np.float64)
+        # Records without a start or a numeric value can't be placed on a chart
+        valid = ~df["startDate"].isna().to_numpy() & np.isfinite(values)
+        return cls(starts[valid], values[valid])
+
+    def __len__(self):
+        return len(self.starts)
+
+    def position(self, timestamp):
+        """Index of the first record starting at or after timestamp."""
+        day = (timestamp - self.first_day) // DAY_NS
+        if day < 0:
+            return 0
+        if day >= len(self.days) - 1:
+            return len(self.starts)
+        lo, hi = self.days[day], self.days[day + 1]
+        return int(lo + np.searchsorted(self.starts[lo:hi], timestamp))
+
+    def span(self, start=None, end=None):
+        """[lo, hi) positions of the records with start <= startDate < end."""
+        lo = 0 if start is None else self.position(start)
+        hi = len(self.starts) if end is None else self.position(end)
+        return lo, max(lo, hi)
+
+    def resolution_for(self, points, start=None, end=None):
+        """Bucket width (whole seconds) that spreads the range over about `points` buckets."""
+        if points <= 0:
+            raise ValueError("points must be positive")
+        lo, hi = self.span(start, end)
+        if start is None:
+            start = self.starts[lo] if hi > lo else 0
+        if end is None:
+            end = self.starts[hi - 1] + 1 if hi > lo else start + 1
+        width = (int(end) - int(start)) // points + 1
+        # Round up to whole seconds so bucket edges stay readable
+        return max(-(-width // 10**9), 1) * 10**9
+
+    def records(self, start=None, end=None, limit=MAX_RECORDS):
+        lo, hi = self.span(start, end)
+        count = hi - lo
+        hi = min(hi, lo + limit)
+        return {
+            "count": count,
+            "truncated": count > hi - lo,
+            # Epoch milliseconds of each record's local startDate
+            "timestamps": (self.starts[lo:hi] // 10**6).tolist(),
+            "values": self.values[lo:hi].tolist(),
+        }
+
+    def series(self, width, stat="mean", start=None, end=None):
+        """Records bucketed into fixed-width intervals aligned to the epoch; empty buckets are left out."""
+        if stat not in STATS:
+            raise ValueError(f"Unknown stat '{stat}', expected one of {', '.join(STATS)}")
+        lo, hi = self.span(start, end)
+        if lo == hi:
+            return {"resolution_ms": width // 10**6, "timestamps": [], "values": []}
+
+        first = self.starts[lo] // width * width
+        buckets = (self.starts[hi - 1] - first) // width + 1
+        if buckets > MAX_BUCKETS:
+            raise ValueError(f"{buckets} buckets requested, at most {MAX_BUCKETS} allowed; use a coarser resolution")
+        edges = first + np.arange(buckets, dtype=np.int64) * width
+        offsets = np.searchsorted(self.starts[lo:hi], edges)
+        counts = np.diff(np.append(offsets, hi - lo))
+        nonempty = counts > 0
+        offsets, counts, edges = offsets[nonempty], counts[nonempty], edges[nonempty]
+
+        values = self.values[lo:hi]
+        if stat == "count":
+            result = counts.astype(np.float64)
+        elif stat == "min":
+            result = np.minimum.reduceat(values, offsets)
+        elif stat == "max":
+            result = np.maximum.reduceat(values, offsets)
+        else:
+            result = np.add.reduceat(values, offsets)
+            if stat == "mean":
+                result = result / counts
+        return {
+            "resolution_ms": width // 10**6,
+            "timestamps": (edges // 10**6).tolist(),
+            "values": np.round(result, 3).tolist(),
+        }
+
+
+class QueryCache:
+    """LRU cache of MetricIndex objects, rebuilt whenever their record type changes in the store."""
+
+    def __init__(self, max_entries=QUERY_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, short_type, export_dir=record_store.EXPORT_DIR):
+        """Index for a metric, or None if the store has no such metric."""
+        short_type = short_type.lower()
+        signature = record_store.version(short_type, export_dir)
+        if signature is None:
+            return None
+        key = (os.path.abspath(export_dir), short_type)
+        with self.lock:
+            cached = self.entries.get(key)
+            if cached is not None:
+                self.entries.move_to_end(key)
+                if cached[0] == signature:
+                    return cached[1]
+
+        try:
+            index = MetricIndex.load(short_type, export_dir)
+        except (OSError, pa.ArrowInvalid):
+            # A part still being written by an upload can't be read yet; serve the last index
+            if cached is not None:
+                return cached[1]
+            raise
+
+        with self.lock:
+            self.entries[key] = (signature, index)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return index
+
+
+cache = QueryCache()
@@ -0,0 +1,232 @@
+import os
+import json
+import math
+import uuid
+from array import array
+from datetime import date
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Columnar intermediate store written by filterData and read by the aggregation stages.
+# Records are partitioned by type: export/<type>/part-00000.parquet, part-00001.parquet, ...
+EXPORT_DIR = "export"
+
+# Per-type high-water marks (latest creationDate stored) used for incremental uploads
+WATERMARKS_FILE = "_watermarks.json"
+# Parts still being written by an upload; readers skip them (Arrow ignores names starting with "_")
+STAGED_PREFIX = "_staged-"
+
+TIMESTAMP_COLUMNS = ["creationDate", "startDate", "endDate"]
+SCHEMA = pa.schema([
+    ("type", pa.dictionary(pa.int32(), pa.string())),
+    ("unit", pa.dictionary(pa.int32(), pa.string())),
+    ("creationDate", pa.timestamp("ns")),
+    ("startDate", pa.timestamp("ns")),
+    ("endDate", pa.timestamp("ns")),
+    ("value", pa.float64()),
+])
+
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+_NS_PER_SECOND = 1_000_000_000
+# Sentinel for timestamps that can't be parsed; written as nulls
+NAT = np.iinfo(np.int64).min
+
+
+@lru_cache(maxsize=65536)
+def _midnight_ns(day):
+    # Exports repeat the same few thousand days millions of times, so each is parsed once
+    if len(day) != 10 or day[4] != "-" or day[7] != "-":
+        return NAT
+    try:
+        return (date(int(day[:4]), int(day[5:7]), int(day[8:10])).toordinal() - _EPOCH_ORDINAL) * 86400 * _NS_PER_SECOND
+    except ValueError:
+        return NAT
+
+
+def epoch_ns(text):
+    """Nanoseconds since the epoch for an Apple timestamp such as "2020-12-08 10:15:00 -0500".
+
+    The UTC offset is ignored: local wall-clock time is kept so that daily/weekly buckets line
+    up with the user's own days. Returns NAT for anything else.
+    """
+    if not text or len(text) < 19 or text[10] != " " or text[13] != ":" or text[16] != ":":
+        return NAT
+    midnight = _midnight_ns(text[:10])
+    if midnight == NAT:
+        return NAT
+    try:
+        hour, minute, second = int(text[11:13]), int(text[14:16]), int(text[17:19])
+    except ValueError:
+        return NAT
+    if hour > 23 or minute > 59 or second > 59:
+        return NAT
+    return midnight + (hour * 3600 + minute * 60 + second) * _NS_PER_SECOND
+
+
+class RecordColumns:
+    """Compact, growable columns for one chunk of records, in the store's schema.
+
+    Timestamps are kept as int64 nanoseconds (see epoch_ns), values as doubles, and unit/type
+    as int32 codes into a small string dictionary, so a record costs a few dozen bytes
+    instead of a dict of strings.
+    """
+
+    def __init__(self):
+        self.timestamps = {name: array("q") for name in TIMESTAMP_COLUMNS}
+        self.values = array("d")
+        self.codes = {"type": array("i"), "unit": array("i")}
+        self.dictionaries = {"type": {}, "unit": {}}
+
+    def __len__(self):
+        return len(self.values)
+
+    def encode(self, column, text):
+        if text is None:
+            return -1
+        dictionary = self.dictionaries[column]
+        code = dictionary.get(text)
+        if code is None:
+            code = dictionary[text] = len(dictionary)
+        return code
+
+    def append(self, short_type, attrib):
+        """Add one Record from its XML attributes."""
+        for name, column in self.timestamps.items():
+            column.append(epoch_ns(attrib.get(name)))
+        try:
+            value = float(attrib.get("value"))
+        except (TypeError, ValueError):
+            value = math.nan
+        self.values.append(value)
+        self.codes["type"].append(self.encode("type", short_type))
+        self.codes["unit"].append(self.encode("unit", attrib.get("unit")))
+
+    def to_table(self):
+        """Arrow table in SCHEMA, with unparseable timestamps as nulls."""
+        columns = {}
+        for name in SCHEMA.names:
+            if name in self.timestamps:
+                nanoseconds = np.frombuffer(self.timestamps[name], dtype=np.int64)
+                columns[name] = pa.array(nanoseconds, type=pa.timestamp("ns"), mask=nanoseconds == NAT)
+            elif name == "value":
+                columns[name] = pa.array(np.frombuffer(self.values, dtype=np.float64), type=pa.float64())
+            else:
+                codes = np.frombuffer(self.codes[name], dtype=np.int32)
+                dictionary = pa.array(list(self.dictionaries[name]), type=pa.string())
+                columns[name] = pa.DictionaryArray.from_arrays(pa.array(codes, mask=codes < 0), dictionary)
+        return pa.Table.from_pydict(columns, schema=SCHEMA)
+
+
+def type_dir(short_type, export_dir=EXPORT_DIR):
+    return os.path.join(export_dir, short_type.lower())
+
+
+def list_types(export_dir=EXPORT_DIR):
+    """Return the (lowercase) record types that have data in the store."""
+    if not os.path.isdir(export_dir):
+        return []
+    return sorted(
+        name for name in os.listdir(export_dir)
+        if os.path.isdir(os.path.join(export_dir, name)) and any(f.endswith(".parquet") for f in os.listdir(os.path.join(export_dir, name)))
+    )
+
+
+def partition_size(short_type, export_dir=EXPORT_DIR):
+    """Total on-disk size of a record type's Parquet parts, in bytes."""
+    directory = type_dir(short_type, export_dir)
+    return sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory) if f.endswith(".parquet"))
+
+
+class PartitionWriter:
+    """Writes chunks of records to a new Parquet part inside a record type's partition.
+
+    The part is staged under a name readers skip until commit() renames it into the partition
+    (replacing the partition's other parts with replace=True); discard() deletes it instead.
+    """
+
+    def __init__(self, short_type, export_dir=EXPORT_DIR):
+        self.short_type = short_type
+        self.export_dir = export_dir
+        self.directory = type_dir(short_type, export_dir)
+        os.makedirs(self.directory, exist_ok=True)
+        self.staged_path = os.path.join(self.directory, f"{STAGED_PREFIX}{uuid.uuid4().hex}")
+        self.writer = None
+
+    def write(self, columns):
+        if not len(columns):
+            return
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.staged_path, SCHEMA)
+        self.writer.write_table(columns.to_table())
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+    def commit(self, replace=False):
+        self.close()
+        if self.writer is None:
+            return
+        if replace:
+            clear_type(self.short_type, self.export_dir)
+        existing = [f for f in os.listdir(self.directory) if f.startswith("part-") and f.endswith(".parquet")]
+        os.replace(self.staged_path, os.path.join(self.directory, f"part-{len(existing):05d}.parquet"))
+
+    def discard(self):
+        self.close()
+        if os.path.exists(self.staged_path):
+            os.remove(self.staged_path)
+
+
+def version(short_type, export_dir=EXPORT_DIR):
+    """Changes whenever a record type's stored data changes; None if the type has no data."""
+    directory = type_dir(short_type, export_dir)
+    if not os.path.isdir(directory):
+        return None
+    # Any new, replaced or rewritten Parquet part changes the version
+    entries = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".parquet"):
+            stat = os.stat(os.path.join(directory, name))
+            entries.append((name, stat.st_size, stat.st_mtime_ns))
+    return tuple(entries) or None
+
+
+def clear_type(short_type, export_dir=EXPORT_DIR):
+    directory = type_dir(short_type, export_dir)
+    if os.path.isdir(directory):
+        for f in os.listdir(directory):
+            if f.endswith(".parquet"):
+                os.remove(os.path.join(directory, f))
+
+
+def read_records(short_type, columns=("startDate", "value"), export_dir=EXPORT_DIR, since=None):
+    """Read the requested columns of one record type, memory-mapping the Parquet parts.
+
+    If since is given only records starting at or after it are returned; row groups that end
+    before it are skipped using the Parquet statistics.
+    """
+    filters = [("startDate", ">=", pd.Timestamp(since))] if since is not None else None
+    table = pq.read_table(type_dir(short_type, export_dir), columns=list(columns), filters=filters, memory_map=True)
+    return table.to_pandas()
+
+
+def load_watermarks(export_dir=EXPORT_DIR):
+    path = os.path.join(export_dir, WATERMARKS_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_watermarks(watermarks, export_dir=EXPORT_DIR):
+    path = os.path.join(export_dir, WATERMARKS_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(watermarks, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
@@ -0,0 +1,267 @@
+import os
+import re
+import json
+import time
+import uuid
+import fcntl
+import shutil
+import threading
+from contextlib import contextmanager
+
+# Every client session gets its own working directory holding its uploads, columnar store,
+# rollups and insights. Everything lives on disk, so any worker process can serve any session.
+SESSIONS_DIR = os.getenv("SESSIONS_DIR", "sessions")
+SESSION_TTL = float(os.getenv("SESSION_TTL", str(24 * 3600)))  # seconds since last use
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "100"))
+SESSION_HEADER = "X-Session-Id"
+# Longest sleep between checks of a session's files while waiting on work another worker does
+POLL_INTERVAL = float(os.getenv("SESSION_POLL_INTERVAL", "0.5"))
+
+# Job statuses after which a job no longer touches its workspace (see jobs.Job)
+JOB_DONE_STATUSES = ("succeeded", "failed")
+
+_HEX_ID = re.compile(r"^[0-9a-f]{32}$")  # session and job ids
+_ACCESS_FILE = ".last_access"
+# Record parts an upload is still writing (record_store.STAGED_PREFIX; not imported, as
+# record_store pulls in pandas and pyarrow)
+_STAGED_PREFIX = "_staged-"
+# Sessions being deleted are renamed to this first; the name is never a valid session id
+_DELETED_PREFIX = ".deleted-"
+
+# Per-session events set when insights are written by this process
+_insight_events = {}
+_events_lock = threading.Lock()
+
+
+def _insights_event(session_id):
+    with _events_lock:
+        return _insight_events.setdefault(session_id, threading.Event())
+
+
+class Workspace:
+    """Paths and persisted state for one session."""
+
+    def __init__(self, session_id, root_dir=SESSIONS_DIR):
+        self.id = session_id
+        self.root = os.path.join(root_dir, session_id)
+        self.export_dir = os.path.join(self.root, "export")
+        self.aggregated_dir = os.path.join(self.root, "aggregated")
+        self.jobs_dir = os.path.join(self.root, "jobs")
+        self.insights_path = os.path.join(self.root, "insights.json")
+
+    def create(self):
+        for directory in (self.root, self.export_dir, self.aggregated_dir, self.jobs_dir):
+            os.makedirs(directory, exist_ok=True)
+        self.touch()
+        return self
+
+    def touch(self):
+        with open(os.path.join(self.root, _ACCESS_FILE), "w") as f:
+            f.write(str(time.time()))
+
+    @contextmanager
+    def lock(self):
+        """Exclusive lock on the workspace's store, held across processes.
+
+        Raises FileNotFoundError if the session was deleted, including while waiting for the lock.
+        """
+        with open(os.path.join(self.root, ".lock"), "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                # cleanup_sessions moves a session aside before releasing its lock
+                if not os.path.isdir(self.root):
+                    raise FileNotFoundError(f"Session {self.id} was deleted")
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    @contextmanager
+    def try_lock(self):
+        """Like lock(), but without waiting: yields whether the lock was taken."""
+        try:
+            f = open(os.path.join(self.root, ".lock"), "a")
+        except OSError:
+            yield False
+            return
+        with f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def save_json(self, path, data):
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def save_insights(self, insights):
+        self.save_json(self.insights_path, insights)
+        _insights_event(self.id).set()
+
+    def load_insights(self):
+        if not os.path.exists(self.insights_path):
+            return None
+        with open(self.insights_path) as f:
+            return json.load(f)
+
+    def wait_for_insights(self, timeout, poll_interval=POLL_INTERVAL):
+        """Return the session's insights, waiting up to timeout seconds for a running job to write them.
+
+        A job in this process wakes the wait right away; one on another worker is seen by
+        re-reading the file every poll_interval seconds.
+        """
+        deadline = time.monotonic() + timeout
+        event = _insights_event(self.id)
+        insights = self.load_insights()
+        while insights is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if event.wait(min(poll_interval, remaining)):
+                # Set by an earlier job; the file must be rewritten before it is worth reading again
+                time.sleep(min(poll_interval, remaining))
+            insights = self.load_insights()
+        return insights
+
+    def save_job(self, job_state):
+        self.save_json(os.path.join(self.jobs_dir, f"{job_state['job_id']}.json"), job_state)
+
+    def load_job(self, job_id):
+        path = os.path.join(self.jobs_dir, f"{job_id}.json")
+        if not _HEX_ID.match(job_id) or not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def wait_for_job(self, job_id, timeout, since_version=None, poll_interval=POLL_INTERVAL):
+        """Saved state of a job run by another worker, once it moves past since_version or finishes.
+
+        The job file is re-read with a backoff from 50 ms up to poll_interval, for at most
+        timeout seconds; the last state read is returned either way.
+        """
+        deadline = time.monotonic() + timeout
+        state = self.load_job(job_id)
+        since_version = state["version"] if since_version is None and state is not None else since_version
+        delay = 0.05
+        while state is not None and state["status"] not in JOB_DONE_STATUSES and state["version"] <= since_version:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, poll_interval)
+            state = self.load_job(job_id)
+        return state
+
+    def busy(self, stale_after=SESSION_TTL):
+        """Whether a job may still be using the workspace: its lock is held, an upload is writing
+        staged record parts, or a job file hasn't finished. Staged parts and job files that weren't
+        written to within stale_after seconds are taken to belong to dead workers."""
+        if not os.path.isdir(self.root):
+            return False
+        with self.try_lock() as locked:
+            return not locked or self._in_use(stale_after)
+
+    def _in_use(self, stale_after):
+        # busy() minus the lock check, for callers already holding the lock
+        cutoff = time.time() - stale_after
+        for path in self._staged_parts():
+            try:
+                if os.path.getmtime(path) >= cutoff:
+                    return True
+            except OSError:
+                # Committed or discarded since it was listed
+                continue
+        try:
+            names = os.listdir(self.jobs_dir)
+        except OSError:
+            return False
+        for name in names:
+            path = os.path.join(self.jobs_dir, name)
+            if not name.endswith(".json"):
+                continue
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    continue
+                with open(path) as f:
+                    if json.load(f).get("status") not in JOB_DONE_STATUSES:
+                        return True
+            except (OSError, ValueError):
+                continue
+        return False
+
+    def _staged_parts(self):
+        try:
+            types = os.listdir(self.export_dir)
+        except OSError:
+            return []
+        parts = []
+        for short_type in types:
+            directory = os.path.join(self.export_dir, short_type)
+            try:
+                parts += [os.path.join(directory, name) for name in os.listdir(directory) if name.startswith(_STAGED_PREFIX)]
+            except OSError:
+                continue
+        return parts
+
+
+def last_access(root):
+    try:
+        return os.path.getmtime(os.path.join(root, _ACCESS_FILE))
+    except OSError:
+        return 0.0
+
+
+def cleanup_sessions(root_dir=SESSIONS_DIR, ttl=SESSION_TTL, max_sessions=MAX_SESSIONS, keep=()):
+    """Delete sessions idle for longer than ttl, then the least recently used beyond max_sessions.
+
+    Sessions with a job still running on them (see Workspace.busy) are left for a later pass.
+    """
+    if not os.path.isdir(root_dir):
+        return
+    # Left behind by a pass that died while deleting
+    for name in os.listdir(root_dir):
+        if name.startswith(_DELETED_PREFIX):
+            shutil.rmtree(os.path.join(root_dir, name), ignore_errors=True)
+    sessions = sorted(
+        ((last_access(os.path.join(root_dir, name)), name) for name in os.listdir(root_dir) if _HEX_ID.match(name)),
+        reverse=True,
+    )
+    cutoff = time.time() - ttl
+    for index, (accessed, name) in enumerate(sessions):
+        if name not in keep and (accessed < cutoff or index >= max_sessions):
+            workspace = Workspace(name, root_dir)
+            deleted = os.path.join(root_dir, f"{_DELETED_PREFIX}{name}-{uuid.uuid4().hex}")
+            with workspace.try_lock() as locked:
+                if not locked or workspace._in_use(SESSION_TTL):
+                    continue
+                # Renamed while holding the lock, so no job can start on the session between the
+                # check and the delete; one waiting for the lock finds the session gone
+                try:
+                    os.rename(workspace.root, deleted)
+                except OSError:
+                    continue
+            shutil.rmtree(deleted, ignore_errors=True)
+            with _events_lock:
+                _insight_events.pop(name, None)
+
+
+def get_workspace(session_id=None, create=True, root_dir=SESSIONS_DIR):
+    """Return the workspace for session_id, or a brand new session if it is missing or invalid.
+
+    With create=False an unknown session yields None instead.
+    """
+    if session_id and _HEX_ID.match(session_id) and os.path.isdir(os.path.join(root_dir, session_id)):
+        workspace = Workspace(session_id, root_dir)
+        workspace.touch()
+        return workspace
+    if not create:
+        return None
+    workspace = Workspace(uuid.uuid4().hex, root_dir).create()
+    cleanup_sessions(root_dir, keep=(workspace.id,))
+    return workspace
@@ -0,0 +1,52 @@
+import pandas as pd
+
+import aggregate
+import filterData
+from test_filter_data import export, record, stamp
+
+
+def test_incremental_merge_matches_full_rebuild(tmp_path):
+    export_dir, incremental_dir, full_dir = (str(tmp_path / name) for name in ("export", "incremental", "full"))
+    # Three days of minutely heart rates, then two more days that also rewrite the last day's buckets
+    first = [record(stamp(i), value=60 + i % 40) for i in range(3 * 1440)]
+    aggregate.aggregateAll(export_dir, incremental_dir, since=filterData.filterData(export(tmp_path / "first.xml", first), export_dir=export_dir))
+    second = first + [record(stamp(i), value=60 + i % 40) for i in range(3 * 1440, 5 * 1440)]
+    changes = filterData.filterData(export(tmp_path / "second.xml", second), export_dir=export_dir, incremental=True)
+    assert changes == {"heartrate": "2024-01-04 00:00:00"}
+    aggregate.aggregateAll(export_dir, incremental_dir, since=changes)
+    aggregate.aggregateAll(export_dir, full_dir)
+
+    for resolution in aggregate.RESOLUTIONS:
+        merged = aggregate.load_rollup("heartrate", resolution, incremental_dir)
+        pd.testing.assert_frame_equal(merged, aggregate.load_rollup("heartrate", resolution, full_dir))
+    daily = aggregate.load_rollup("heartrate", "daily", incremental_dir)
+    assert len(daily) == 5
+    assert daily["count"].tolist() == [1440] * 5
+
+
+def test_merge_keeps_buckets_before_the_cutoff(tmp_path):
+    path = str(tmp_path / "rollup.parquet")
+    frame = pd.DataFrame({"startDate": pd.date_range("2024-01-01", periods=10, freq="D"), "value": range(10)})
+    aggregate.save_rollup(path, aggregate.rollup(frame, "D"))
+    update = pd.DataFrame({"startDate": pd.date_range("2024-01-08", periods=5, freq="D"), "value": [100.0] * 5})
+    aggregate.merge_rollup(path, aggregate.rollup(update, "D"), pd.Timestamp("2024-01-08"))
+
+    merged = aggregate.load_rollup("rollup", ".", str(tmp_path))
+    assert merged["date"].astype(str).tolist() == [f"2024-01-{day:02d}" for day in range(1, 13)]
+    assert merged["sum"].tolist() == [float(value) for value in range(7)] + [100.0] * 5
+
+
+def test_missing_rollup(tmp_path):
+    assert aggregate.load_rollup("heartrate", "weekly", str(tmp_path)) is None
+
+
+def test_cached_rollup_is_reloaded_when_rewritten(tmp_path):
+    path = aggregate.rollup_path("heartrate", "daily", str(tmp_path))
+    (tmp_path / "daily").mkdir()
+    frame = pd.DataFrame({"startDate": pd.date_range("2024-01-01", periods=3, freq="D"), "value": [1.0, 2.0, 3.0]})
+    aggregate.save_rollup(path, aggregate.rollup(frame, "D"))
+    first = aggregate.load_rollup("heartrate", "daily", str(tmp_path))
+    assert aggregate.load_rollup("heartrate", "daily", str(tmp_path)) is first
+
+    aggregate.merge_rollup(path, aggregate.rollup(frame[2:].assign(value=10.0), "D"), pd.Timestamp("2024-01-03"))
+    assert aggregate.load_rollup("heartrate", "daily", str(tmp_path))["sum"].tolist() == [1.0, 2.0, 10.0]
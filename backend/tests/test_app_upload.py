@@ -0,0 +1,103 @@
+import functools
+import io
+import os
+
+import pytest
+
+import app as app_module
+import record_store
+import sessions
+import uploads
+from test_filter_data import FOOTER, HEADER, record, stamp
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # Sessions are created under the working directory; insights need a model endpoint, so stop after filtering
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(app_module, "UPLOAD_STAGES", app_module.UPLOAD_STAGES[:1])
+    return app_module.app.test_client()
+
+
+def post(client, body, filename="export.xml"):
+    return client.post("/appleDataUpload", data=body, query_string={"filename": filename}, content_type="application/xml")
+
+
+def follow(client, job, session_id):
+    while job["status"] not in ("succeeded", "failed"):
+        job = client.get(
+            f"/jobs/{job['job_id']}", query_string={"wait": 10, "since": job["version"]}, headers={"X-Session-Id": session_id}
+        ).get_json()
+    return job
+
+
+def staged_parts(session_dir):
+    export_dir = session_dir / "export"
+    return [name for directory in export_dir.iterdir() if directory.is_dir() for name in os.listdir(directory) if name.startswith(record_store.STAGED_PREFIX)]
+
+
+def test_upload_is_stored_by_the_job(client, tmp_path):
+    response = post(client, HEADER + b"".join(record(stamp(i)) for i in range(150)) + FOOTER)
+    assert response.status_code == 202
+    session_id = response.get_json()["session_id"]
+    job = follow(client, response.get_json(), session_id)
+    assert job["status"] == "succeeded", job["error"]
+    assert job["stages"] == ["store"]
+    assert job["result"] == {"heartrate": "2024-01-01 00:00:00"}
+
+    session_dir = tmp_path / "sessions" / session_id
+    assert staged_parts(session_dir) == []
+    assert len(record_store.read_records("heartrate", export_dir=str(session_dir / "export"))) == 150
+
+
+def test_upload_is_parsed_without_the_session_lock(client, tmp_path):
+    first = [record(stamp(i)) for i in range(150)]
+    response = post(client, HEADER + b"".join(first) + FOOTER)
+    session_id = response.get_json()["session_id"]
+    follow(client, response.get_json(), session_id)
+    workspace = sessions.get_workspace(session_id, root_dir=str(tmp_path / "sessions"))
+
+    # Another job holds the lock for the whole upload: parsing goes ahead, committing waits
+    with workspace.lock():
+        response = client.post(
+            "/appleDataUpload", data=HEADER + b"".join(first + [record(stamp(i)) for i in range(150, 170)]) + FOOTER,
+            query_string={"filename": "export.xml"}, content_type="application/xml", headers={"X-Session-Id": session_id},
+        )
+        assert response.status_code == 202
+        assert len(staged_parts(tmp_path / "sessions" / session_id)) == 1
+        assert len(record_store.read_records("heartrate", export_dir=workspace.export_dir)) == 150
+    job = follow(client, response.get_json(), session_id)
+    assert job["status"] == "succeeded", job["error"]
+    assert len(record_store.read_records("heartrate", export_dir=workspace.export_dir)) == 170
+
+
+def test_broken_zip(client, tmp_path):
+    response = post(client, b"PK\x03\x04 not really a zip", filename="export.zip")
+    assert response.status_code == 400
+    session_dir, = (tmp_path / "sessions").iterdir()
+    assert staged_parts(session_dir) == []
+
+
+def test_upload_over_the_limit(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "StreamedUpload", functools.partial(uploads.StreamedUpload, max_bytes=1000))
+    assert post(client, b"x" * 2000).status_code == 413
+
+    # Sent chunked, the limit is only hit while parsing
+    body = HEADER + b"".join(record(stamp(i)) for i in range(20)) + FOOTER
+    response = client.post(
+        "/appleDataUpload", input_stream=io.BytesIO(body), query_string={"filename": "export.xml"},
+        content_type="application/xml", environ_overrides={"CONTENT_LENGTH": "", "wsgi.input_terminated": True},
+    )
+    assert response.status_code == 413
+    session_dir, = (tmp_path / "sessions").iterdir()
+    assert staged_parts(session_dir) == []
+
+
+def test_records_limit_is_clamped(client):
+    response = post(client, HEADER + b"".join(record(stamp(i)) for i in range(150)) + FOOTER)
+    session_id = response.get_json()["session_id"]
+    follow(client, response.get_json(), session_id)
+
+    for limit, returned in ((-5, 0), (0, 0), (20, 20), (10**9, 150)):
+        body = client.get("/records/heartrate", query_string={"limit": limit}, headers={"X-Session-Id": session_id}).get_json()
+        assert (body["count"], len(body["values"]), body["truncated"]) == (150, returned, returned < 150)
@@ -0,0 +1,90 @@
+import gzip
+
+import numpy as np
+import pandas as pd
+import pytest
+from flask import Flask, jsonify
+
+import charts
+import compression
+
+
+@pytest.mark.parametrize("n, points", [(10, 800), (1000, 50), (1001, 3), (5000, 777)])
+def test_lttb_keeps_endpoints_and_length(n, points):
+    y = np.random.default_rng(0).normal(size=n).cumsum()
+    kept = charts.lttb(np.arange(n), y, points)
+    assert kept[0] == 0 and kept[-1] == n - 1
+    assert len(kept) == min(n, points)
+    assert (np.diff(kept) > 0).all()
+
+
+def test_lttb_keeps_spikes():
+    y = np.zeros(1000)
+    y[500] = 10
+    assert 500 in charts.lttb(np.arange(1000), y, 20)
+
+
+def test_columnar_series_regular():
+    dates = pd.date_range("2020-01-01", periods=10, freq="7D")
+    series = charts.columnar_series(dates, np.arange(10.0))
+    assert series == {"start": "2020-01-01", "step_days": 7, "values": list(np.arange(10.0))}
+
+
+def test_columnar_series_offsets_for_gaps():
+    dates = pd.to_datetime(["2020-01-01", "2020-01-02", "2020-01-03", "2020-01-07", "2020-01-08"])
+    series = charts.columnar_series(dates, [200.04, 199.96, 199.5, 198.0, 197.7], decimals=1)
+    assert series["start"] == "2020-01-01"
+    assert series["step_days"] == 1
+    assert series["offsets"] == [0, 1, 2, 6, 7]
+    assert series["values"] == [200.0, 200.0, 199.5, 198.0, 197.7]
+
+
+def test_columnar_series_offsets_after_lttb():
+    dates = pd.date_range("2020-01-01", periods=1000)
+    series = charts.columnar_series(dates, np.sin(np.arange(1000) / 20), points=100)
+    assert len(series["values"]) == len(series["offsets"]) == 100
+    assert series["offsets"][0] == 0 and series["offsets"][-1] == 999
+
+
+def test_columnar_series_empty():
+    assert charts.columnar_series([], []) == {"start": None, "step_days": 1, "values": []}
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, deflate", "gzip"),
+    ("gzip;q=0.5", "gzip"),
+    ("*", "gzip"),
+    ("gzip;q=0", None),
+    ("gzip;q=0, *", None),
+    ("GZIP;Q=1.0", "gzip"),
+    ("deflate, *;q=0", None),
+    ("identity", None),
+    ("", None),
+    (None, None),
+])
+def test_choose_encoding_without_brotli(monkeypatch, header, expected):
+    monkeypatch.setattr(compression, "brotli", None)
+    assert compression.choose_encoding(header) == expected
+
+
+def test_choose_encoding_prefers_brotli(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", object())
+    assert compression.choose_encoding("gzip, br") == "br"
+    assert compression.choose_encoding("gzip, br;q=0") == "gzip"
+
+
+def test_compress_response(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    app = Flask(__name__)
+    payload = {"values": list(range(1000))}
+    with app.test_request_context():
+        response = compression.compress_response(jsonify(payload), "gzip")
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in response.vary
+        assert gzip.decompress(response.get_data()) == jsonify(payload).get_data()
+
+        small = compression.compress_response(jsonify({"ok": True}), "gzip")
+        assert "Content-Encoding" not in small.headers
+
+        refused = compression.compress_response(jsonify(payload), "gzip;q=0, *")
+        assert "Content-Encoding" not in refused.headers
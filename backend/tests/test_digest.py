@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import digest
+
+# Lines in the order digest_rollup gives them up, the most important last
+SECTIONS = ["anomalies:", "level shifts:", "recent weeks:", "4-week mean:", "trend:", "overall:", "span:", "metric:"]
+
+
+def weekly_rollup(weeks, seed=0):
+    rng = np.random.default_rng(seed)
+    mean = 70 + rng.normal(0, 1.5, weeks)
+    mean[weeks // 2:] += 6  # a level shift
+    mean[weeks // 3] += 25  # and a spike
+    return pd.DataFrame({
+        "date": pd.date_range("2015-01-04", periods=weeks, freq="W").date,
+        "sum": mean * 7000, "mean": mean, "min": mean - 20, "max": mean + 40,
+        "count": np.full(weeks, 7000), "p50": mean, "p90": mean + 15,
+    })
+
+
+def present(text):
+    return [any(line.startswith(section) for line in text.splitlines()) for section in SECTIONS]
+
+
+@pytest.mark.parametrize("max_bytes", [20, 60, 120, 200, 300, 500, 1000, 4000])
+def test_digest_stays_within_its_budget(max_bytes):
+    text = digest.digest_rollup("heartrate", weekly_rollup(520), max_bytes=max_bytes)
+    assert len(text.encode()) <= max_bytes
+    assert text.startswith("metric: heartrate"[:max_bytes])
+
+
+def test_least_important_sections_go_first():
+    full = digest.digest_rollup("heartrate", weekly_rollup(520), max_bytes=100_000)
+    assert all(present(full))
+    for max_bytes in range(40, len(full.encode()), 20):
+        kept = present(digest.digest_rollup("heartrate", weekly_rollup(520), max_bytes=max_bytes))
+        # Once a section is kept, every more important one is kept too
+        assert kept == sorted(kept), (max_bytes, kept)
+
+
+def test_digest_size_does_not_grow_with_history():
+    sizes = [len(digest.digest_rollup("heartrate", weekly_rollup(weeks)).encode()) for weeks in (60, 520, 5200)]
+    assert max(sizes) <= digest.DIGEST_MAX_BYTES
+    assert max(sizes) - min(sizes) < 200
+
+
+def test_frame_and_csv_text_give_the_same_digest():
+    frame = weekly_rollup(200)
+    assert digest.digest_rollup("stepcount", frame) == digest.digest_rollup("stepcount", frame.to_csv(index=False))
+    assert "sum per week" in digest.digest_rollup("stepcount", frame)
+
+
+def test_empty_rollup():
+    assert digest.digest_rollup("heartrate", weekly_rollup(200)[:0]) == "metric: heartrate\nno data"
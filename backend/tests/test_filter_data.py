@@ -0,0 +1,135 @@
+import os
+
+import pytest
+
+import filterData
+import record_store
+
+HEADER = b'<?xml version="1.0" encoding="UTF-8"?>\n<HealthData locale="en_US">\n'
+FOOTER = b"</HealthData>\n"
+
+
+def record(created, value=70, record_type="HeartRate", extra=""):
+    return (
+        f' <Record type="HKQuantityTypeIdentifier{record_type}" unit="count/min" {extra}'
+        f'creationDate="{created}" startDate="{created}" endDate="{created}" value="{value}"/>\n'
+    ).encode()
+
+
+def stamp(i, offset="-0500"):
+    return f"2024-01-{1 + i // 1440:02d} {i // 60 % 24:02d}:{i % 60:02d}:00 {offset}"
+
+
+def export(path, records, tail=b""):
+    path.write_bytes(HEADER + b"".join(records) + tail + FOOTER)
+    return str(path)
+
+
+def test_attributes_may_vary_between_records(tmp_path):
+    # device only shows up after the first rows, and some rows have no unit
+    records = [record(stamp(i)) for i in range(60)]
+    records += [record(stamp(i), extra='device="Apple Watch" ') for i in range(60, 120)]
+    records += [record(stamp(i)).replace(b'unit="count/min" ', b"") for i in range(120, 150)]
+    export_dir = str(tmp_path / "export")
+    changes = filterData.filterData(export(tmp_path / "export.xml", records), export_dir=export_dir)
+    assert list(changes) == ["heartrate"]
+    df = record_store.read_records("heartrate", export_dir=export_dir)
+    assert len(df) == 150
+
+
+def test_elements_after_the_last_record_are_released(tmp_path):
+    tail = b"".join(b' <ActivitySummary dateComponents="2024-01-01" activeEnergyBurned="1"/>\n' for _ in range(1000))
+    tail += b' <Workout workoutActivityType="HKWorkoutActivityTypeRunning"><MetadataEntry key="k" value="v"/></Workout>\n'
+    record_filter = filterData.RecordFilter(export_dir=str(tmp_path / "export"))
+    record_filter.feed(HEADER + b"".join(record(stamp(i)) for i in range(150)) + tail)
+    record_filter.feed(FOOTER)
+    root = record_filter.parser.close()
+    record_filter.abort()
+    assert len(root) <= 1
+
+
+def ingest(tmp_path, name, records, incremental=True):
+    export_dir = str(tmp_path / "export")
+    changes = filterData.filterData(export(tmp_path / name, records), export_dir=export_dir, incremental=incremental)
+    return changes, len(record_store.read_records("heartrate", export_dir=export_dir))
+
+
+def test_incremental_upload_skips_stored_records(tmp_path):
+    first = [record(stamp(i)) for i in range(150)]
+    assert ingest(tmp_path, "first.xml", first, incremental=False) == ({"heartrate": "2024-01-01 00:00:00"}, 150)
+    # The next export repeats everything and adds 20 newer records
+    second = first + [record(stamp(i)) for i in range(150, 170)]
+    changes, rows = ingest(tmp_path, "second.xml", second)
+    assert changes == {"heartrate": "2024-01-01 02:30:00"}
+    assert rows == 170
+    # Nothing new: nothing stored
+    assert ingest(tmp_path, "third.xml", second) == ({}, 170)
+
+
+def test_records_in_the_watermark_second_are_not_lost(tmp_path):
+    last = stamp(149)
+    first = [record(stamp(i)) for i in range(150)]
+    ingest(tmp_path, "first.xml", first, incremental=False)
+    # A second record created in the same second as the last stored one, plus the repeat of it
+    second = first + [record(last, value=99)]
+    changes, rows = ingest(tmp_path, "second.xml", second)
+    assert rows == 151
+    assert ingest(tmp_path, "third.xml", second)[1] == 151
+
+
+def test_watermark_compares_instants_across_offsets(tmp_path):
+    # Stored up to 10:00 -0500, i.e. 15:00 UTC
+    first = [record(f"2024-03-01 {8 + i // 60:02d}:{i % 60:02d}:00 -0500") for i in range(121)]
+    ingest(tmp_path, "first.xml", first, incremental=False)
+    # 09:30 -0800 is 17:30 UTC and new; 10:30 -0400 is 14:30 UTC and old
+    second = first + [record("2024-03-01 09:30:00 -0800", value=88), record("2024-03-01 10:30:00 -0400", value=75)]
+    changes, rows = ingest(tmp_path, "second.xml", second)
+    assert rows == 122
+    assert filterData.record_time({"creationDate": "2024-03-01 11:00:00 -0400"}) == filterData.record_time(
+        {"creationDate": "2024-03-01 10:00:00 -0500"}
+    )
+
+
+def aborted_run(tmp_path, records, incremental=True):
+    record_filter = filterData.RecordFilter(export_dir=str(tmp_path / "export"), chunk_size=10, incremental=incremental)
+    # Rows are flushed every 10 records, then the upload breaks off
+    record_filter.feed(HEADER + b"".join(records))
+    record_filter.abort()
+
+
+def test_aborted_incremental_run_leaves_the_store_alone(tmp_path):
+    first = [record(stamp(i)) for i in range(150)]
+    ingest(tmp_path, "first.xml", first, incremental=False)
+    second = first + [record(stamp(i)) for i in range(150, 170)]
+    aborted_run(tmp_path, second)
+    assert len(record_store.read_records("heartrate", export_dir=str(tmp_path / "export"))) == 150
+    assert not [name for name in os.listdir(tmp_path / "export" / "heartrate") if name.startswith(record_store.STAGED_PREFIX)]
+    assert ingest(tmp_path, "second.xml", second)[1] == 170
+
+
+def test_aborted_full_rebuild_keeps_the_old_records(tmp_path):
+    first = [record(stamp(i)) for i in range(150)]
+    ingest(tmp_path, "first.xml", first, incremental=False)
+    aborted_run(tmp_path, [record(stamp(i), value=80) for i in range(200)], incremental=False)
+    assert len(record_store.read_records("heartrate", export_dir=str(tmp_path / "export"))) == 150
+    assert ingest(tmp_path, "second.xml", first + [record(stamp(i)) for i in range(150, 170)])[1] == 170
+
+
+def test_full_rebuild_replaces_records_and_watermark(tmp_path):
+    ingest(tmp_path, "first.xml", [record(stamp(i)) for i in range(300)], incremental=False)
+    # An older, shorter export rebuilt in full: the watermark moves back with the data
+    assert ingest(tmp_path, "second.xml", [record(stamp(i)) for i in range(150)], incremental=False)[1] == 150
+    assert ingest(tmp_path, "third.xml", [record(stamp(i)) for i in range(170)])[1] == 170
+
+
+def test_commit_refuses_a_store_changed_by_another_upload(tmp_path):
+    first = [record(stamp(i)) for i in range(150)]
+    ingest(tmp_path, "first.xml", first, incremental=False)
+    record_filter = filterData.RecordFilter(export_dir=str(tmp_path / "export"), incremental=True)
+    record_filter.feed(HEADER + b"".join(first + [record(stamp(150))]) + FOOTER)
+    record_filter.finish()
+    # Another upload commits first
+    ingest(tmp_path, "second.xml", first + [record(stamp(i)) for i in range(150, 160)])
+    with pytest.raises(filterData.ConcurrentUpdate):
+        record_filter.commit()
+    assert len(record_store.read_records("heartrate", export_dir=str(tmp_path / "export"))) == 160
@@ -0,0 +1,102 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+import forecasters
+from benchmarks.synthetic import weight_series
+
+
+@pytest.fixture(autouse=True)
+def empty_decision_cache():
+    forecasters._decisions.clear()
+    yield
+    forecasters._decisions.clear()
+
+
+class Oracle:
+    """Stands in for the LSTM: forecasts a known sinusoid exactly."""
+
+    name = "lstm"
+    # predict.WINDOW_SIZE + 2, without importing predict (and torch)
+    min_points = 32
+    fits = 0
+
+    def fit(self, values):
+        Oracle.fits += 1
+        self.length = len(values)
+        return self
+
+    def forecast(self, steps):
+        return sinusoid(self.length + steps)[self.length:]
+
+
+class NoLSTM(Oracle):
+    def fit(self, values):
+        raise AssertionError("the LSTM should not have been tried")
+
+
+def sinusoid(days):
+    return 180 + 8 * np.sin(np.arange(days) * 2 * np.pi / 45)
+
+
+def test_short_series_use_damped_trend():
+    assert forecasters.choose(np.array([180.0, 181, 180, 179, 180]), NoLSTM) == ("damped_trend", {})
+
+
+def test_noisy_trend_stays_with_baselines():
+    values = weight_series(120, seed=0)["Weight"].to_numpy()
+    name, scores = forecasters.choose(values, NoLSTM)
+    assert name in ("damped_trend", "holt", "seasonal_naive")
+    assert "lstm" not in scores
+
+
+def test_whole_pound_weights_stay_with_baselines():
+    # Most day-to-day differences are 0, which used to zero the noise floor
+    values = np.round(weight_series(120, seed=1, noise=0.4)["Weight"].to_numpy())
+    assert forecasters.noise_floor(values) >= 0.25
+    name, _ = forecasters.choose(values, NoLSTM)
+    assert name != "lstm"
+
+
+def test_lstm_chosen_when_it_beats_the_baselines():
+    name, scores = forecasters.choose(sinusoid(200), Oracle)
+    assert name == "lstm"
+    assert scores["lstm"] < forecasters.LSTM_MARGIN * min(score for model, score in scores.items() if model != "lstm")
+
+
+def test_decisions_are_cached_per_budget():
+    Oracle.fits = 0
+    values = sinusoid(200)
+    forecasters.choose(values, Oracle, budget=(None, None))
+    forecasters.choose(values, Oracle, budget=(None, None))
+    assert Oracle.fits == 1
+    forecasters.choose(values, Oracle, budget=(2, None))
+    assert Oracle.fits == 2
+
+
+def test_forecast_series_errors():
+    with pytest.raises(ValueError):
+        forecasters.forecast_series([])
+    with pytest.raises(ValueError):
+        forecasters.forecast_series([180.0] * 40, policy="nope")
+    with pytest.raises(ValueError):
+        forecasters.forecast_series([180.0] * 10, policy="lstm")
+
+
+def test_forecast_series_forced_baseline():
+    forecast = forecasters.forecast_series(np.linspace(200, 190, 60), steps=5, policy="holt")
+    assert forecast.model == "holt"
+    assert len(forecast.values) == 5
+    assert forecast.values[0] < 190.5
+
+
+def test_baseline_forecasts_do_not_load_torch():
+    script = (
+        "import sys, forecasters\n"
+        "forecasters.forecast_series([180.0 + i % 3 for i in range(120)])\n"
+        "assert 'torch' not in sys.modules\n"
+    )
+    subprocess.run([sys.executable, "-c", script], cwd=os.path.dirname(forecasters.__file__), check=True)
@@ -0,0 +1,103 @@
+from concurrent.futures import Future
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+import RNN_model  # noqa: E402
+import batch_training  # noqa: E402
+import predict  # noqa: E402
+from benchmarks.synthetic import weight_series  # noqa: E402
+from model_registry import ModelRegistry, fingerprint  # noqa: E402
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    registry = ModelRegistry(directory=str(tmp_path))
+    monkeypatch.setattr(predict, "registry", registry)
+    return registry
+
+
+def test_truncated_training_is_not_cached(registry):
+    df = weight_series(60, seed=3)
+    predict.train_weight_model(df, max_epochs=2)
+    assert registry.get(fingerprint(df["Weight"].values, predict.WINDOW_SIZE)) is None
+
+
+def test_full_training_is_cached(registry, monkeypatch):
+    monkeypatch.setattr(predict, "TRAIN_EPOCHS", 3)
+    df = weight_series(60, seed=4)
+    predict.train_weight_model(df)
+    assert registry.get(fingerprint(df["Weight"].values, predict.WINDOW_SIZE)) is not None
+
+
+class RecordingScheduler:
+    def __init__(self):
+        self.losses = []
+
+    def step(self, loss):
+        self.losses.append(loss)
+
+
+def test_scheduler_steps_every_epoch_after_warm_up():
+    X_train, X_test, y_train, y_test, *_ = RNN_model.load_and_preprocess_data_from_df(weight_series(80, seed=5))
+    train_loader, test_loader = RNN_model.prepare_data_loaders(X_train, X_test, y_train, y_test)
+    model = RNN_model.Weight_Model().to(RNN_model.device)
+    scheduler = RecordingScheduler()
+    epochs, stop = RNN_model.train_model(
+        model, train_loader, torch.nn.MSELoss(), torch.optim.Adam(model.parameters()), num_epochs=8,
+        val_loader=test_loader, patience=100, min_epochs=3, scheduler=scheduler,
+    )
+    assert (epochs, stop) == (8, "epochs")
+    assert len(scheduler.losses) == 5
+
+
+def datasets(count, days=60):
+    return [RNN_model.load_and_preprocess_data_from_df(weight_series(days, seed=seed))[:4] for seed in range(count)]
+
+
+def test_grouped_training_stops_each_model_at_its_own_deadline():
+    done = []
+    results = batch_training.train_grouped(
+        datasets(2), num_epochs=50, deadlines=[0.0, None], on_done=lambda m, model, epochs, stop: done.append((m, epochs, stop)),
+        patience=100, min_epochs=50,
+    )
+    # The model whose deadline has passed is handed back after one epoch; the other runs out its epochs
+    assert done == [(0, 1, "time"), (1, 50, "epochs")]
+    assert [(epochs, stop) for _, epochs, stop in results] == [(1, "time"), (50, "epochs")]
+
+
+def test_batch_trainer_resolves_futures_and_skips_cancelled_ones():
+    trainer = batch_training.BatchTrainer(max_wait=0.5, num_epochs=2, min_epochs=1)
+    first, second = (trainer.submit(*dataset) for dataset in datasets(2))
+    assert second.cancel()
+    model, epochs, stop = first.result(timeout=60)
+    assert (epochs, stop) == (2, "epochs")
+    assert isinstance(model, RNN_model.Weight_Model)
+
+
+class StuckTrainer:
+    def submit(self, *dataset, max_seconds=None):
+        self.future = Future()
+        return self.future
+
+
+def test_batched_training_falls_back_when_the_trainer_does_not_deliver(registry, monkeypatch):
+    trainer = StuckTrainer()
+    monkeypatch.setattr(batch_training, "BATCH_TRAINING", True)
+    monkeypatch.setattr(batch_training, "get_trainer", lambda **kwargs: trainer)
+    monkeypatch.setattr(batch_training, "result_timeout", lambda max_seconds: 0.01)
+    monkeypatch.setattr(predict, "TRAIN_EPOCHS", 2)
+    trained = predict.train_weight_model(weight_series(60, seed=6))
+    assert trained.model is not None
+    assert trainer.future.cancelled()
+
+
+def test_scripted_forecaster_matches_the_eager_forecast():
+    import inference
+
+    model = RNN_model.Weight_Model().to(RNN_model.device).eval()
+    window = torch.rand(1, predict.WINDOW_SIZE, 1, device=RNN_model.device)
+    forecaster = inference.compile_model(model, backend="torchscript", quantize=False)
+    with torch.no_grad():
+        assert torch.allclose(forecaster(window, 5), model.forecast(window, 5), atol=1e-6)
@@ -0,0 +1,67 @@
+import os
+
+import numpy as np
+
+import filterData
+import query
+from query import DAY_NS, MetricIndex
+from test_filter_data import export, record, stamp
+
+
+def index_of(minutes):
+    # Records at the given minutes past 2024-01-01 00:00, valued by their minute
+    starts = query.parse_time("2024-01-01") + np.array(minutes, dtype=np.int64) * 60 * 10**9
+    return MetricIndex(starts, np.array(minutes, dtype=np.float64))
+
+
+def test_ranges_across_day_boundaries():
+    # Two records a day around midnight, with two whole days missing in between
+    minutes = [m for day in (0, 1, 4, 5) for m in (day * 1440 + 5, day * 1440 + 1435)]
+    index = index_of(minutes)
+    assert index.records(query.parse_time("2024-01-01T23:00"), query.parse_time("2024-01-02T01:00"))["values"] == [1435.0, 1445.0]
+    # A range falling inside the gap, and one starting in it
+    assert index.records(query.parse_time("2024-01-03"), query.parse_time("2024-01-05"))["values"] == []
+    assert index.records(query.parse_time("2024-01-03"), query.parse_time("2024-01-05T00:05:01"))["values"] == [5765.0]
+    # The end is exclusive, even exactly on midnight
+    assert index.records(None, query.parse_time("2024-01-01T23:55"))["values"] == [5.0]
+    assert index.records(query.parse_time("2023-12-01"), query.parse_time("2025-01-01"))["count"] == len(minutes)
+
+
+def test_positions_match_a_plain_binary_search():
+    rng = np.random.default_rng(0)
+    index = index_of(np.sort(rng.integers(0, 10 * 1440, 500)))
+    for timestamp in rng.integers(index.starts[0] - 2 * DAY_NS, index.starts[-1] + 2 * DAY_NS, 2000):
+        assert index.position(timestamp) == np.searchsorted(index.starts, timestamp)
+
+
+def test_limit():
+    index = index_of(range(100))
+    limited = index.records(limit=10)
+    assert (limited["count"], limited["truncated"], limited["values"]) == (100, True, [float(m) for m in range(10)])
+    assert index.records(limit=0)["values"] == []
+    assert index.records(limit=100)["truncated"] is False
+
+
+def test_cache_reloads_when_the_store_changes(tmp_path):
+    export_dir = str(tmp_path / "export")
+    cache = query.QueryCache()
+    records = [record(stamp(i)) for i in range(150)]
+    filterData.filterData(export(tmp_path / "first.xml", records), export_dir=export_dir)
+    first = cache.get("HeartRate", export_dir)
+    assert len(first) == 150
+    assert cache.get("heartrate", export_dir) is first
+
+    filterData.filterData(export(tmp_path / "second.xml", records + [record(stamp(i)) for i in range(150, 170)]), export_dir=export_dir, incremental=True)
+    second = cache.get("heartrate", export_dir)
+    assert second is not first
+    assert len(second) == 170
+    assert cache.get("steps", export_dir) is None
+
+
+def test_cache_drops_the_least_recently_used_index(tmp_path):
+    cache = query.QueryCache(max_entries=1)
+    dirs = [str(tmp_path / name) for name in ("a", "b")]
+    for n, export_dir in enumerate(dirs):
+        filterData.filterData(export(tmp_path / f"{n}.xml", [record(stamp(i)) for i in range(150)]), export_dir=export_dir)
+        cache.get("heartrate", export_dir)
+    assert list(cache.entries) == [(os.path.abspath(dirs[1]), "heartrate")]
@@ -0,0 +1,106 @@
+import json
+import os
+import threading
+import time
+
+import sessions
+
+
+def write_later(delay, path, data):
+    # Written straight to disk, as a job on another worker would
+    def write():
+        time.sleep(delay)
+        with open(path, "w") as f:
+            json.dump(data, f)
+
+    thread = threading.Thread(target=write)
+    thread.start()
+    return thread
+
+
+def test_wait_for_insights_sees_other_workers(tmp_path):
+    workspace = sessions.get_workspace(root_dir=str(tmp_path))
+    thread = write_later(0.1, workspace.insights_path, {"heartrate.csv": "ok"})
+    assert workspace.wait_for_insights(5, poll_interval=0.05) == {"heartrate.csv": "ok"}
+    thread.join()
+
+
+def test_wait_for_insights_times_out(tmp_path):
+    workspace = sessions.get_workspace(root_dir=str(tmp_path))
+    start = time.monotonic()
+    assert workspace.wait_for_insights(0.2, poll_interval=0.05) is None
+    assert time.monotonic() - start < 1
+
+
+def test_wait_for_job_follows_the_job_file(tmp_path):
+    workspace = sessions.get_workspace(root_dir=str(tmp_path))
+    job_id = "a" * 32
+    workspace.save_job({"job_id": job_id, "status": "running", "version": 2})
+    path = os.path.join(workspace.jobs_dir, f"{job_id}.json")
+    thread = write_later(0.1, path, {"job_id": job_id, "status": "running", "version": 3})
+    state = workspace.wait_for_job(job_id, 5, since_version=2, poll_interval=0.05)
+    assert state["version"] == 3
+    thread.join()
+
+    start = time.monotonic()
+    assert workspace.wait_for_job(job_id, 0.2, since_version=3, poll_interval=0.05)["version"] == 3
+    assert time.monotonic() - start >= 0.2
+
+
+def test_cleanup_skips_busy_sessions(tmp_path):
+    root = str(tmp_path)
+    idle, locked, running = (sessions.get_workspace(root_dir=root) for _ in range(3))
+    running.save_job({"job_id": "b" * 32, "status": "running", "version": 1})
+    with locked.lock():
+        sessions.cleanup_sessions(root, ttl=-1)
+        assert os.path.isdir(locked.root)
+    assert not os.path.isdir(idle.root)
+    assert os.path.isdir(running.root)
+
+    running.save_job({"job_id": "b" * 32, "status": "succeeded", "version": 2})
+    sessions.cleanup_sessions(root, ttl=-1)
+    assert not os.path.isdir(running.root)
+    assert not os.path.isdir(locked.root)
+
+
+def test_cleanup_skips_sessions_with_staged_parts(tmp_path):
+    root = str(tmp_path)
+    workspace = sessions.get_workspace(root_dir=root)
+    os.makedirs(os.path.join(workspace.export_dir, "heartrate"))
+    path = os.path.join(workspace.export_dir, "heartrate", "_staged-" + "c" * 32)
+    with open(path, "wb") as f:
+        f.write(b"PAR1")
+    sessions.cleanup_sessions(root, ttl=-1)
+    assert os.path.isdir(workspace.root)
+
+    os.remove(path)
+    sessions.cleanup_sessions(root, ttl=-1)
+    assert not os.path.isdir(workspace.root)
+
+
+def test_cleanup_deletes_sessions_under_their_lock(tmp_path, monkeypatch):
+    root = str(tmp_path)
+    workspace = sessions.get_workspace(root_dir=root)
+    outcome = []
+
+    def job():
+        try:
+            with workspace.lock():
+                outcome.append("locked")
+        except FileNotFoundError:
+            outcome.append("gone")
+
+    thread = threading.Thread(target=job)
+    in_use = sessions.Workspace._in_use
+
+    def start_job(self, stale_after):
+        # A job reaches the lock after cleanup has checked the session but before it is deleted
+        thread.start()
+        time.sleep(0.1)
+        return in_use(self, stale_after)
+
+    monkeypatch.setattr(sessions.Workspace, "_in_use", start_job)
+    sessions.cleanup_sessions(root, ttl=-1)
+    thread.join()
+    assert outcome == ["gone"]
+    assert os.listdir(root) == []
@@ -0,0 +1,67 @@
+import io
+import os
+import zipfile
+
+import pytest
+from werkzeug.test import EnvironBuilder
+from werkzeug.wrappers import Request
+
+import uploads
+
+
+def make_request(body, content_type="application/octet-stream", filename="export.xml"):
+    builder = EnvironBuilder(method="POST", data=body, content_type=content_type, query_string={"filename": filename})
+    return Request(builder.get_environ())
+
+
+def zipped(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members:
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def test_upload_over_content_length_limit():
+    with pytest.raises(uploads.UploadTooLarge):
+        uploads.StreamedUpload(make_request(b"x" * 101), max_bytes=100)
+
+
+def test_upload_limit_without_content_length():
+    # Sent chunked, so only the bytes read count
+    request = make_request(b"x" * 200_000)
+    del request.environ["CONTENT_LENGTH"]
+    request.environ["wsgi.input_terminated"] = True
+    upload = uploads.StreamedUpload(request, max_bytes=100_000)
+    with pytest.raises(uploads.UploadTooLarge):
+        b"".join(upload.chunks())
+
+
+def test_upload_at_the_limit():
+    upload = uploads.StreamedUpload(make_request(b"x" * 100), max_bytes=100)
+    assert b"".join(upload.chunks()) == b"x" * 100
+
+
+def test_zip_member_is_found_behind_others():
+    archive = zipped([("apple_health_export/export_cda.xml", b"a" * 5000), ("apple_health_export/export.xml", b"<HealthData/>")])
+    assert b"".join(uploads.iter_zip_member([archive[i:i + 7] for i in range(0, len(archive), 7)])) == b"<HealthData/>"
+
+
+def test_zip_member_limit():
+    # Compresses to a few hundred bytes
+    archive = zipped([("export.xml", b"\0" * 1_000_000)])
+    assert len(archive) < 10_000
+    with pytest.raises(uploads.UploadTooLarge):
+        b"".join(uploads.iter_zip_member([archive], max_bytes=100_000))
+    assert len(b"".join(uploads.iter_zip_member([archive], max_bytes=1_000_000))) == 1_000_000
+
+
+def test_members_skipped_on_the_way_are_limited_too():
+    archive = zipped([("bomb.bin", b"\0" * 1_000_000), ("export.xml", b"<HealthData/>")])
+    with pytest.raises(uploads.UploadTooLarge):
+        b"".join(uploads.iter_zip_member([archive], max_bytes=100_000))
+
+
+def test_zip_without_the_member():
+    with pytest.raises(uploads.UploadError, match="No export.xml"):
+        b"".join(uploads.iter_zip_member([zipped([("other.xml", b"x")])]))
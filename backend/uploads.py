@@ -0,0 +1,235 @@
+import io
+import os
+import zlib
+import struct
+
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import Data, Epilogue, File, MultipartDecoder, NeedData
+
+# Bytes pulled from the request body per read
+READ_SIZE = 64 * 1024
+# Largest request body accepted, and largest file a zip member may unpack to
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(4 * 1024 ** 3)))
+MAX_MEMBER_BYTES = int(os.getenv("MAX_MEMBER_BYTES", str(16 * 1024 ** 3)))
+
+_LOCAL_HEADER = struct.Struct("<4sHHHHHIIIHH")
+_LOCAL_SIGNATURE = b"PK\x03\x04"
+_DESCRIPTOR_SIGNATURE = b"PK\x07\x08"
+_ZIP64_EXTRA = 0x0001
+_FLAG_DATA_DESCRIPTOR = 0x08
+_STORED, _DEFLATED = 0, 8
+
+
+class UploadError(ValueError):
+    """The request body is not a usable upload."""
+
+
+class UploadTooLarge(UploadError):
+    """The upload, or the file unpacked from it, is over its size limit."""
+
+
+def limit_size(chunks, max_bytes, what="Upload"):
+    """Pass chunks through, raising UploadTooLarge once more than max_bytes went by."""
+    total = 0
+    for chunk in chunks:
+        total += len(chunk)
+        if total > max_bytes:
+            raise UploadTooLarge(f"{what} is larger than {max_bytes} bytes")
+        yield chunk
+
+
+class StreamedUpload:
+    """One uploaded file read straight from the request body, without spooling it anywhere.
+
+    Multipart bodies (what browsers send for a FormData upload) are decoded incrementally and
+    only the named file field is passed on; any other body is taken as the file itself, named
+    by ?filename=. chunks() can only be consumed once, and stops with UploadTooLarge after
+    max_bytes.
+    """
+
+    def __init__(self, request, field="file", max_bytes=MAX_UPLOAD_BYTES):
+        self.stream = request.stream
+        self.field = field
+        self.max_bytes = max_bytes
+        self.filename = None
+        self._decoder = None
+
+        if request.content_length is not None and request.content_length > max_bytes:
+            raise UploadTooLarge(f"Upload is larger than {max_bytes} bytes")
+
+        mimetype, options = parse_options_header(request.headers.get("Content-Type", ""))
+        if mimetype == "multipart/form-data":
+            if "boundary" not in options:
+                raise UploadError("Multipart upload without a boundary")
+            self._decoder = MultipartDecoder(options["boundary"].encode())
+            self._find_file()
+        else:
+            self.filename = request.args.get("filename", "")
+
+    def _read(self):
+        data = self.stream.read(READ_SIZE)
+        self._decoder.receive_data(data or None)
+        return bool(data)
+
+    def _find_file(self):
+        # Advance to the start of our file part, skipping any fields sent before it
+        more = True
+        while True:
+            event = self._decoder.next_event()
+            if isinstance(event, NeedData):
+                if not more:
+                    return
+                more = self._read()
+            elif isinstance(event, File) and event.name == self.field:
+                self.filename = event.filename or ""
+                return
+            elif isinstance(event, Epilogue):
+                return
+
+    def chunks(self):
+        return limit_size(self._file_chunks(), self.max_bytes)
+
+    def _file_chunks(self):
+        if self._decoder is None:
+            while True:
+                data = self.stream.read(READ_SIZE)
+                if not data:
+                    return
+                yield data
+
+        if self.filename is None:
+            return
+        more = True
+        while True:
+            event = self._decoder.next_event()
+            if isinstance(event, NeedData):
+                if not more:
+                    raise UploadError("Upload ended in the middle of the file")
+                more = self._read()
+            elif isinstance(event, Data):
+                if event.data:
+                    yield event.data
+                if not event.more_data:
+                    return
+            else:
+                return
+
+    def drain(self):
+        # Read whatever the client still has to send, so the connection can be reused
+        while self.stream.read(READ_SIZE):
+            pass
+
+
+class _Buffer:
+    """Pull-based byte buffer over an iterator of chunks."""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.data = b""
+
+    def fill(self, size):
+        while len(self.data) < size:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                return False
+            self.data += chunk
+        return True
+
+    def take(self, size):
+        if not self.fill(size):
+            raise UploadError("Zip archive is truncated")
+        taken, self.data = self.data[:size], self.data[size:]
+        return taken
+
+    def take_available(self, limit=None):
+        if not self.data and not self.fill(1):
+            raise UploadError("Zip archive is truncated")
+        size = len(self.data) if limit is None else min(limit, len(self.data))
+        return self.take(size)
+
+
+def _zip64_compressed_size(extra):
+    offset = 0
+    while offset + 4 <= len(extra):
+        header_id, size = struct.unpack_from("<HH", extra, offset)
+        if header_id == _ZIP64_EXTRA and size >= 16:
+            return struct.unpack_from("<Q", extra, offset + 12)[0]
+        offset += 4 + size
+    return None
+
+
+def _member_data(buffer, flags, method, compressed_size):
+    # Yield one member's uncompressed bytes, leaving the buffer at the end of its data
+    if method == _DEFLATED:
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        while not decompressor.eof:
+            output = decompressor.decompress(buffer.take_available())
+            buffer.data = decompressor.unused_data + buffer.data
+            if output:
+                yield output
+    elif method == _STORED and not flags & _FLAG_DATA_DESCRIPTOR:
+        remaining = compressed_size
+        while remaining:
+            data = buffer.take_available(remaining)
+            remaining -= len(data)
+            yield data
+    else:
+        # A stored member followed by a data descriptor has no recorded length to skip by
+        raise UploadError(f"Unsupported zip member (compression method {method}, flags {flags:#x})")
+
+
+def _skip_descriptor(buffer):
+    # CRC and sizes after the data, 32- or 64-bit, with an optional signature in front
+    buffer.fill(4)
+    if buffer.data.startswith(_DESCRIPTOR_SIGNATURE):
+        buffer.take(4)
+    buffer.fill(16)
+    buffer.take(12 if buffer.data[12:14] == b"PK" else 20)
+
+
+def iter_zip_member(chunks, basename="export.xml", max_bytes=MAX_MEMBER_BYTES):
+    """Yield the decompressed bytes of the first zip member called basename, as the zip streams in.
+
+    Reads local file headers front to back, as an iPhone's export.zip is laid out, so the
+    archive never needs to be seekable or complete. Members in front of the wanted one are
+    decompressed and discarded. Any member unpacking to more than max_bytes raises UploadTooLarge.
+    """
+    buffer = _Buffer(chunks)
+    while buffer.fill(4) and buffer.data.startswith(_LOCAL_SIGNATURE):
+        (_, _, flags, method, _, _, _, compressed_size, _, name_length, extra_length) = _LOCAL_HEADER.unpack(buffer.take(_LOCAL_HEADER.size))
+        name = buffer.take(name_length).decode("utf-8", "replace")
+        extra = buffer.take(extra_length)
+        if compressed_size == 0xFFFFFFFF:
+            compressed_size = _zip64_compressed_size(extra)
+
+        data = limit_size(_member_data(buffer, flags, method, compressed_size), max_bytes, f"Zip member {name}")
+        if os.path.basename(name) == basename:
+            yield from data
+            return
+        for _ in data:
+            pass
+        if flags & _FLAG_DATA_DESCRIPTOR:
+            _skip_descriptor(buffer)
+    raise UploadError(f"No {basename} found in the zip archive")
+
+
+class ChunkReader(io.RawIOBase):
+    """Read-only file object over an iterator of byte chunks, for parsers that want a file."""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.leftover = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self.leftover:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                return 0
+            self.leftover = chunk
+        size = min(len(buffer), len(self.leftover))
+        buffer[:size] = self.leftover[:size]
+        self.leftover = self.leftover[size:]
+        return size
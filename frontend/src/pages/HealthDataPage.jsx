@@ -9,6 +9,12 @@ function HealthDataPage() {
   const [loading, setLoading] = useState(false);
   const [overallLoading, setOverallLoading] = useState(false);
 
+  // The backend keeps each session's data separate; reuse it so re-uploads are incremental
+  const sessionHeaders = () => {
+    const sessionId = localStorage.getItem("sessionId");
+    return sessionId ? { "X-Session-Id": sessionId } : {};
+  };
+
   const handleFileSelect = (selectedFile) => {
     setFile(selectedFile);
   };
@@ -18,13 +24,25 @@ function HealthDataPage() {
     "activeenergyburned.csv": "Active Energy Burned",
     "heartrate.csv": "Heart Rate",
     "stepcount.csv": "Step Count",
+    "appleexercisetime.csv": "Exercise Minutes",
+    "applestandtime.csv": "Stand Minutes",
+    "basalenergyburned.csv": "Resting Energy",
+    "distancewalkingrunning.csv": "Walking + Running Distance",
+    "flightsclimbed.csv": "Flights Climbed",
+    "heartratevariabilitysdnn.csv": "Heart Rate Variability",
+    "restingheartrate.csv": "Resting Heart Rate",
+    "walkingheartrateaverage.csv": "Walking Heart Rate Average",
+    "walkingspeed.csv": "Walking Speed",
+    "walkingsteplength.csv": "Walking Step Length",
   };
 
   // Fetch overall insights from the backend endpoint
   const fetchOverallInsight = async () => {
     setOverallLoading(true);
     try {
-      const res = await fetch("http://localhost:5000/overallInsights");
+      const res = await fetch("http://localhost:5000/overallInsights", {
+        headers: sessionHeaders(),
+      });
       if (!res.ok) {
         const errorData = await res.json();
         setOverallInsight({ error: errorData.error || "An unknown error occurred." });
@@ -54,14 +72,29 @@ function HealthDataPage() {
     try {
       const res = await fetch("http://localhost:5000/appleDataUpload", {
         method: "POST",
+        headers: sessionHeaders(),
         body: formData,
       });
       if (!res.ok) {
         const errorData = await res.json();
         setResult({ error: errorData.error || "An unknown error occurred." });
       } else {
-        const data = await res.json();
-        setResult(data);
+        // The upload is processed as a background job; long-poll its status until it finishes
+        let job = await res.json();
+        localStorage.setItem("sessionId", job.session_id);
+        while (job.status !== "succeeded" && job.status !== "failed") {
+          const statusRes = await fetch(
+            `http://localhost:5000/jobs/${job.job_id}?wait=30&since=${job.version}`,
+            { headers: sessionHeaders() }
+          );
+          job = await statusRes.json();
+          if (!statusRes.ok) break;
+        }
+        if (job.status !== "succeeded") {
+          setResult({ error: job.error || "An unknown error occurred." });
+          return;
+        }
+        setResult(job.result);
         // After a successful upload, fetch the overall insights
         await fetchOverallInsight();
       }
@@ -91,7 +124,7 @@ function HealthDataPage() {
         </p>
 
         <FileUploadBox
-          accept=".xml"
+          accept=".xml,.zip"
           onFileSelect={handleFileSelect}
           labelText="Drag & drop file here or click to choose"
         />
@@ -14,6 +14,18 @@ function WeightDataPage() {
     setFile(selectedFile);
   };
 
+  // The columnar payload sends each series as a start date, a step in days and the values
+  // (with day offsets instead of the step when the points aren't evenly spaced)
+  const expandSeries = ({ start, step_days, values, offsets }) => {
+    if (!start) return [];
+    const first = new Date(`${start}T00:00:00Z`);
+    return values.map((weight, i) => {
+      const date = new Date(first);
+      date.setUTCDate(first.getUTCDate() + (offsets ? offsets[i] : i * step_days));
+      return { date: date.toISOString().slice(0, 10), weight };
+    });
+  };
+
   const handleUpload = async () => {
     if (!file) {
       setError("Please select a file first");
@@ -27,8 +39,11 @@ function WeightDataPage() {
     formData.append("file", file);
 
     try {
-      console.log("Sending request to http://localhost:5000/weight");
-      const response = await fetch("http://localhost:5000/weight", {
+      // Long histories are thinned out to about one point per pixel of the chart
+      const points = Math.round(Math.min(window.innerWidth, 768) * (window.devicePixelRatio || 1));
+      const url = `http://localhost:5000/weight?format=columnar&points=${points}`;
+      console.log(`Sending request to ${url}`);
+      const response = await fetch(url, {
         method: "POST",
         body: formData,
         timeout: 60000,
@@ -43,7 +58,7 @@ function WeightDataPage() {
 
       const data = await response.json();
       console.log("Response data:", data);
-      setResult(data);
+      setResult({ ...data, historical: expandSeries(data.historical), predicted: expandSeries(data.predicted) });
     } catch (error) {
       console.error("Fetch error:", error);
       setError(